@@ -0,0 +1,5 @@
+import os
+import secrets
+
+# Benchmarks issue and verify their own tokens, so a throwaway signing key lets them run without a .env.
+os.environ.setdefault("JWT_SECRET_KEY", secrets.token_urlsafe(32))
@@ -0,0 +1,78 @@
+"""
+Compares a fresh httpx client per CRM call with the shared pooled clients.
+
+Runs crm_integration against a local stub CRM server, first with a new AsyncClient per call (the previous
+behaviour) and then through project.http_client_pool, and reports p50/p99 latency for each.
+
+Usage:
+    python -m benchmarks.bench_http_client --requests 2000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+import httpx
+import project.crm_integration_service
+import project.http_client_pool
+from benchmarks.stub_servers import StubServer, make_stub_app
+from project.crm_integration_service import CrmIntegrationDetails
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def run(
+    call: Callable[[], Awaitable[object]], requests: int, concurrency: int
+) -> List[float]:
+    samples: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return samples
+
+
+async def bench(url: str, requests: int, concurrency: int) -> None:
+    project.http_client_pool.open_pool()
+    details = CrmIntegrationDetails(api_endpoint=url, custom_fields={"name": "bench"})
+
+    async def unpooled() -> None:
+        async with httpx.AsyncClient() as client:
+            await client.post(url, json={"name": "bench"})
+
+    async def pooled() -> None:
+        await project.crm_integration_service.crm_integration(
+            "bench-user", "stub", "api-key", details
+        )
+
+    for name, call in (("client per call", unpooled), ("pooled client", pooled)):
+        samples = await run(call, requests, concurrency)
+        print(
+            f"{name:>16}: p50 {percentile(samples, 50) * 1000:7.2f} ms"
+            f"  p99 {percentile(samples, 99) * 1000:7.2f} ms"
+        )
+    await project.http_client_pool.close_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with StubServer(make_stub_app(latency=args.latency)) as server:
+        asyncio.run(bench(server.url + "/contacts", args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
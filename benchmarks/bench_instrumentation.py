@@ -0,0 +1,74 @@
+"""
+Measures the per-sample cost of the latency histograms in project.instrumentation.
+
+Reports the time taken by LatencyHistogram.record(), by a phase() block and by a full observe_request() with two
+phases, and checks that histogram quantiles stay within the advertised relative error.
+
+Usage:
+    python -m benchmarks.bench_instrumentation --iterations 1000000
+"""
+
+import argparse
+import random
+import time
+from typing import Callable
+
+import project.instrumentation
+from project.instrumentation import SUB_BUCKETS, LatencyHistogram
+
+
+def cost(func: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    samples = sorted(random.lognormvariate(-6, 1.5) for _ in range(100_000))
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.record(sample)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = samples[round(q * len(samples)) - 1]
+        estimate = histogram.quantile(q)
+        error = abs(estimate - exact) / exact
+        print(
+            f"p{q * 100:g}: exact {exact * 1000:8.3f} ms  histogram {estimate * 1000:8.3f} ms"
+        )
+        if error > 1 / SUB_BUCKETS + 1e-6 and exact >= 1e-4:
+            raise SystemExit(f"quantile error {error:.3%} above 1/{SUB_BUCKETS}")
+
+    baseline = cost(lambda: None, args.iterations)
+    record = cost(lambda: histogram.record(0.0123), args.iterations)
+
+    timings = project.instrumentation.begin_request(time.perf_counter())
+
+    def timed_phase() -> None:
+        timings.phases.clear()
+        with project.instrumentation.phase("compute"):
+            pass
+
+    phase = cost(timed_phase, args.iterations)
+
+    metrics = project.instrumentation.Metrics()
+    timings.phases[:] = [("db", 0.002), ("bcrypt", 0.2)]
+    observe = cost(
+        lambda: metrics.observe_request("POST", "/user/login", 200, 0.21, timings),
+        args.iterations,
+    )
+
+    for name, seconds in (
+        ("record", record),
+        ("phase block", phase),
+        ("observe_request (2 phases)", observe),
+    ):
+        print(f"{name:>28}: {(seconds - baseline) * 1e9:7.0f} ns/sample")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compares FastAPI's default response serialization with project.fast_json for every route with a response model.
+
+For each route in project.server, builds a sample response model (lists get --items entries, so /data/process
+returns that many processed points) and times both paths from the endpoint's return value to the response body:
+the default serialize_response (validation, jsonable_encoder) followed by JSONResponse, and validate_response
+followed by FastJSONResponse. Reports the body size and per-response time of each and checks that both bodies
+decode to the same JSON.
+
+Usage:
+    python -m benchmarks.bench_json_responses --items 5000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import typing
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Awaitable, Callable
+
+import project.server
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from project.fast_json import FastJSONResponse, validate_response
+from pydantic import BaseModel
+
+
+def sample(annotation: Any, items: int) -> Any:
+    """
+    Builds a sample value of the given type, with items entries in every list.
+    """
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        return sample(next(arg for arg in args if arg is not type(None)), items)
+    if origin in (list, typing.List):
+        return [sample(args[0], items) for _ in range(items)]
+    if origin in (dict, typing.Dict):
+        return {f"key{i}": sample(args[1], items) for i in range(3)}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation(
+            **{
+                name: sample(field.outer_type_, items)
+                for name, field in annotation.__fields__.items()
+            }
+        )
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return next(iter(annotation))
+    return {
+        bool: True,
+        int: 12345,
+        float: 1234.5678,
+        str: "sample value",
+        datetime: datetime(2024, 5, 17, 12, 30, 45, 123456, tzinfo=timezone.utc),
+    }.get(annotation, None)
+
+
+async def per_call(render: Callable[[], Awaitable[bytes]], seconds: float) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        await render()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+
+async def bench(items: int, seconds: float) -> None:
+    print(
+        f"{'route':<44}{'default':>12}{'fast':>12}{'speedup':>9}{'default B':>11}{'fast B':>10}"
+    )
+    for route in project.server.app.routes:
+        if not isinstance(route, APIRoute) or route.response_field is None:
+            continue
+        content = sample(route.response_model, items)
+        field = route.response_field
+
+        async def default() -> bytes:
+            data = await serialize_response(
+                field=field, response_content=content, is_coroutine=True
+            )
+            return JSONResponse(data).body
+
+        async def fast() -> bytes:
+            return FastJSONResponse(validate_response(field, content)).body
+
+        default_body, fast_body = await default(), await fast()
+        if json.loads(default_body) != json.loads(fast_body):
+            raise SystemExit(f"{route.path}: bodies differ")
+        default_time = await per_call(default, seconds)
+        fast_time = await per_call(fast, seconds)
+        name = f"{','.join(sorted(route.methods))} {route.path}"
+        print(
+            f"{name:<44}{default_time * 1e6:10.1f}us{fast_time * 1e6:10.1f}us"
+            f"{default_time / fast_time:8.1f}x{len(default_body):11d}{len(fast_body):10d}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(bench(args.items, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
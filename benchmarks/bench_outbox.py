@@ -0,0 +1,69 @@
+"""
+Measures outbox throughput and delivery lag against a local stub CRM server.
+
+Enqueues CRM integration calls through the outbox, lets the worker pool deliver them to the stub server and reports
+enqueue rate, delivery throughput and lag. Needs the database from DATABASE_URL with the schema pushed.
+
+Usage:
+    python -m benchmarks.bench_outbox --messages 2000 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import time
+
+import project.http_client_pool
+import project.outbox_service
+from benchmarks.stub_servers import StubServer, make_stub_app
+from prisma import Prisma
+from project.crm_integration_service import CrmIntegrationDetails
+
+
+async def bench(url: str, messages: int, workers: int) -> None:
+    db = Prisma(auto_register=True)
+    await db.connect()
+    project.http_client_pool.open_pool()
+    pool = project.outbox_service.OutboxWorkerPool(workers=workers)
+    details = CrmIntegrationDetails(api_endpoint=url, custom_fields={"name": "bench"})
+    try:
+        pool.start()
+        start = time.perf_counter()
+        ids = [
+            (
+                await project.outbox_service.enqueue_crm_integration(
+                    "bench-user", "stub", "api-key", details
+                )
+            ).outbox_id
+            for _ in range(messages)
+        ]
+        enqueued = time.perf_counter() - start
+        while True:
+            metrics = project.outbox_service.metrics
+            if metrics.succeeded + metrics.failed >= messages:
+                break
+            await asyncio.sleep(0.05)
+        drained = time.perf_counter() - start
+        print(f"enqueue: {messages / enqueued:10,.0f} msg/s")
+        print(f"deliver: {messages / drained:10,.0f} msg/s end to end")
+        print(f"last delivery lag: {metrics.last_delivery_lag:.3f}s")
+        print(f"failed: {metrics.failed}, retried: {metrics.retried}")
+        await db.outboxmessage.delete_many(where={"id": {"in": ids}})
+    finally:
+        await pool.stop()
+        await project.http_client_pool.close_pool()
+        await db.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with StubServer(make_stub_app(latency=args.latency)) as server:
+        asyncio.run(bench(server.url + "/contacts", args.messages, args.workers))
+
+
+if __name__ == "__main__":
+    main()
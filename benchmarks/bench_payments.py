@@ -0,0 +1,114 @@
+"""
+Compares one-at-a-time payment submission with batches, and measures idempotent replays.
+
+Charges go to the stub gateway with a simulated round trip. The run reports the throughput of sequential single
+charges against the same charges submitted as batches, and the latency of a first charge against replays of its
+idempotency key served from the in-process cache and from the PaymentIdempotencyKey table. Needs the database from
+DATABASE_URL with the schema pushed; the recorded keys are deleted afterwards.
+
+Usage:
+    python -m benchmarks.bench_payments --charges 500 --batch-size 100 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import List
+
+import project.payment_gateway_integration_service as payments
+from prisma import Prisma
+
+USER_ID = "bench-payments"
+
+
+def items(count: int) -> List[payments.PaymentBatchItem]:
+    return [
+        payments.PaymentBatchItem(
+            user_id=USER_ID,
+            amount=12.5,
+            currency="USD",
+            payment_method="card",
+            idempotency_key=uuid.uuid4().hex,
+        )
+        for _ in range(count)
+    ]
+
+
+async def charge(item: payments.PaymentBatchItem) -> None:
+    await payments.payment_gateway_integration(
+        item.user_id,
+        item.amount,
+        item.currency,
+        item.payment_method,
+        item.description,
+        item.idempotency_key,
+    )
+
+
+async def bench_batches(charges: int, batch_size: int) -> None:
+    single = items(charges)
+    start = time.perf_counter()
+    for item in single:
+        await charge(item)
+    sequential = time.perf_counter() - start
+
+    batched = items(charges)
+    start = time.perf_counter()
+    for i in range(0, charges, batch_size):
+        await payments.payment_batch(batched[i : i + batch_size])
+    batch = time.perf_counter() - start
+    print(f"sequential: {charges / sequential:10,.0f} charges/s")
+    print(
+        f"batches of {batch_size}: {charges / batch:10,.0f} charges/s"
+        f"  ({sequential / batch:.1f}x)"
+    )
+
+
+async def bench_replays(replays: int) -> None:
+    first, cached, stored = [], [], []
+    for item in items(replays):
+        start = time.perf_counter()
+        await charge(item)
+        first.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await charge(item)
+        cached.append(time.perf_counter() - start)
+        payments._stored.pop((item.user_id, item.idempotency_key))
+        start = time.perf_counter()
+        await charge(item)
+        stored.append(time.perf_counter() - start)
+    for name, samples in (
+        ("first charge", first),
+        ("replay (cache)", cached),
+        ("replay (database)", stored),
+    ):
+        print(f"{name:<18} p50 {statistics.median(samples) * 1000:8.3f} ms")
+
+
+async def bench(charges: int, batch_size: int, replays: int, latency: float) -> None:
+    db = Prisma(auto_register=True)
+    await db.connect()
+    payments.gateway = payments.StubPaymentGateway(latency=latency)
+    try:
+        await bench_batches(charges, batch_size)
+        await bench_replays(replays)
+        print(f"gateway calls: {payments.gateway.charges}")
+    finally:
+        await db.paymentidempotencykey.delete_many(where={"userId": USER_ID})
+        await db.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--charges", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--replays", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(bench(args.charges, args.batch_size, args.replays, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares the reference and columnar process_data engines.
+
+Checks that both engines serialize to byte-identical processed points for the same input, then reports throughput in
+points per second for each engine.
+
+Usage:
+    python -m benchmarks.bench_process_data --points 200000 --repeat 3
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+import project.process_data_columnar
+import project.process_data_service
+from project.process_data_service import DataPoint, ProcessedPoint
+
+
+def make_points(count: int, key_metric_ratio: float, seed: int) -> List[DataPoint]:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    points = []
+    for i in range(count):
+        parameters = {"source": "bench"}
+        if rng.random() < key_metric_ratio:
+            parameters["key_metric"] = f"m{rng.randrange(32)}"
+        points.append(
+            DataPoint(
+                timestamp=start + timedelta(milliseconds=i),
+                value=rng.uniform(-1e6, 1e6),
+                parameters=parameters,
+            )
+        )
+    return points
+
+
+def serialize(points: List[ProcessedPoint]) -> bytes:
+    response = project.process_data_service.ProcessDataResponse(
+        summary="", processed_data=points, analysis_duration=0.0
+    )
+    return response.json().encode()
+
+
+def measure(
+    engine: Callable[[List[DataPoint]], List[ProcessedPoint]],
+    data: List[DataPoint],
+    repeat: int,
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=200_000)
+    parser.add_argument("--key-metric-ratio", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = make_points(args.points, args.key_metric_ratio, args.seed)
+    reference = project.process_data_service.process_points_reference
+    columnar = project.process_data_columnar.process_points_columnar
+
+    if serialize(reference(data)) != serialize(columnar(data)):
+        raise SystemExit("columnar engine output differs from the reference engine")
+    print(f"parity: OK ({args.points} points)")
+
+    for name, engine in (("reference", reference), ("columnar", columnar)):
+        elapsed = measure(engine, data, args.repeat)
+        print(f"{name:>10}: {elapsed:8.4f}s  {args.points / elapsed:14,.0f} points/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Compares the JSON and packed msgpack columnar formats of /data/process end to end.
+
+Producers hold their points as columns, so each request starts from NumPy columns: the JSON client builds an array
+of point objects and parses the processed points it gets back, the msgpack client packs the columns as bins and
+wraps the response bins as arrays. Requests go in-process over ASGI to project.server:app. The run first checks that
+both formats return the same results and insights, then reports, per batch size, the request and response bytes of
+each format and the median latency from columns in hand to result columns decoded.
+
+Usage:
+    python -m benchmarks.bench_process_data_binary --points 1000,10000,100000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+import msgpack
+import numpy as np
+import orjson
+import project.process_data_executor
+import project.server
+from project.process_data_binary import MSGPACK_MEDIA_TYPE
+
+
+class Columns(NamedTuple):
+    """
+    A producer's batch: int64 microseconds since the epoch, float64 values and key_metric (None where missing).
+    """
+
+    timestamps: np.ndarray
+    values: np.ndarray
+    key_metrics: List[Optional[str]]
+
+
+class Exchange(NamedTuple):
+    """
+    One request and its response, decoded back into result columns.
+    """
+
+    request_bytes: int
+    response_bytes: int
+    results: np.ndarray
+    insights: List[str]
+
+
+def make_columns(count: int, key_metric_ratio: float, seed: int) -> Columns:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    start_us = (start - datetime(1970, 1, 1, tzinfo=timezone.utc)) // timedelta(
+        microseconds=1
+    )
+    return Columns(
+        timestamps=start_us + np.arange(count, dtype=np.int64) * 1000,
+        values=np.array([rng.uniform(-1e6, 1e6) for _ in range(count)]),
+        key_metrics=[
+            f"m{rng.randrange(32)}" if rng.random() < key_metric_ratio else None
+            for _ in range(count)
+        ],
+    )
+
+
+async def send_json(client: httpx.AsyncClient, columns: Columns) -> Exchange:
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    points = [
+        {
+            "timestamp": epoch + timedelta(microseconds=timestamp),
+            "value": value,
+            "parameters": {} if key_metric is None else {"key_metric": key_metric},
+        }
+        for timestamp, value, key_metric in zip(
+            columns.timestamps.tolist(), columns.values.tolist(), columns.key_metrics
+        )
+    ]
+    body = orjson.dumps(points)
+    res = await client.post(
+        "/data/process", content=body, headers={"content-type": "application/json"}
+    )
+    res.raise_for_status()
+    processed = orjson.loads(res.content)["processed_data"]
+    return Exchange(
+        len(body),
+        len(res.content),
+        np.array([point["result"] for point in processed], dtype=np.float64),
+        [point["insight"] for point in processed],
+    )
+
+
+async def send_msgpack(client: httpx.AsyncClient, columns: Columns) -> Exchange:
+    body = msgpack.packb(
+        {
+            "timestamps": columns.timestamps.astype("<i8").tobytes(),
+            "values": columns.values.astype("<f8").tobytes(),
+            "parameters": {"key_metric": columns.key_metrics},
+        }
+    )
+    res = await client.post(
+        "/data/process",
+        content=body,
+        headers={"content-type": MSGPACK_MEDIA_TYPE, "accept": MSGPACK_MEDIA_TYPE},
+    )
+    res.raise_for_status()
+    decoded = msgpack.unpackb(res.content)
+    codes = np.frombuffer(decoded["insight_codes"], dtype="<u4")
+    return Exchange(
+        len(body),
+        len(res.content),
+        np.frombuffer(decoded["results"], dtype="<f8"),
+        np.array(decoded["insight_values"], dtype=object)[codes].tolist(),
+    )
+
+
+async def measure(
+    client: httpx.AsyncClient, send, columns: Columns, repeat: int
+) -> Tuple[Exchange, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        exchange = await send(client, columns)
+        samples.append(time.perf_counter() - start)
+    return exchange, statistics.median(samples)
+
+
+async def bench(sizes: List[int], key_metric_ratio: float, repeat: int) -> None:
+    project.process_data_executor.executor.start()
+    transport = httpx.ASGITransport(app=project.server.app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            print(
+                f"{'points':>8} {'format':>8} {'request':>12} {'response':>12} {'p50':>11}"
+            )
+            for count in sizes:
+                columns = make_columns(count, key_metric_ratio, seed=count)
+                results: Dict[str, Tuple[Exchange, float]] = {
+                    "json": await measure(client, send_json, columns, repeat),
+                    "msgpack": await measure(client, send_msgpack, columns, repeat),
+                }
+                as_json, as_msgpack = results["json"][0], results["msgpack"][0]
+                if not np.array_equal(as_json.results, as_msgpack.results) or (
+                    as_json.insights != as_msgpack.insights
+                ):
+                    raise SystemExit(
+                        f"msgpack output differs from JSON ({count} points)"
+                    )
+                for name, (exchange, latency) in results.items():
+                    print(
+                        f"{count:>8} {name:>8} {exchange.request_bytes:>12,} "
+                        f"{exchange.response_bytes:>12,} {latency * 1000:>8.2f} ms"
+                    )
+                print(
+                    f"{'':>8} {'ratio':>8} "
+                    f"{as_json.request_bytes / as_msgpack.request_bytes:>11.1f}x "
+                    f"{as_json.response_bytes / as_msgpack.response_bytes:>11.1f}x "
+                    f"{results['json'][1] / results['msgpack'][1]:>10.1f}x"
+                )
+    finally:
+        project.process_data_executor.executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", default="1000,10000,100000")
+    parser.add_argument("--key-metric-ratio", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.points.split(",")]
+    asyncio.run(bench(sizes, args.key_metric_ratio, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
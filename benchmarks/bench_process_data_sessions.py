@@ -0,0 +1,69 @@
+"""
+Compares appending to a process_data session with resending an overlapping window to process_data.
+
+Simulates a client that receives --batch new points at a time and wants results over the last --window points:
+the stateless way reprocesses the whole window on every batch, the session way appends only the new batch and
+reads the rolling aggregates. Reports the time per batch and per appended point of each.
+
+Usage:
+    python -m benchmarks.bench_process_data_sessions --window 10000 --batch 100 --batches 200
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import project.process_data_service
+from project.process_data_service import DataPoint
+from project.process_data_sessions import ProcessDataSession
+
+
+def data_points(count: int) -> List[DataPoint]:
+    start = datetime(2024, 1, 1)
+    return [
+        DataPoint(
+            timestamp=start + timedelta(seconds=i),
+            value=random.uniform(-1000, 1000),
+            parameters={"key_metric": str(i % 7)} if i % 3 == 0 else {},
+        )
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--window", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=200)
+    args = parser.parse_args()
+
+    points = data_points(args.window + args.batch * args.batches)
+    session = ProcessDataSession("bench", window=args.window)
+    for point in points[: args.window]:
+        session.append(point)
+
+    start = time.perf_counter()
+    for i in range(args.batches):
+        end = args.window + (i + 1) * args.batch
+        project.process_data_service.process_data(points[end - args.window : end])
+    stateless = (time.perf_counter() - start) / args.batches
+
+    start = time.perf_counter()
+    for i in range(args.batches):
+        end = args.window + (i + 1) * args.batch
+        for point in points[end - args.batch : end]:
+            session.append(point)
+        session.results()
+    incremental = (time.perf_counter() - start) / args.batches
+
+    print(f"resend window: {stateless * 1000:8.3f} ms/batch")
+    print(
+        f"session:       {incremental * 1000:8.3f} ms/batch"
+        f"  ({incremental / args.batch * 1e9:.0f} ns/point, {stateless / incremental:.0f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
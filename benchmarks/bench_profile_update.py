@@ -0,0 +1,122 @@
+"""
+Compares the old check-then-update profile update with the single-write update under contention.
+
+Seeds a set of users, then in every round has all of them try to claim the same username (each with a fresh
+email) at once. The old path (two find_unique checks followed by an update) is reimplemented here for comparison;
+the new path is project.update_user_profile_service.update_user_profile. Reports p50/p99 latency and how the
+contending updates ended: exactly one success per round is correct, and every loser should get "Username already
+exists.". Needs the database from DATABASE_URL with the schema pushed.
+
+Usage:
+    python -m benchmarks.bench_profile_update --users 32 --rounds 20
+"""
+
+import argparse
+import asyncio
+import collections
+import statistics
+import time
+import uuid
+from typing import Awaitable, Callable, Counter, List
+
+import prisma.models
+import project.update_user_profile_service
+from prisma import Prisma
+from project.update_user_profile_service import UpdateUserProfileResponse
+
+
+async def check_then_update(
+    user_id: str, email: str, username: str
+) -> UpdateUserProfileResponse:
+    try:
+        if await prisma.models.User.prisma().find_unique(where={"email": email}):
+            return UpdateUserProfileResponse(
+                success=False, message="Email already exists."
+            )
+        if await prisma.models.User.prisma().find_unique(where={"username": username}):
+            return UpdateUserProfileResponse(
+                success=False, message="Username already exists."
+            )
+        await prisma.models.User.prisma().update(
+            where={"id": user_id}, data={"email": email, "username": username}
+        )
+        return UpdateUserProfileResponse(
+            success=True, message="User profile updated successfully."
+        )
+    except Exception as e:
+        return UpdateUserProfileResponse(
+            success=False, message=f"Failed to update user profile: {str(e)}"
+        )
+
+
+async def single_write(
+    user_id: str, email: str, username: str
+) -> UpdateUserProfileResponse:
+    return await project.update_user_profile_service.update_user_profile(
+        email=email, username=username, user_id=user_id
+    )
+
+
+async def run(
+    update: Callable[[str, str, str], Awaitable[UpdateUserProfileResponse]],
+    user_ids: List[str],
+    rounds: int,
+) -> None:
+    samples: List[float] = []
+    outcomes: Counter[str] = collections.Counter()
+    double_claims = 0
+
+    async def one(user_id: str, username: str) -> UpdateUserProfileResponse:
+        email = f"{uuid.uuid4().hex}@example.com"
+        start = time.perf_counter()
+        res = await update(user_id, email, username)
+        samples.append(time.perf_counter() - start)
+        return res
+
+    for _ in range(rounds):
+        username = f"bench-{uuid.uuid4().hex}"
+        results = await asyncio.gather(*(one(i, username) for i in user_ids))
+        winners = sum(res.success for res in results)
+        double_claims += winners > 1
+        for res in results:
+            outcomes[res.message.split(":")[0]] += 1
+
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    print(
+        f"{update.__name__:>17}: p50 {quantiles[49] * 1000:7.2f} ms"
+        f"  p99 {quantiles[98] * 1000:7.2f} ms  rounds with >1 winner: {double_claims}"
+    )
+    for message, count in outcomes.most_common():
+        print(f"{'':>19}{count:6d}  {message}")
+
+
+async def bench(users: int, rounds: int) -> None:
+    db = Prisma(auto_register=True)
+    await db.connect()
+    tag = uuid.uuid4().hex[:8]
+    user_ids = [
+        (
+            await prisma.models.User.prisma().create(
+                data={"email": f"bench-{tag}-{i}@example.com", "hash": "x"}
+            )
+        ).id
+        for i in range(users)
+    ]
+    try:
+        for update in (check_then_update, single_write):
+            await run(update, user_ids, rounds)
+    finally:
+        await prisma.models.User.prisma().delete_many(where={"id": {"in": user_ids}})
+        await db.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(bench(args.users, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
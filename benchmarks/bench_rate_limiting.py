@@ -0,0 +1,80 @@
+"""
+Measures the per-request cost of the rate limiter in project.rate_limiting and checks its GCRA decisions.
+
+Drives RateLimiter.check() with anonymous requests spread over many client IPs and with a cached authenticated
+user, on the in-process store, and checks on a fake clock that a client gets exactly its burst back to back and
+one more request per emission interval after that.
+
+Usage:
+    python -m benchmarks.bench_rate_limiting --iterations 200000
+"""
+
+import argparse
+import asyncio
+import time
+
+import project.tokens
+from project.rate_limiting import LocalRateLimitStore, RateLimit, RateLimiter
+
+
+def check_decisions() -> None:
+    now = [0.0]
+    store = LocalRateLimitStore(clock=lambda: now[0])
+    limit = RateLimit.parse("60/10")
+    allowed = sum(store.check("client", limit) == 0 for _ in range(15))
+    if allowed != 10:
+        raise SystemExit(f"burst of 10 allowed {allowed} requests")
+    retry_after = store.check("client", limit)
+    if abs(retry_after - limit.interval) > 1e-9:
+        raise SystemExit(f"Retry-After {retry_after} instead of {limit.interval}")
+    now[0] += limit.interval
+    if store.check("client", limit) != 0 or store.check("client", limit) == 0:
+        raise SystemExit("one request per emission interval was not enforced")
+    print("GCRA decisions: ok")
+
+
+async def cost(limiter: RateLimiter, scopes, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        await limiter.check(scopes[i % len(scopes)])
+    return (time.perf_counter() - start) / iterations
+
+
+async def bench(iterations: int) -> None:
+    limit = RateLimit(1e12, 60, 1e12)
+    limiter = RateLimiter(
+        store=LocalRateLimitStore(),
+        limits={"ANONYMOUS": limit, "NONE": limit, "BASIC": limit, "PREMIUM": limit},
+    )
+    anonymous = [
+        {
+            "path": "/data/process",
+            "headers": [],
+            "client": (f"10.0.{i // 256}.{i % 256}", 1),
+        }
+        for i in range(10_000)
+    ]
+    token = project.tokens.encode_token({"user_id": "bench-user", "role": "GENERAL"})
+    limiter._plans.set("bench-user", "PREMIUM")
+    authenticated = [
+        {
+            "path": "/data/process",
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "client": ("10.0.0.1", 1),
+        }
+    ]
+    for name, scopes in (("anonymous", anonymous), ("authenticated", authenticated)):
+        seconds = await cost(limiter, scopes, iterations)
+        print(f"{name:>14}: {seconds * 1e9:7.0f} ns/request")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+    check_decisions()
+    asyncio.run(bench(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Measures worker cold start: time to accept connections, time to ready and the latency of the first requests.
+
+Starts uvicorn with project.server:app as a subprocess once per run and warm-up mode, polls /ready from the moment
+the process is spawned, and then sends one request to each of a few routes that are slow when cold. It reports,
+per mode, the median time until the server answered at all and until /ready returned 200, the median latency of
+each first request, and the median duration of every startup phase reported by /ready. With --importtime it also
+lists the modules that take longest to import. Needs the database from DATABASE_URL, since the lifespan connects.
+
+Usage:
+    python -m benchmarks.bench_startup --modes off,background,blocking --runs 5
+    python -m benchmarks.bench_startup --importtime 25
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Tuple
+
+import httpx
+from benchmarks.stub_servers import free_port
+
+POINTS = [
+    {
+        "timestamp": (datetime(2024, 1, 1) + timedelta(seconds=i)).isoformat(),
+        "value": float(i),
+        "parameters": {"key_metric": str(i)} if i % 3 == 0 else {},
+    }
+    for i in range(1000)
+]
+
+FIRST_REQUESTS: List[Tuple[str, str, Dict]] = [
+    ("GET", "/openapi.json", {}),
+    ("POST", "/data/process", {"json": POINTS}),
+    ("GET", "/user/profile", {}),
+    (
+        "POST",
+        "/user/login",
+        {"params": {"email": "nobody@example.com", "password": "x"}},
+    ),
+]
+
+
+class Run(NamedTuple):
+    """
+    Timings of one cold start, in seconds.
+    """
+
+    listening: float
+    ready: float
+    first_requests: Dict[str, float]
+    phases: Dict[str, float]
+
+
+def cold_start(mode: str, timeout: float) -> Run:
+    port = free_port()
+    env = dict(os.environ, STARTUP_WARMUP=mode, RATE_LIMIT_ENABLED="false")
+    spawned = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "project.server:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            listening = None
+            while True:
+                if time.perf_counter() - spawned > timeout:
+                    raise SystemExit(f"{mode}: not ready after {timeout}s")
+                try:
+                    res = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                if listening is None:
+                    listening = time.perf_counter() - spawned
+                if res.status_code == 200:
+                    ready = time.perf_counter() - spawned
+                    phases = res.json()["phases"]
+                    break
+                time.sleep(0.005)
+            first_requests = {}
+            for method, path, kwargs in FIRST_REQUESTS:
+                start = time.perf_counter()
+                client.request(method, path, **kwargs)
+                first_requests[f"{method} {path}"] = time.perf_counter() - start
+        return Run(listening, ready, first_requests, phases)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def import_times(top: int) -> List[Tuple[int, str]]:
+    """
+    Imports project.server in a fresh interpreter with -X importtime and returns the slowest modules.
+
+    Returns:
+        List[Tuple[int, str]]: (cumulative microseconds, module name) pairs, slowest first.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import project.server"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)[:top]
+
+
+def report(mode: str, runs: List[Run]) -> None:
+    def median_ms(values: List[float]) -> str:
+        return f"{statistics.median(values) * 1000:9.1f} ms"
+
+    print(f"STARTUP_WARMUP={mode} ({len(runs)} runs)")
+    print(f"  {'listening':<32}{median_ms([run.listening for run in runs])}")
+    print(f"  {'ready':<32}{median_ms([run.ready for run in runs])}")
+    for name in runs[0].first_requests:
+        values = [run.first_requests[name] for run in runs]
+        print(f"  first {name:<26}{median_ms(values)}")
+    for name in runs[0].phases:
+        values = [run.phases.get(name, 0.0) for run in runs]
+        print(f"  phase {name:<26}{median_ms(values)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", default="off,background")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--importtime", type=int, default=0, help="list the N slowest imports"
+    )
+    parser.add_argument("--output", help="write the runs as JSON to this file")
+    args = parser.parse_args()
+
+    if args.importtime:
+        for cumulative, name in import_times(args.importtime):
+            print(f"{cumulative / 1000:9.1f} ms  {name}")
+    results: Dict[str, List[Run]] = {}
+    for mode in args.modes.split(","):
+        results[mode] = [cold_start(mode, args.timeout) for _ in range(args.runs)]
+        report(mode, results[mode])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    mode: [run._asdict() for run in runs]
+                    for mode, runs in results.items()
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
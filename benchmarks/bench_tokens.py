@@ -0,0 +1,71 @@
+"""
+Measures JWT encode and verify throughput on a single core.
+
+Compares PyJWT with the precomputed-key fast path in project.tokens, for both cold verification (every token new)
+and cached verification (the same token presented repeatedly). Also checks that both paths issue identical tokens
+and accept each other's output.
+
+Usage:
+    python -m benchmarks.bench_tokens --iterations 50000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+import jwt
+import project.tokens
+from project.tokens import JWT_ALGORITHM, SECRET_KEY
+
+
+def rate(func: Callable[[int], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return iterations / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50_000)
+    args = parser.parse_args()
+
+    exp = datetime.utcnow() + timedelta(days=1)
+
+    def claims(i: int) -> dict:
+        return {"user_id": f"user-{i}", "role": "GENERAL", "exp": exp}
+
+    sample = claims(0)
+    fast_token = project.tokens.encode_token(sample)
+    if fast_token != jwt.encode(sample, SECRET_KEY, algorithm=JWT_ALGORITHM):
+        raise SystemExit("fast path token differs from PyJWT output")
+    jwt.decode(fast_token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    print("interop: OK")
+
+    tokens = [project.tokens.encode_token(claims(i)) for i in range(args.iterations)]
+    results = {
+        "pyjwt encode": rate(
+            lambda i: jwt.encode(claims(i), SECRET_KEY, algorithm=JWT_ALGORITHM),
+            args.iterations,
+        ),
+        "fast encode": rate(
+            lambda i: project.tokens.encode_token(claims(i)), args.iterations
+        ),
+        "pyjwt verify": rate(
+            lambda i: jwt.decode(tokens[i], SECRET_KEY, algorithms=[JWT_ALGORITHM]),
+            args.iterations,
+        ),
+        "fast verify (cold)": rate(
+            lambda i: project.tokens.verify_token(tokens[i]), args.iterations
+        ),
+        "fast verify (cached)": rate(
+            lambda i: project.tokens.verify_token(tokens[0]), args.iterations
+        ),
+    }
+    for name, ops in results.items():
+        print(f"{name:>22}: {ops:12,.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
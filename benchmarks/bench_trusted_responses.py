@@ -0,0 +1,167 @@
+"""
+Checks that trusted (construct-built) responses serialize exactly like validated ones and measures the saving.
+
+For every route marked with project.fast_json.trusted_response, builds the response the way its service does and
+compares the body FastJSONRoute sends for it, unvalidated, with the body of the same response after validation
+against the route's response model. Any difference (a wrong type, a missing default, an enum where a string is
+expected) fails the run. The services checked with real data are process_data (both engines) and the user profile
+builders; the others, which need a database, are checked with sample models.
+
+Then times /data/process from computed points to response body with and without validation.
+
+Usage:
+    python -m benchmarks.bench_trusted_responses --points 5000
+"""
+
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+import prisma.enums
+import prisma.models
+import project.get_user_profile_service
+import project.process_data_columnar
+import project.process_data_service
+import project.server
+from benchmarks.bench_json_responses import sample
+from fastapi.routing import APIRoute
+from project.fast_json import (
+    TRUSTED_RESPONSE_ATTRIBUTE,
+    FastJSONResponse,
+    validate_response,
+)
+from project.process_data_service import DataPoint
+
+
+def data_points(count: int) -> List[DataPoint]:
+    start = datetime(2024, 1, 1)
+    return [
+        DataPoint(
+            timestamp=start + timedelta(seconds=i),
+            value=random.uniform(-1000, 1000),
+            parameters={"key_metric": str(i)} if i % 3 == 0 else {"other": "x"},
+        )
+        for i in range(count)
+    ]
+
+
+def users(count: int) -> List[prisma.models.User]:
+    now = datetime.now(timezone.utc)
+    return [
+        prisma.models.User.construct(
+            id=str(uuid.uuid4()),
+            email=f"user{i}@example.com",
+            username=None,
+            hash="x",
+            role=random.choice(list(prisma.enums.Role)),
+            createdAt=now,
+            updatedAt=now,
+        )
+        for i in range(count)
+    ]
+
+
+def trusted_responses(points: int) -> Dict[str, List[Any]]:
+    data = data_points(points)
+    profiles = [
+        project.get_user_profile_service.build_user_profile_response(user)
+        for user in users(20)
+    ]
+    responses: Dict[str, List[Any]] = {
+        "POST /data/process": [
+            project.process_data_service.build_response(
+                project.process_data_service.process_points_reference(data),
+                datetime.now(),
+            ),
+            project.process_data_service.build_response(
+                project.process_data_columnar.process_points_columnar(data),
+                datetime.now(),
+            ),
+        ],
+        "GET /user/profile": profiles,
+        "POST /user/profiles": [
+            project.get_user_profile_service.GetUserProfilesResponse.construct(
+                profiles=profiles, missing=["missing-id"]
+            )
+        ],
+    }
+    for name, route in trusted_routes().items():
+        if name not in responses:
+            responses[name] = [sample(route.response_model, 3)]
+    return responses
+
+
+def trusted_routes() -> Dict[str, APIRoute]:
+    return {
+        f"{method} {route.path}": route
+        for route in project.server.app.routes
+        if isinstance(route, APIRoute)
+        and getattr(route.endpoint, TRUSTED_RESPONSE_ATTRIBUTE, False)
+        for method in sorted(route.methods)
+    }
+
+
+def check(points: int) -> None:
+    routes = trusted_routes()
+    for name, responses in trusted_responses(points).items():
+        field = routes[name].response_field
+        for response in responses:
+            trusted = FastJSONResponse(response).body
+            validated = FastJSONResponse(validate_response(field, response)).body
+            if trusted != validated:
+                raise SystemExit(f"{name}: trusted response differs from validated one")
+        print(f"{name:<45} {len(responses)} response(s) identical")
+
+
+def per_call(func: Callable[[], object], seconds: float) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+
+def bench(points: int, seconds: float) -> None:
+    processed = project.process_data_columnar.process_points_columnar(
+        data_points(points)
+    )
+    field = next(
+        route.response_field
+        for route in project.server.app.routes
+        if isinstance(route, APIRoute) and route.path == "/data/process"
+    )
+    start = datetime.now()
+    service = project.process_data_service
+
+    def validated() -> bytes:
+        response = service.ProcessDataResponse(
+            summary="", processed_data=processed, analysis_duration=0.0
+        )
+        return FastJSONResponse(validate_response(field, response)).body
+
+    def trusted() -> bytes:
+        return FastJSONResponse(service.build_response(processed, start)).body
+
+    validated_time = per_call(validated, seconds)
+    trusted_time = per_call(trusted, seconds)
+    print(
+        f"/data/process ({points} points): validated {validated_time * 1000:.2f} ms"
+        f"  trusted {trusted_time * 1000:.2f} ms  ({validated_time / trusted_time:.1f}x)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    check(args.points)
+    bench(args.points, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Local stub servers for the external systems the API talks to.
+
+The stubs are tiny ASGI apps served by uvicorn on a background thread, so benchmarks can exercise the real
+outbound HTTP path without depending on a third-party service.
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+import uvicorn
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _send_json(send, status_code: int, document) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": json.dumps(document).encode()})
+
+
+def make_stub_app(latency: float = 0.0, status_code: int = 200):
+    """
+    Builds an ASGI app that answers every POST with {"id": <uuid>} after the given latency.
+
+    Args:
+        latency (float): Seconds to wait before answering, to mimic a remote system.
+        status_code (int): The HTTP status of every response.
+    """
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send)
+            return
+        await _read_body(receive)
+        if latency:
+            await asyncio.sleep(latency)
+        await _send_json(send, status_code, {"id": uuid.uuid4().hex})
+
+    return app
+
+
+def make_payment_stub_app(latency: float = 0.0):
+    """
+    Builds an ASGI app that approves every charge POSTed to it, in the format HttpPaymentGateway expects.
+
+    Args:
+        latency (float): Seconds to wait before answering, to mimic a remote gateway.
+    """
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send)
+            return
+        charge = json.loads(await _read_body(receive) or b"{}")
+        if latency:
+            await asyncio.sleep(latency)
+        await _send_json(
+            send,
+            200,
+            {
+                "transaction_id": f"TRANS{uuid.uuid4().hex[:12].upper()}",
+                "status": "success",
+                "amount_charged": charge.get("amount", 0.0),
+                "currency": charge.get("currency", ""),
+            },
+        )
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """
+    Runs a stub ASGI app with uvicorn on a background thread.
+
+    Usage:
+        with StubServer(make_stub_app(latency=0.005)) as server:
+            httpx.post(server.url + "/contacts", json={})
+    """
+
+    def __init__(self, app=None, port: Optional[int] = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                app or make_stub_app(),
+                host="127.0.0.1",
+                port=self.port,
+                log_level="warning",
+            )
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.should_exit = True
+        self._thread.join()
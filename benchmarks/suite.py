@@ -0,0 +1,662 @@
+"""
+End-to-end load benchmark for every route in project.server.
+
+Seeds users and tokens into the database from DATABASE_URL, starts stub CRM and payment gateway servers (the app
+is pointed at the latter through PAYMENT_GATEWAY_URL) and drives each route with a closed loop of concurrent clients, either in-process over ASGI (the app's lifespan runs in this process) or over
+HTTP against uvicorn started as a subprocess. For every route, transport and concurrency level it reports
+throughput, p50/p95/p99 latency and the number of unexpected status codes, and can write the results as JSON.
+
+Given a baseline (the JSON of an earlier run), the run fails with exit status 1 when any route's throughput drops,
+or its p99 latency grows, by more than --max-regression compared with the baseline.
+
+Rate limiting is disabled for the run and workers finish warming up before they are measured. The seeded rows are
+deleted afterwards.
+
+Usage:
+    python -m benchmarks.suite --transport asgi --concurrency 1,8,32 --duration 5 --output results.json
+    python -m benchmarks.suite --transport uvicorn --workers 4 --baseline baseline.json --max-regression 0.15
+    python -m benchmarks.suite --routes "POST /user/login,POST /data/process" --save-baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+import msgpack
+import numpy as np
+from benchmarks.stub_servers import (
+    StubServer,
+    free_port,
+    make_payment_stub_app,
+    make_stub_app,
+)
+
+PASSWORD = "bench-suite-password"
+
+
+class RequestSpec(NamedTuple):
+    """
+    One request to send. Built fresh for every call so that routes that consume state can be benchmarked.
+    """
+
+    method: str
+    path: str
+    params: Optional[Dict[str, Any]] = None
+    json: Any = None
+    content: Optional[bytes] = None
+    headers: Optional[Dict[str, str]] = None
+
+
+class Seed:
+    """
+    Rows and server-side state the scenarios use, created before and removed after the run.
+    """
+
+    def __init__(self, tag: str, crm_url: str):
+        self.tag = tag
+        self.crm_url = crm_url
+        self.bench_user_id = f"bench-suite-{tag}"
+        self.user_ids: List[str] = []
+        self.emails: List[str] = []
+        self.refresh_token = ""
+        self.outbox_id = ""
+        self.session_id = ""
+        self.points = [
+            {
+                "timestamp": (datetime(2024, 1, 1) + timedelta(seconds=i)).isoformat(),
+                "value": random.uniform(-1000, 1000),
+                "parameters": {"key_metric": str(i)} if i % 3 == 0 else {},
+            }
+            for i in range(1000)
+        ]
+        self.ndjson = b"".join(
+            json.dumps(point).encode() + b"\n" for point in self.points
+        )
+        epoch = datetime(1970, 1, 1)
+        self.msgpack = msgpack.packb(
+            {
+                "timestamps": np.array(
+                    [
+                        (datetime.fromisoformat(point["timestamp"]) - epoch)
+                        // timedelta(microseconds=1)
+                        for point in self.points
+                    ],
+                    dtype="<i8",
+                ).tobytes(),
+                "values": np.array(
+                    [point["value"] for point in self.points], dtype="<f8"
+                ).tobytes(),
+                "parameters": {
+                    "key_metric": [
+                        point["parameters"].get("key_metric") for point in self.points
+                    ]
+                },
+            }
+        )
+
+    def crm_details(self) -> Dict[str, Any]:
+        return {"api_endpoint": self.crm_url, "custom_fields": {"name": "bench"}}
+
+
+async def issue_refresh_token(user_id: str) -> str:
+    import prisma.models
+
+    token = uuid.uuid4().hex
+    await prisma.models.APIToken.prisma().create(
+        data={
+            "token": token,
+            "userId": user_id,
+            "expiresAt": datetime.now(timezone.utc) + timedelta(days=1),
+        }
+    )
+    return token
+
+
+async def seed_database(seed: Seed, users: int) -> None:
+    import prisma.models
+    import project.get_user_profile_service
+    import project.password_hashing
+
+    password_hash = await project.password_hashing.password_hasher.hash(PASSWORD)
+    for i in range(users):
+        email = f"bench-suite-{seed.tag}-{i}@example.com"
+        user = await prisma.models.User.prisma().create(
+            data={"email": email, "hash": password_hash}
+        )
+        seed.user_ids.append(user.id)
+        seed.emails.append(email)
+    seed.refresh_token = await issue_refresh_token(seed.user_ids[0])
+    # GET /user/profile and PUT /user/profile/update act on this user until the routes read it from the token. It
+    # is only removed afterwards if the run created it.
+    profile_user_id = project.get_user_profile_service.AUTHENTICATED_USER_ID
+    if (
+        await prisma.models.User.prisma().find_unique(where={"id": profile_user_id})
+        is None
+    ):
+        await prisma.models.User.prisma().create(
+            data={
+                "id": profile_user_id,
+                "email": "authenticated-user@example.com",
+                "hash": password_hash,
+            }
+        )
+        seed.user_ids.append(profile_user_id)
+
+
+async def seed_server(seed: Seed, client: httpx.AsyncClient) -> None:
+    res = await client.post(
+        "/integration/crm/async",
+        params={"user_id": seed.bench_user_id, "crm_type": "stub", "api_key": "key"},
+        json=seed.crm_details(),
+    )
+    seed.outbox_id = res.json()["outbox_id"]
+    res = await client.post("/data/sessions", params={"window": 10000})
+    seed.session_id = res.json()["session_id"]
+
+
+async def clean_up(seed: Seed) -> None:
+    import prisma.models
+
+    await prisma.models.OutboxMessage.prisma().delete_many(
+        where={"userId": seed.bench_user_id}
+    )
+    await prisma.models.PaymentIdempotencyKey.prisma().delete_many(
+        where={"userId": seed.bench_user_id}
+    )
+    await prisma.models.User.prisma().delete_many(where={"id": {"in": seed.user_ids}})
+
+
+class Scenario(NamedTuple):
+    """
+    How to call one route. build() may make untimed setup calls through the client.
+    """
+
+    name: str
+    build: Callable[[Seed, httpx.AsyncClient], Awaitable[RequestSpec]]
+    expected_status: int = 200
+
+
+def _scenarios() -> List[Scenario]:
+    async def login(seed, client):
+        return RequestSpec(
+            "POST",
+            "/user/login",
+            params={"email": random.choice(seed.emails), "password": PASSWORD},
+        )
+
+    async def refresh(seed, client):
+        return RequestSpec(
+            "POST", "/user/refresh", params={"refresh_token": seed.refresh_token}
+        )
+
+    async def revoke(seed, client):
+        token = await issue_refresh_token(seed.user_ids[0])
+        return RequestSpec(
+            "POST", "/user/refresh/revoke", params={"refresh_token": token}
+        )
+
+    async def profiles(seed, client):
+        return RequestSpec("POST", "/user/profiles", json=seed.user_ids[:20])
+
+    async def update_profile(seed, client):
+        return RequestSpec(
+            "PUT",
+            "/user/profile/update",
+            params={
+                "email": "authenticated-user@example.com",
+                "username": f"bench-{uuid.uuid4().hex}",
+                "phone_number": "+15550100",
+                "profile_picture_url": "https://example.com/p.png",
+            },
+        )
+
+    async def payment(seed, client):
+        return RequestSpec(
+            "POST",
+            "/integration/payment",
+            params={
+                "user_id": seed.bench_user_id,
+                "amount": 12.5,
+                "currency": "USD",
+                "payment_method": "card",
+                "description": "bench",
+            },
+        )
+
+    async def payment_replay(seed, client):
+        spec = await payment(seed, client)
+        return spec._replace(
+            params={**spec.params, "idempotency_key": f"bench-suite-{seed.tag}"}
+        )
+
+    async def payment_batch(seed, client):
+        item = {
+            "user_id": seed.bench_user_id,
+            "amount": 12.5,
+            "currency": "USD",
+            "payment_method": "card",
+        }
+        return RequestSpec(
+            "POST",
+            "/integration/payment/batch",
+            json=[{**item, "idempotency_key": uuid.uuid4().hex} for _ in range(20)],
+        )
+
+    async def payment_async(seed, client):
+        spec = await payment(seed, client)
+        return spec._replace(path="/integration/payment/async")
+
+    async def crm(seed, client):
+        return RequestSpec(
+            "POST",
+            "/integration/crm",
+            params={
+                "user_id": seed.bench_user_id,
+                "crm_type": "stub",
+                "api_key": "key",
+            },
+            json=seed.crm_details(),
+        )
+
+    async def crm_async(seed, client):
+        spec = await crm(seed, client)
+        return spec._replace(path="/integration/crm/async")
+
+    async def crm_bulk(seed, client):
+        item = {
+            "crm_type": "stub",
+            "api_key": "key",
+            "integration_details": seed.crm_details(),
+        }
+        return RequestSpec(
+            "POST",
+            "/integration/crm/bulk",
+            params={"user_id": seed.bench_user_id},
+            json=[item] * 20,
+        )
+
+    async def process(seed, client):
+        return RequestSpec("POST", "/data/process", json=seed.points)
+
+    async def process_stream(seed, client):
+        return RequestSpec(
+            "POST",
+            "/data/process/stream",
+            content=seed.ndjson,
+            headers={"content-type": "application/x-ndjson"},
+        )
+
+    async def process_msgpack(seed, client):
+        return RequestSpec(
+            "POST",
+            "/data/process",
+            content=seed.msgpack,
+            headers={"content-type": "application/x-msgpack"},
+        )
+
+    async def append_points(seed, client):
+        return RequestSpec(
+            "POST", f"/data/sessions/{seed.session_id}/points", json=seed.points[:100]
+        )
+
+    async def close_session(seed, client):
+        res = await client.post("/data/sessions", params={"window": 100})
+        session_id = res.json()["session_id"]
+        return RequestSpec("DELETE", f"/data/sessions/{session_id}")
+
+    def simple(method: str, path: str, **params: Any):
+        async def build(seed, client):
+            return RequestSpec(method, path.format(seed=seed), params=params or None)
+
+        return build
+
+    return [
+        Scenario("GET /metrics", simple("GET", "/metrics")),
+        Scenario("GET /ready", simple("GET", "/ready")),
+        Scenario("POST /user/login", login),
+        Scenario("POST /user/refresh", refresh),
+        Scenario("POST /user/refresh/revoke", revoke),
+        Scenario("GET /user/profile", simple("GET", "/user/profile")),
+        Scenario("POST /user/profiles", profiles),
+        Scenario("PUT /user/profile/update", update_profile),
+        Scenario("POST /integration/payment", payment),
+        Scenario("POST /integration/payment (idempotent replay)", payment_replay),
+        Scenario("POST /integration/payment/batch", payment_batch),
+        Scenario("POST /integration/crm", crm),
+        Scenario("POST /integration/crm/bulk", crm_bulk),
+        Scenario("POST /integration/crm/async", crm_async),
+        Scenario("POST /integration/payment/async", payment_async),
+        Scenario("GET /outbox/metrics", simple("GET", "/outbox/metrics")),
+        Scenario("GET /outbox/{outbox_id}", simple("GET", "/outbox/{seed.outbox_id}")),
+        Scenario(
+            "GET /analytics/requests/modules",
+            simple("GET", "/analytics/requests/modules"),
+        ),
+        Scenario(
+            "GET /analytics/requests/endpoints",
+            simple("GET", "/analytics/requests/endpoints"),
+        ),
+        Scenario("GET /analytics/activity", simple("GET", "/analytics/activity")),
+        Scenario("POST /data/process", process),
+        Scenario("POST /data/process (msgpack)", process_msgpack),
+        Scenario("POST /data/process/stream", process_stream),
+        Scenario("POST /data/sessions", simple("POST", "/data/sessions", window=100)),
+        Scenario("POST /data/sessions/{session_id}/points", append_points),
+        Scenario(
+            "GET /data/sessions/{session_id}",
+            simple("GET", "/data/sessions/{seed.session_id}"),
+        ),
+        Scenario("DELETE /data/sessions/{session_id}", close_session),
+    ]
+
+
+class Result(NamedTuple):
+    """
+    Measurements of one route at one concurrency level.
+    """
+
+    transport: str
+    route: str
+    concurrency: int
+    requests: int
+    errors: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.transport} {self.route} @{self.concurrency}"
+
+
+async def measure(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    seed: Seed,
+    transport: str,
+    concurrency: int,
+    duration: float,
+    warmup: int,
+) -> Result:
+    """
+    Runs concurrency clients in a closed loop against one route for duration seconds.
+    """
+
+    async def call() -> Tuple[float, bool]:
+        spec = await scenario.build(seed, client)
+        start = time.perf_counter()
+        try:
+            res = await client.request(
+                spec.method,
+                spec.path,
+                params=spec.params,
+                json=spec.json,
+                content=spec.content,
+                headers=spec.headers,
+            )
+            ok = res.status_code == scenario.expected_status
+        except httpx.HTTPError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    for _ in range(warmup):
+        await call()
+
+    samples: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            elapsed, ok = await call()
+            samples.append(elapsed)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    if len(samples) > 1:
+        quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    else:
+        quantiles = (samples or [0.0]) * 99
+    return Result(
+        transport=transport,
+        route=scenario.name,
+        concurrency=concurrency,
+        requests=len(samples),
+        errors=errors,
+        throughput=len(samples) / elapsed,
+        p50=quantiles[49],
+        p95=quantiles[94],
+        p99=quantiles[98],
+    )
+
+
+def print_result(result: Result) -> None:
+    print(
+        f"{result.route:<42}{result.concurrency:>5}{result.throughput:>11,.1f}/s"
+        f"{result.p50 * 1000:>10.2f}{result.p95 * 1000:>10.2f}{result.p99 * 1000:>10.2f}"
+        f"{result.requests:>9}{result.errors:>8}"
+    )
+
+
+async def run_scenarios(
+    client: httpx.AsyncClient, seed: Seed, transport: str, args: argparse.Namespace
+) -> List[Result]:
+    scenarios = _scenarios()
+    if args.routes:
+        selected = {route.strip() for route in args.routes.split(",")}
+        scenarios = [scenario for scenario in scenarios if scenario.name in selected]
+    await seed_server(seed, client)
+    print(f"\n[{transport}]")
+    print(
+        f"{'route':<42}{'conc':>5}{'throughput':>13}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'requests':>9}{'errors':>8}"
+    )
+    results = []
+    for scenario in scenarios:
+        for concurrency in args.concurrency:
+            result = await measure(
+                client,
+                scenario,
+                seed,
+                transport,
+                concurrency,
+                args.duration,
+                args.warmup,
+            )
+            print_result(result)
+            results.append(result)
+    return results
+
+
+async def run_asgi(seed: Seed, args: argparse.Namespace) -> List[Result]:
+    import project.server
+
+    async with project.server.lifespan(project.server.app):
+        await seed_database(seed, args.users)
+        try:
+            transport = httpx.ASGITransport(
+                app=project.server.app, raise_app_exceptions=False
+            )
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench", timeout=60
+            ) as client:
+                return await run_scenarios(client, seed, "asgi", args)
+        finally:
+            await clean_up(seed)
+
+
+async def run_uvicorn(seed: Seed, args: argparse.Namespace) -> List[Result]:
+    import project.server
+
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "project.server:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+        ],
+        env=dict(os.environ),
+    )
+    await project.server.db_client.connect()
+    try:
+        await seed_database(seed, args.users)
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits
+        ) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise SystemExit("uvicorn did not start")
+            return await run_scenarios(client, seed, f"uvicorn-{args.workers}w", args)
+    finally:
+        server.terminate()
+        server.wait()
+        await clean_up(seed)
+        await project.server.db_client.disconnect()
+
+
+def compare(
+    results: List[Result], baseline: Dict[str, Any], max_regression: float
+) -> List[str]:
+    """
+    Lists the results that regressed past max_regression relative to the baseline run.
+
+    Args:
+        results (List[Result]): This run's results.
+        baseline (Dict[str, Any]): The JSON written by an earlier run.
+        max_regression (float): Allowed relative change, e.g. 0.1 for 10%.
+
+    Returns:
+        List[str]: One line per regressed metric; routes missing from the baseline are ignored.
+    """
+    previous = {
+        f"{row['transport']} {row['route']} @{row['concurrency']}": row
+        for row in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        row = previous.get(result.key)
+        if row is None:
+            continue
+        if result.throughput < row["throughput"] * (1 - max_regression):
+            regressions.append(
+                f"{result.key}: throughput {result.throughput:,.1f}/s vs {row['throughput']:,.1f}/s"
+            )
+        if result.p99 > row["p99"] * (1 + max_regression):
+            regressions.append(
+                f"{result.key}: p99 {result.p99 * 1000:.2f} ms vs {row['p99'] * 1000:.2f} ms"
+            )
+    return regressions
+
+
+def write_results(path: str, results: List[Result], args: argparse.Namespace) -> None:
+    document = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "duration": args.duration,
+        "results": [result._asdict() for result in results],
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+def parse_concurrency(value: str) -> List[int]:
+    return [int(level) for level in value.split(",")]
+
+
+async def bench(args: argparse.Namespace) -> List[Result]:
+    random.seed(args.seed)
+    with StubServer(make_stub_app(latency=args.crm_latency)) as crm, StubServer(
+        make_payment_stub_app(latency=args.payment_latency)
+    ) as payment:
+        # Read when project.server is first imported, by run_asgi and run_uvicorn's worker processes alike.
+        os.environ["PAYMENT_GATEWAY_URL"] = payment.url + "/charges"
+        results: List[Result] = []
+        for transport in args.transport:
+            seed = Seed(uuid.uuid4().hex[:8], crm.url + "/contacts")
+            if transport == "asgi":
+                results += await run_asgi(seed, args)
+            else:
+                results += await run_uvicorn(seed, args)
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--transport",
+        type=lambda value: value.split(","),
+        default=["asgi"],
+        help="asgi, uvicorn or asgi,uvicorn",
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=parse_concurrency, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--crm-latency", type=float, default=0.005)
+    parser.add_argument("--payment-latency", type=float, default=0.005)
+    parser.add_argument("--routes", help="comma-separated route names to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline")
+    parser.add_argument("--baseline", help="compare with this earlier run")
+    parser.add_argument("--max-regression", type=float, default=0.1)
+    args = parser.parse_args()
+
+    # The limiter would turn a load test into a 429 test.
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    # Measure warm workers; benchmarks.bench_startup covers the cold start.
+    os.environ.setdefault("STARTUP_WARMUP", "blocking")
+    results = asyncio.run(bench(args))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            write_results(path, results, args)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) past {args.max_regression:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            raise SystemExit(1)
+        print(f"\nno regressions past {args.max_regression:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+import project.config  # noqa: F401  (loads .env before any other module reads its settings)
@@ -0,0 +1,523 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional, Tuple
+
+import prisma
+import prisma.models
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "60"))
+
+# Rows younger than this are left for the next run, so that late inserts (e.g. the batched request log) are not
+# skipped by the watermark.
+ROLLUP_SETTLE_SECONDS = float(os.getenv("ROLLUP_SETTLE_SECONDS", "60"))
+
+ROLLUP_MAX_WINDOW_SECONDS = float(os.getenv("ROLLUP_MAX_WINDOW_SECONDS", "3600"))
+
+ROLLUP_LATENCY_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+GRANULARITIES = ("minute", "hour")
+
+
+class RollupSource(NamedTuple):
+    """
+    An append-only table and the rollup tables maintained from it.
+    """
+
+    name: str
+    table: str
+    minute_table: str
+    hour_table: str
+    rollup_sql: str
+
+
+def _latency_buckets_sql() -> str:
+    bounds = ROLLUP_LATENCY_BOUNDS_MS
+    filters = [f"count(*) FILTER (WHERE ms < {bounds[0]})"]
+    filters += [
+        f"count(*) FILTER (WHERE ms >= {low} AND ms < {high})"
+        for low, high in zip(bounds, bounds[1:])
+    ]
+    filters.append(f"count(*) FILTER (WHERE ms >= {bounds[-1]})")
+    return "ARRAY[" + ", ".join(filters) + "]::int[]"
+
+
+def _api_request_upsert_sql(table: str, unit: str) -> str:
+    return f"""
+    INSERT INTO "{table}" AS t ("bucketStart", endpoint, "moduleId", "userId", "requestCount", "successCount",
+                                "totalResponseTimeMs", "maxResponseTimeMs", "latencyBuckets")
+    SELECT date_trunc('{unit}', created_at), endpoint, module_id, user_id, count(*), count(*) FILTER (WHERE success),
+           sum(ms), max(ms), {_latency_buckets_sql()}
+    FROM source
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT ("bucketStart", endpoint, "moduleId", "userId") DO UPDATE SET
+        "requestCount" = t."requestCount" + EXCLUDED."requestCount",
+        "successCount" = t."successCount" + EXCLUDED."successCount",
+        "totalResponseTimeMs" = t."totalResponseTimeMs" + EXCLUDED."totalResponseTimeMs",
+        "maxResponseTimeMs" = greatest(t."maxResponseTimeMs", EXCLUDED."maxResponseTimeMs"),
+        "latencyBuckets" = ARRAY(
+            SELECT a + b
+            FROM unnest(t."latencyBuckets", EXCLUDED."latencyBuckets") WITH ORDINALITY AS u(a, b, i)
+            ORDER BY i
+        )
+    """
+
+
+def _activity_log_upsert_sql(table: str, unit: str) -> str:
+    return f"""
+    INSERT INTO "{table}" AS t ("bucketStart", "userId", action, count)
+    SELECT date_trunc('{unit}', created_at), user_id, action, count(*)
+    FROM source
+    GROUP BY 1, 2, 3
+    ON CONFLICT ("bucketStart", "userId", action) DO UPDATE SET count = t.count + EXCLUDED.count
+    """
+
+
+def _rollup_sql(source_sql: str, minute_sql: str, hour_sql: str) -> str:
+    # One statement, so the rollups and the watermark move together. Locking the watermark row and requiring it to
+    # still equal $1 makes a concurrent run in another worker a no-op instead of a double count.
+    return f"""
+    WITH watermark AS (
+        SELECT name FROM "RollupWatermark"
+        WHERE name = $3 AND "processedUntil" = $1::timestamp
+        FOR UPDATE
+    ),
+    source AS ({source_sql}),
+    minute AS ({minute_sql}),
+    hour AS ({hour_sql})
+    UPDATE "RollupWatermark" SET "processedUntil" = $2::timestamp, "updatedAt" = now()
+    WHERE name IN (SELECT name FROM watermark)
+    """
+
+
+API_REQUESTS = RollupSource(
+    name="APIRequest",
+    table="APIRequest",
+    minute_table="APIRequestRollupMinute",
+    hour_table="APIRequestRollupHour",
+    rollup_sql=_rollup_sql(
+        """
+        SELECT "createdAt" AS created_at, endpoint, coalesce("moduleId", '') AS module_id,
+               coalesce("userId", '') AS user_id, "responseTimeMs" AS ms, success
+        FROM "APIRequest"
+        WHERE "createdAt" >= $1::timestamp AND "createdAt" < $2::timestamp AND EXISTS (SELECT 1 FROM watermark)
+        """,
+        _api_request_upsert_sql("APIRequestRollupMinute", "minute"),
+        _api_request_upsert_sql("APIRequestRollupHour", "hour"),
+    ),
+)
+
+ACTIVITY_LOGS = RollupSource(
+    name="ActivityLog",
+    table="ActivityLog",
+    minute_table="ActivityLogRollupMinute",
+    hour_table="ActivityLogRollupHour",
+    rollup_sql=_rollup_sql(
+        """
+        SELECT "createdAt" AS created_at, "userId" AS user_id, action
+        FROM "ActivityLog"
+        WHERE "createdAt" >= $1::timestamp AND "createdAt" < $2::timestamp AND EXISTS (SELECT 1 FROM watermark)
+        """,
+        _activity_log_upsert_sql("ActivityLogRollupMinute", "minute"),
+        _activity_log_upsert_sql("ActivityLogRollupHour", "hour"),
+    ),
+)
+
+SOURCES = (API_REQUESTS, ACTIVITY_LOGS)
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _sql_timestamp(value: datetime) -> str:
+    # Prisma stores DateTime as UTC timestamp(3) without time zone.
+    return _utc(value).replace(tzinfo=None).isoformat(timespec="milliseconds")
+
+
+async def _watermark(source: RollupSource, now: datetime) -> datetime:
+    """
+    Returns the source's watermark, starting it at the hour of the oldest row on the first run.
+    """
+    row = await prisma.models.RollupWatermark.prisma().find_unique(
+        where={"name": source.name}
+    )
+    if row is not None:
+        return _utc(row.processedUntil)
+    rows = await prisma.get_client().query_raw(
+        f'SELECT min("createdAt") AS oldest FROM "{source.table}"'
+    )
+    oldest = rows[0]["oldest"] if rows else None
+    start = (
+        _utc(datetime.fromisoformat(oldest.replace("Z", "+00:00"))) if oldest else now
+    )
+    start = start.replace(minute=0, second=0, microsecond=0)
+    row = await prisma.models.RollupWatermark.prisma().upsert(
+        where={"name": source.name},
+        data={
+            "create": {"name": source.name, "processedUntil": start},
+            "update": {},
+        },
+    )
+    return _utc(row.processedUntil)
+
+
+async def roll_up(
+    source: RollupSource,
+    settle_seconds: float = ROLLUP_SETTLE_SECONDS,
+    max_window_seconds: float = ROLLUP_MAX_WINDOW_SECONDS,
+) -> int:
+    """
+    Folds the rows of source created since its watermark into the minute and hour rollups.
+
+    Rows are processed in windows of at most max_window_seconds up to settle_seconds ago, each window in a single
+    statement that also advances the watermark.
+
+    Args:
+        source (RollupSource): The table to roll up.
+        settle_seconds (float): How old a row must be before it is rolled up.
+        max_window_seconds (float): The longest span of rows folded in one statement.
+
+    Returns:
+        int: The number of windows processed.
+    """
+    now = datetime.now(timezone.utc)
+    until = now - timedelta(seconds=settle_seconds)
+    watermark = await _watermark(source, now)
+    windows = 0
+    while watermark < until:
+        end = min(watermark + timedelta(seconds=max_window_seconds), until)
+        advanced = await prisma.get_client().execute_raw(
+            source.rollup_sql,
+            _sql_timestamp(watermark),
+            _sql_timestamp(end),
+            source.name,
+        )
+        if advanced:
+            windows += 1
+            watermark = end
+        else:
+            # Another worker moved the watermark; continue from wherever it is now.
+            current = await _watermark(source, now)
+            if current <= watermark:
+                logger.warning("Watermark of %s did not advance", source.name)
+                break
+            watermark = current
+    return windows
+
+
+class RollupJob:
+    """
+    Background task that keeps the rollup tables up to date.
+
+    Every interval it rolls up each source from its watermark. Runs in all workers are safe: the watermark check in
+    the rollup statement makes all but one of any concurrent runs a no-op.
+    """
+
+    def __init__(self, interval: float = ROLLUP_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> None:
+        for source in SOURCES:
+            try:
+                windows = await roll_up(source)
+                if windows:
+                    logger.info("Rolled up %d window(s) of %s", windows, source.name)
+            except Exception:
+                logger.exception("Failed to roll up %s", source.name)
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rollup_job = RollupJob()
+
+
+class ModuleRequestsPoint(BaseModel):
+    """
+    Request counts for one module in one time bucket.
+    """
+
+    bucket_start: datetime
+    module: str
+    requests: int
+    successes: int
+    avg_response_time_ms: float
+
+
+class ModuleRequestsResponse(BaseModel):
+    """
+    Requests per module per bucket, ordered by bucket and module.
+    """
+
+    granularity: str
+    points: List[ModuleRequestsPoint]
+
+
+class EndpointLatency(BaseModel):
+    """
+    Aggregated request statistics for one endpoint over the requested range.
+    """
+
+    endpoint: str
+    requests: int
+    success_rate: float
+    avg_response_time_ms: float
+    p95_response_time_ms: float
+    max_response_time_ms: int
+
+
+class EndpointLatencyResponse(BaseModel):
+    """
+    Per-endpoint request statistics, busiest endpoint first.
+    """
+
+    granularity: str
+    endpoints: List[EndpointLatency]
+
+
+class ActivityPoint(BaseModel):
+    """
+    The number of times an action was logged in one time bucket.
+    """
+
+    bucket_start: datetime
+    action: str
+    count: int
+
+
+class ActivityResponse(BaseModel):
+    """
+    Activity counts per action per bucket, ordered by bucket and action.
+    """
+
+    granularity: str
+    points: List[ActivityPoint]
+
+
+def _range(
+    granularity: str, start: Optional[datetime], end: Optional[datetime]
+) -> Tuple[str, str]:
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}.")
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if start >= end:
+        raise ValueError("start must be before end.")
+    return _sql_timestamp(start), _sql_timestamp(end)
+
+
+def latency_quantile(buckets: List[int], q: float, max_ms: int) -> float:
+    """
+    Estimates a latency quantile from rolled-up bucket counts.
+
+    Args:
+        buckets (List[int]): Request counts per ROLLUP_LATENCY_BOUNDS_MS bucket, plus the overflow bucket.
+        q (float): The quantile between 0 and 1.
+        max_ms (int): The slowest request seen, reported for the overflow bucket.
+
+    Returns:
+        float: The upper bound in milliseconds of the bucket holding the quantile.
+    """
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    seen = 0
+    for bound, count in zip(ROLLUP_LATENCY_BOUNDS_MS, buckets):
+        seen += count
+        if seen >= q * total:
+            return float(min(bound, max_ms))
+    return float(max_ms)
+
+
+async def get_module_requests(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> ModuleRequestsResponse:
+    """
+    Returns requests per module per minute or hour, read from the request rollups.
+
+    Args:
+        granularity (str): "minute" or "hour".
+        start (Optional[datetime]): The first bucket to include. Defaults to one day before end.
+        end (Optional[datetime]): The end of the range, exclusive. Defaults to now.
+
+    Returns:
+        ModuleRequestsResponse: One point per bucket and module.
+
+    Raises:
+        ValueError: If the granularity or range is invalid.
+    """
+    start_ts, end_ts = _range(granularity, start, end)
+    table = (
+        API_REQUESTS.minute_table
+        if granularity == "minute"
+        else API_REQUESTS.hour_table
+    )
+    rows = await prisma.get_client().query_raw(
+        f"""
+        SELECT r."bucketStart" AS bucket_start, coalesce(m.name::text, 'UNKNOWN') AS module,
+               sum(r."requestCount")::bigint AS requests, sum(r."successCount")::bigint AS successes,
+               sum(r."totalResponseTimeMs")::bigint AS total_ms
+        FROM "{table}" r
+        LEFT JOIN "Module" m ON m.id = r."moduleId"
+        WHERE r."bucketStart" >= $1::timestamp AND r."bucketStart" < $2::timestamp
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+        start_ts,
+        end_ts,
+    )
+    return ModuleRequestsResponse(
+        granularity=granularity,
+        points=[
+            ModuleRequestsPoint(
+                bucket_start=row["bucket_start"],
+                module=row["module"],
+                requests=row["requests"],
+                successes=row["successes"],
+                avg_response_time_ms=row["total_ms"] / row["requests"],
+            )
+            for row in rows
+        ],
+    )
+
+
+async def get_endpoint_latency(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> EndpointLatencyResponse:
+    """
+    Returns request count, success rate and latency per endpoint, read from the request rollups.
+
+    The p95 is estimated from the rolled-up latency buckets and reported as the upper bound of its bucket.
+
+    Args:
+        granularity (str): "minute" or "hour"; minute rollups allow a finer range.
+        start (Optional[datetime]): The first bucket to include. Defaults to one day before end.
+        end (Optional[datetime]): The end of the range, exclusive. Defaults to now.
+
+    Returns:
+        EndpointLatencyResponse: One entry per endpoint.
+
+    Raises:
+        ValueError: If the granularity or range is invalid.
+    """
+    start_ts, end_ts = _range(granularity, start, end)
+    table = (
+        API_REQUESTS.minute_table
+        if granularity == "minute"
+        else API_REQUESTS.hour_table
+    )
+    rows = await prisma.get_client().query_raw(
+        f"""
+        WITH rollups AS (
+            SELECT * FROM "{table}"
+            WHERE "bucketStart" >= $1::timestamp AND "bucketStart" < $2::timestamp
+        ),
+        totals AS (
+            SELECT endpoint, sum("requestCount")::bigint AS requests, sum("successCount")::bigint AS successes,
+                   sum("totalResponseTimeMs")::bigint AS total_ms, max("maxResponseTimeMs") AS max_ms
+            FROM rollups
+            GROUP BY endpoint
+        ),
+        buckets AS (
+            SELECT endpoint, array_agg(count ORDER BY i) AS latency_buckets
+            FROM (
+                SELECT endpoint, i, sum(c)::bigint AS count
+                FROM rollups, unnest("latencyBuckets") WITH ORDINALITY AS u(c, i)
+                GROUP BY endpoint, i
+            ) per_bucket
+            GROUP BY endpoint
+        )
+        SELECT * FROM totals JOIN buckets USING (endpoint)
+        ORDER BY requests DESC, endpoint
+        """,
+        start_ts,
+        end_ts,
+    )
+    return EndpointLatencyResponse(
+        granularity=granularity,
+        endpoints=[
+            EndpointLatency(
+                endpoint=row["endpoint"],
+                requests=row["requests"],
+                success_rate=row["successes"] / row["requests"],
+                avg_response_time_ms=row["total_ms"] / row["requests"],
+                p95_response_time_ms=latency_quantile(
+                    row["latency_buckets"], 0.95, row["max_ms"]
+                ),
+                max_response_time_ms=row["max_ms"],
+            )
+            for row in rows
+        ],
+    )
+
+
+async def get_activity(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+) -> ActivityResponse:
+    """
+    Returns activity counts per action per minute or hour, read from the activity rollups.
+
+    Args:
+        granularity (str): "minute" or "hour".
+        start (Optional[datetime]): The first bucket to include. Defaults to one day before end.
+        end (Optional[datetime]): The end of the range, exclusive. Defaults to now.
+        user_id (Optional[str]): Restrict the counts to one user.
+
+    Returns:
+        ActivityResponse: One point per bucket and action.
+
+    Raises:
+        ValueError: If the granularity or range is invalid.
+    """
+    start_ts, end_ts = _range(granularity, start, end)
+    table = (
+        ACTIVITY_LOGS.minute_table
+        if granularity == "minute"
+        else ACTIVITY_LOGS.hour_table
+    )
+    rows = await prisma.get_client().query_raw(
+        f"""
+        SELECT "bucketStart" AS bucket_start, action, sum(count)::bigint AS count
+        FROM "{table}"
+        WHERE "bucketStart" >= $1::timestamp AND "bucketStart" < $2::timestamp AND ($3 = '' OR "userId" = $3)
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+        start_ts,
+        end_ts,
+        user_id or "",
+    )
+    return ActivityResponse(
+        granularity=granularity,
+        points=[ActivityPoint(**row) for row in rows],
+    )
@@ -0,0 +1,7 @@
+import dotenv
+
+# Every module reads its settings into module-level constants when it is imported, so the .env files must be loaded
+# before any of them; project/__init__.py imports this module first for that reason. Variables already set in the
+# environment take precedence over the files. Prisma reads the same files when a client is created.
+dotenv.load_dotenv(".env")
+dotenv.load_dotenv("prisma/.env")
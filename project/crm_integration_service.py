@@ -1,6 +1,10 @@
-from typing import Dict, Optional
+import asyncio
+import os
+from typing import Dict, List, Optional
 
 import httpx
+import project.http_client_pool
+import project.rate_limiting
 from pydantic import BaseModel
 
 
@@ -25,11 +29,54 @@ class CrmIntegrationResponse(BaseModel):
     integration_id: Optional[str] = None
 
 
+class CrmBulkIntegrationItem(BaseModel):
+    """
+    A single CRM integration request within a bulk sync.
+    """
+
+    crm_type: str
+    api_key: str
+    integration_details: CrmIntegrationDetails
+
+
+class CrmBulkIntegrationResponse(BaseModel):
+    """
+    Response model for the bulk CRM integration endpoint. Holds one result per submitted item, in submission order.
+    """
+
+    results: List[CrmIntegrationResponse]
+    succeeded: int
+    failed: int
+
+
+CRM_BULK_MAX_ITEMS = int(os.getenv("CRM_BULK_MAX_ITEMS", "1000"))
+
+CRM_BULK_MAX_CONCURRENCY = int(os.getenv("CRM_BULK_MAX_CONCURRENCY", "32"))
+
+CRM_RATE_LIMIT_PER_SECOND = float(os.getenv("CRM_RATE_LIMIT_PER_SECOND", "50"))
+
+CRM_RATE_LIMIT_BURST = float(os.getenv("CRM_RATE_LIMIT_BURST", "50"))
+
+CRM_RATE_LIMIT_MAX_ORIGINS = int(os.getenv("CRM_RATE_LIMIT_MAX_ORIGINS", "1024"))
+
+CRM_RATE_LIMIT_IDLE_TTL = float(os.getenv("CRM_RATE_LIMIT_IDLE_TTL", "60"))
+
+# One bucket per CRM origin (scheme, host, port), so varying the path or query string of api_endpoint shares the
+# same limit instead of getting a fresh bucket.
+endpoint_rate_limits = project.rate_limiting.TokenBucketRegistry(
+    CRM_RATE_LIMIT_PER_SECOND,
+    CRM_RATE_LIMIT_BURST,
+    CRM_RATE_LIMIT_MAX_ORIGINS,
+    CRM_RATE_LIMIT_IDLE_TTL,
+)
+
+
 async def crm_integration(
     user_id: str,
     crm_type: str,
     api_key: str,
     integration_details: CrmIntegrationDetails,
+    idempotency_key: Optional[str] = None,
 ) -> CrmIntegrationResponse:
     """
     Integrate with external CRM systems to exchange data.
@@ -39,39 +86,90 @@ async def crm_integration(
         crm_type (str): Type of the CRM system (e.g., Salesforce, HubSpot) to integrate with.
         api_key (str): API key or access token for authenticating with the CRM system.
         integration_details (CrmIntegrationDetails): Detailed parameters and configuration settings specific to the CRM type.
+        idempotency_key (Optional[str]): Sent as the Idempotency-Key header so the CRM can deduplicate retried calls.
 
     Returns:
         CrmIntegrationResponse: Response model for CRM integration endpoint. Indicates success or failure of the integration request.
     """
-    async with httpx.AsyncClient() as client:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        body = {
-            "username": integration_details.user_name,
-            "password": integration_details.password,
-            **integration_details.custom_fields,
-        }
-        try:
-            response = await client.post(
-                integration_details.api_endpoint, json=body, headers=headers
+    client = project.http_client_pool.client_for(integration_details.api_endpoint)
+    headers = {"Authorization": f"Bearer {api_key}"}
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+    body = {
+        "username": integration_details.user_name,
+        "password": integration_details.password,
+        **integration_details.custom_fields,
+    }
+    try:
+        response = await client.post(
+            integration_details.api_endpoint, json=body, headers=headers
+        )
+        if response.status_code == 200:
+            integration_id = response.json().get("id")
+            return CrmIntegrationResponse(
+                integration_status="Success",
+                message="Integration successfully established.",
+                integration_id=integration_id,
             )
-            if response.status_code == 200:
-                integration_id = response.json().get("id")
-                return CrmIntegrationResponse(
-                    integration_status="Success",
-                    message="Integration successfully established.",
-                    integration_id=integration_id,
-                )
-            else:
-                return CrmIntegrationResponse(
-                    integration_status="Failed",
-                    message=f"CRM integration failed with status code {response.status_code}. Response: {response.text}",
-                )
-        except httpx.HTTPError as e:
+        else:
             return CrmIntegrationResponse(
                 integration_status="Failed",
-                message=f"CRM integration failed due to HTTP Error: {str(e)}",
+                message=f"CRM integration failed with status code {response.status_code}. Response: {response.text}",
             )
+    except httpx.HTTPError as e:
+        return CrmIntegrationResponse(
+            integration_status="Failed",
+            message=f"CRM integration failed due to HTTP Error: {str(e)}",
+        )
     return CrmIntegrationResponse(
         integration_status="Failed",
         message="CRM integration failed due to an unknown error.",
     )
+
+
+async def crm_bulk_integration(
+    user_id: str, items: List[CrmBulkIntegrationItem]
+) -> CrmBulkIntegrationResponse:
+    """
+    Sends many CRM integration payloads concurrently.
+
+    At most CRM_BULK_MAX_CONCURRENCY calls are in flight at once, and calls to each api_endpoint are paced by a shared
+    token bucket (CRM_RATE_LIMIT_PER_SECOND, bursting to CRM_RATE_LIMIT_BURST) so the CRM sets the throughput. A
+    failing item never aborts the batch; it is reported as a failed result.
+
+    Args:
+        user_id (str): The ID of the user within the system who is setting up the integrations.
+        items (List[CrmBulkIntegrationItem]): The integration payloads to send.
+
+    Returns:
+        CrmBulkIntegrationResponse: One result per item, in submission order, with success and failure counts.
+
+    Raises:
+        ValueError: If more than CRM_BULK_MAX_ITEMS items are submitted.
+    """
+    if len(items) > CRM_BULK_MAX_ITEMS:
+        raise ValueError(f"At most {CRM_BULK_MAX_ITEMS} items can be synced at once.")
+    semaphore = asyncio.Semaphore(CRM_BULK_MAX_CONCURRENCY)
+
+    async def integrate(item: CrmBulkIntegrationItem) -> CrmIntegrationResponse:
+        async with semaphore:
+            try:
+                await endpoint_rate_limits.bucket_for(
+                    project.http_client_pool.origin_of(
+                        item.integration_details.api_endpoint
+                    )
+                ).acquire()
+                return await crm_integration(
+                    user_id, item.crm_type, item.api_key, item.integration_details
+                )
+            except Exception as e:
+                return CrmIntegrationResponse(
+                    integration_status="Failed",
+                    message=f"CRM integration failed: {str(e)}",
+                )
+
+    results = await asyncio.gather(*(integrate(item) for item in items))
+    succeeded = sum(1 for result in results if result.integration_status == "Success")
+    return CrmBulkIntegrationResponse(
+        results=results, succeeded=succeeded, failed=len(results) - succeeded
+    )
@@ -0,0 +1,98 @@
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """
+    Coalesces concurrent single-key lookups into batched loads, in the style of the DataLoader pattern.
+
+    Every load() issued during the same event-loop tick is collected and handed to batch_load in one call once the
+    tick ends. Keys are deduplicated, and a key that is already being loaded joins the in-flight load instead of
+    being fetched again, so N concurrent reads of overlapping keys cost one query. Results are not cached beyond
+    the in-flight load; put a cache in front of the loader for that.
+    """
+
+    def __init__(
+        self,
+        batch_load: Callable[[List[K]], Awaitable[Dict[K, V]]],
+        max_batch_size: int = 1000,
+    ):
+        """
+        Args:
+            batch_load (Callable[[List[K]], Awaitable[Dict[K, V]]]): Loads many keys at once and returns the values
+                found, keyed by key. Keys missing from the result resolve to None.
+            max_batch_size (int): The most keys passed to a single batch_load call.
+        """
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self._pending: Dict[K, "asyncio.Future[Optional[V]]"] = {}
+        self._in_flight: Dict[K, "asyncio.Future[Optional[V]]"] = {}
+        self._scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: K) -> Optional[V]:
+        """
+        Queues key for the next batch and waits for its value.
+
+        Cancelling one caller does not cancel the load for the other callers waiting on the same key.
+
+        Args:
+            key (K): The key to load.
+
+        Returns:
+            Optional[V]: The loaded value, or None if batch_load did not return one.
+        """
+        future = self._pending.get(key) or self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: List[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        self._scheduled = False
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for start in range(0, len(keys), self.max_batch_size):
+            batch = {
+                key: pending[key] for key in keys[start : start + self.max_batch_size]
+            }
+            self._in_flight.update(batch)
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: Dict[K, "asyncio.Future[Optional[V]]"]) -> None:
+        self.batches += 1
+        try:
+            values = await self.batch_load(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(values.get(key))
+        finally:
+            for key in batch:
+                self._in_flight.pop(key, None)
@@ -0,0 +1,247 @@
+import logging
+import os
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import prisma
+from project.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Connections per query engine, i.e. per worker process. Empty keeps Prisma's default (2 * CPUs + 1).
+DATABASE_POOL_SIZE = os.getenv("DATABASE_POOL_SIZE", "")
+
+# Seconds a query waits for a free connection before failing; 0 waits forever.
+DATABASE_POOL_TIMEOUT = int(os.getenv("DATABASE_POOL_TIMEOUT", "10"))
+
+DATABASE_CONNECT_TIMEOUT = int(os.getenv("DATABASE_CONNECT_TIMEOUT", "5"))
+
+# Read-only replica for read-heavy lookups. Empty sends every query to the primary.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+
+DATABASE_REPLICA_POOL_SIZE = os.getenv("DATABASE_REPLICA_POOL_SIZE", "")
+
+# How long reads for a user stay on the primary after a write for that user; should exceed the replication lag.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+READ_YOUR_WRITES_CACHE_SIZE = int(os.getenv("READ_YOUR_WRITES_CACHE_SIZE", "100000"))
+
+
+def with_pool_params(
+    url: str,
+    connection_limit: Optional[int] = None,
+    pool_timeout: Optional[int] = None,
+    connect_timeout: Optional[int] = None,
+) -> str:
+    """
+    Adds Prisma's connection pool parameters to a database URL.
+
+    Parameters already present in the URL take precedence, so a DATABASE_URL tuned by hand is left as it is.
+
+    Args:
+        url (str): A PostgreSQL connection URL.
+        connection_limit (Optional[int]): The maximum number of open connections.
+        pool_timeout (Optional[int]): Seconds to wait for a free connection.
+        connect_timeout (Optional[int]): Seconds to wait for a new connection to open.
+
+    Returns:
+        str: The URL with the parameters that were given and not already set.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    present = {name for name, _ in query}
+    for name, value in (
+        ("connection_limit", connection_limit),
+        ("pool_timeout", pool_timeout),
+        ("connect_timeout", connect_timeout),
+    ):
+        if value is not None and name not in present:
+            query.append((name, str(value)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _pool_size(value: str) -> Optional[int]:
+    return int(value) if value else None
+
+
+def _datasource(url: str, pool_size: Optional[int]) -> Optional[Dict[str, str]]:
+    if not url:
+        return None
+    return {
+        "url": with_pool_params(
+            url, pool_size, DATABASE_POOL_TIMEOUT, DATABASE_CONNECT_TIMEOUT
+        )
+    }
+
+
+_primary_datasource = _datasource(
+    os.getenv("DATABASE_URL", ""), _pool_size(DATABASE_POOL_SIZE)
+)
+
+_replica_datasource = _datasource(
+    DATABASE_REPLICA_URL, _pool_size(DATABASE_REPLICA_POOL_SIZE or DATABASE_POOL_SIZE)
+)
+
+primary = prisma.Prisma(auto_register=True, datasource=_primary_datasource)
+
+replica: Optional[prisma.Prisma] = (
+    prisma.Prisma(datasource=_replica_datasource) if _replica_datasource else None
+)
+
+_recent_writers: TTLCache[str, bool] = TTLCache(
+    READ_YOUR_WRITES_CACHE_SIZE, ttl=READ_YOUR_WRITES_SECONDS
+)
+
+_wrote: ContextVar[bool] = ContextVar("db_wrote", default=False)
+
+_reads: Dict[str, int] = {"primary": 0, "replica": 0}
+
+
+async def connect() -> None:
+    await primary.connect()
+    if replica is not None:
+        await replica.connect()
+
+
+async def disconnect() -> None:
+    if replica is not None and replica.is_connected():
+        await replica.disconnect()
+    await primary.disconnect()
+
+
+def mark_written(user_id: str) -> None:
+    """
+    Records that the current request wrote data belonging to a user.
+
+    For READ_YOUR_WRITES_SECONDS afterwards, reader() sends reads for that user to the primary, as it does for the
+    rest of the current request. This is tracked per worker: a write followed by a read on another worker is only
+    guaranteed to see the write once the replica has caught up.
+
+    Args:
+        user_id (str): The ID of the user whose data was written.
+    """
+    _recent_writers.set(user_id, True)
+    _wrote.set(True)
+
+
+def reader(*user_ids: str) -> prisma.Prisma:
+    """
+    Picks the client for a read-only query.
+
+    Reads go to the replica when one is configured, unless the current request has written or one of the users the
+    read concerns was written recently (see mark_written); those go to the primary so the caller sees its own
+    writes.
+
+    Args:
+        *user_ids (str): The users whose data the query reads, if any.
+
+    Returns:
+        prisma.Prisma: The client to pass to Model.prisma().
+    """
+    if (
+        replica is None
+        or _wrote.get()
+        or any(user_id in _recent_writers for user_id in user_ids)
+    ):
+        _reads["primary"] += 1
+        return primary
+    _reads["replica"] += 1
+    return replica
+
+
+def _connection_limit(datasource: Optional[Dict[str, str]]) -> Optional[int]:
+    if datasource is None:
+        return None
+    limit = dict(parse_qsl(urlsplit(datasource["url"]).query)).get("connection_limit")
+    return int(limit) if limit else None
+
+
+def _clients() -> List[Tuple[str, prisma.Prisma, Optional[Dict[str, str]]]]:
+    clients = [("primary", primary, _primary_datasource)]
+    if replica is not None:
+        clients.append(("replica", replica, _replica_datasource))
+    return clients
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+async def render_metrics() -> str:
+    """
+    Renders the connection pool metrics of the primary and replica clients in the Prometheus text format.
+
+    Prisma's own metrics (open, busy and idle connections, queries waiting for a connection and the time they
+    waited) are labelled with client="primary" or client="replica" and merged into one family each. Configured pool
+    limits and the number of reads routed to each client are added alongside, so saturation can be read as busy
+    connections against the limit. A client whose metrics cannot be read is skipped.
+
+    Returns:
+        str: Metric families to append to a /metrics scrape.
+    """
+    families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def add(name: str, kind: str, description: str, sample: str) -> None:
+        family = families.setdefault(name, (kind, description, []))
+        family[2].append(sample)
+
+    for client_name, client, datasource in _clients():
+        limit = _connection_limit(datasource)
+        if limit is not None:
+            add(
+                "prisma_pool_connections_limit",
+                "gauge",
+                "Configured maximum number of pool connections.",
+                f'prisma_pool_connections_limit{{client="{client_name}"}} {limit}',
+            )
+        add(
+            "db_reads_routed_total",
+            "counter",
+            "Read-only queries routed to each client.",
+            f'db_reads_routed_total{{client="{client_name}"}} {_reads[client_name]}',
+        )
+        if not client.is_connected():
+            continue
+        try:
+            client_metrics = await client.get_metrics()
+        except Exception as e:
+            logger.warning(
+                "Failed to read Prisma metrics from the %s: %s", client_name, e
+            )
+            continue
+        for kind, entries in (
+            ("counter", client_metrics.counters),
+            ("gauge", client_metrics.gauges),
+        ):
+            for metric in entries:
+                labels = _labels({**metric.labels, "client": client_name})
+                add(
+                    metric.key,
+                    kind,
+                    metric.description,
+                    f"{metric.key}{{{labels}}} {metric.value}",
+                )
+        for metric in client_metrics.histograms:
+            labels = _labels({**metric.labels, "client": client_name})
+            samples = []
+            cumulative = 0
+            for max_value, count in metric.value.buckets:
+                cumulative += count
+                samples.append(
+                    f'{metric.key}_bucket{{{labels},le="{max_value}"}} {cumulative}'
+                )
+            samples += [
+                f'{metric.key}_bucket{{{labels},le="+Inf"}} {metric.value.count}',
+                f"{metric.key}_sum{{{labels}}} {metric.value.sum}",
+                f"{metric.key}_count{{{labels}}} {metric.value.count}",
+            ]
+            for sample in samples:
+                add(metric.key, "histogram", metric.description, sample)
+
+    lines: List[str] = []
+    for name, (kind, description, samples) in families.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines += samples
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,165 @@
+import asyncio
+import copy
+import decimal
+from typing import Any, Callable
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.fields import ModelField
+from starlette.responses import JSONResponse, Response
+
+
+def _default(value: Any) -> Any:
+    # Called by orjson for every object it cannot serialize natively; pydantic models are emitted field by field
+    # without building a dict of their nested models first.
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializes content to JSON with orjson.
+
+    Pydantic models, datetimes, enums, dataclasses and numpy values are written directly; anything else orjson does
+    not support goes through jsonable_encoder. The output matches FastAPI's default JSONResponse byte for byte for
+    the models used in this API, with two exceptions: NaN and infinite floats are written as null (the default
+    encoder rejects them), and floats written with an exponent drop its "+" sign and leading zeros (1e16, not
+    1e+16), which parses to the same number.
+
+    Args:
+        content (Any): The value to serialize.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. Accepts pydantic models as content as well as plain JSON-compatible values.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def validate_response(field: ModelField, content: Any) -> Any:
+    """
+    Validates an endpoint's return value against its response model the way FastAPI does, without encoding it.
+
+    Args:
+        field (ModelField): The route's response field.
+        content (Any): The value returned by the endpoint.
+
+    Returns:
+        Any: The validated value, typically an instance of the response model.
+
+    Raises:
+        ValidationError: If content does not match the response model.
+    """
+    if isinstance(content, BaseModel):
+        content = content.dict(by_alias=True)
+    value, errors = field.validate(content, {}, loc=("response",))
+    if isinstance(errors, ErrorWrapper):
+        errors = [errors]
+    if errors:
+        raise ValidationError(errors, field.type_)
+    return value
+
+
+TRUSTED_RESPONSE_ATTRIBUTE = "__trusted_response__"
+
+
+def trusted_response(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Marks an endpoint whose response model instances are built by trusted code and need no re-validation.
+
+    Services behind such endpoints may build their responses with Model.construct() from values they computed or
+    read from the database. When the endpoint returns an instance of its response model, FastJSONRoute serializes
+    it as is instead of validating it again; any other return value is validated as usual. Apply it below the
+    route decorator.
+
+    Args:
+        endpoint (Callable[..., Any]): The endpoint function.
+
+    Returns:
+        Callable[..., Any]: The same function, marked.
+    """
+    setattr(endpoint, TRUSTED_RESPONSE_ATTRIBUTE, True)
+    return endpoint
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route class that serializes validated response models straight to JSON.
+
+    FastAPI's default path validates the endpoint's return value, converts the result to a dict with
+    jsonable_encoder and then encodes the dict with the json module. For routes whose response class is a
+    FastJSONResponse, this route validates the same way but hands the validated model to the response, which
+    encodes it with orjson in one pass. Endpoints marked with trusted_response also skip the validation when they
+    return an instance of the response model. Routes using response_model_include/exclude options, sync endpoints
+    and endpoints that return a Response themselves behave exactly as before.
+    """
+
+    def _serializes_directly(self) -> bool:
+        response_class = getattr(self.response_class, "value", self.response_class)
+        return (
+            self.response_field is not None
+            and isinstance(response_class, type)
+            and issubclass(response_class, FastJSONResponse)
+            and self.response_model_include is None
+            and self.response_model_exclude is None
+            and not self.response_model_exclude_unset
+            and not self.response_model_exclude_defaults
+            and not self.response_model_exclude_none
+            and asyncio.iscoroutinefunction(self.dependant.call)
+        )
+
+    def _serializing_call(self, call: Callable[..., Any]) -> Callable[..., Any]:
+        response_class = getattr(self.response_class, "value", self.response_class)
+        field = self.secure_cloned_response_field or self.response_field
+        status_code = self.status_code
+        trusted_type = (
+            self.response_model
+            if getattr(self.endpoint, TRUSTED_RESPONSE_ATTRIBUTE, False)
+            and isinstance(self.response_model, type)
+            else None
+        )
+
+        async def serializing_call(**values: Any) -> Any:
+            content = await call(**values)
+            if isinstance(content, Response):
+                return content
+            if trusted_type is not None and isinstance(content, trusted_type):
+                value = content
+            else:
+                value = validate_response(field, content)
+            if status_code is None:
+                return response_class(value)
+            return response_class(value, status_code=status_code)
+
+        return serializing_call
+
+    def get_route_handler(self):
+        if not self._serializes_directly():
+            return super().get_route_handler()
+        dependant = self.dependant
+        self.dependant = copy.copy(dependant)
+        self.dependant.call = self._serializing_call(dependant.call)
+        try:
+            return super().get_route_handler()
+        finally:
+            self.dependant = dependant
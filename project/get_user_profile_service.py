@@ -1,9 +1,23 @@
+import asyncio
+import os
 from datetime import datetime
+from typing import Dict, List, Optional
 
 import prisma
 import prisma.models
+import project.db
+import project.user_profile_cache
+from project.data_loader import DataLoader
 from pydantic import BaseModel
 
+USER_PROFILE_BATCH_MAX_IDS = int(os.getenv("USER_PROFILE_BATCH_MAX_IDS", "500"))
+
+USER_LOADER_MAX_BATCH_SIZE = int(os.getenv("USER_LOADER_MAX_BATCH_SIZE", "1000"))
+
+# Placeholder for the ID of the authenticated user until requests carry one. The profile read and the profile update
+# must use the same ID, or the update would never refresh the cached profile the read serves.
+AUTHENTICATED_USER_ID = "authenticated-user-id"
+
 
 class GetUserProfileResponse(BaseModel):
     """
@@ -12,36 +26,140 @@ class GetUserProfileResponse(BaseModel):
 
     id: str
     email: str
-    username: str
+    username: Optional[str] = None
     role: str
     createdAt: datetime
     updatedAt: datetime
 
 
+class GetUserProfilesResponse(BaseModel):
+    """
+    Profiles returned by the batch profile endpoint, in request order, plus the requested IDs that do not exist.
+    """
+
+    profiles: List[GetUserProfileResponse]
+    missing: List[str]
+
+
+class UserNotFoundError(Exception):
+    """
+    Raised when a requested user does not exist.
+    """
+
+    def __init__(self, message: str = "User not found."):
+        super().__init__(message)
+
+
+async def _load_users(user_ids: List[str]) -> Dict[str, prisma.models.User]:
+    users = await prisma.models.User.prisma(project.db.reader(*user_ids)).find_many(
+        where={"id": {"in": user_ids}}
+    )
+    return {user.id: user for user in users}
+
+
+user_loader: DataLoader[str, prisma.models.User] = DataLoader(
+    _load_users, max_batch_size=USER_LOADER_MAX_BATCH_SIZE
+)
+
+
+def build_user_profile_response(user: prisma.models.User) -> GetUserProfileResponse:
+    """
+    Builds the profile response for a User row.
+
+    Args:
+        user (prisma.models.User): The user as read from, or returned by a write to, the database.
+
+    Returns:
+        GetUserProfileResponse: The user's profile.
+    """
+    return GetUserProfileResponse.construct(
+        id=user.id,
+        email=user.email,
+        username=user.username,
+        role=user.role,
+        createdAt=user.createdAt,
+        updatedAt=user.updatedAt,
+    )
+
+
+async def load_user_profile(user_id: str) -> GetUserProfileResponse:
+    """
+    Reads a user's profile from the database, bypassing the profile cache.
+
+    Concurrent loads are coalesced by user_loader into a single find_many.
+
+    Args:
+        user_id (str): The ID of the user to fetch.
+
+    Returns:
+        GetUserProfileResponse: The user's profile.
+
+    Raises:
+        UserNotFoundError: If the user does not exist.
+    """
+    user = await user_loader.load(user_id)
+    if not user:
+        raise UserNotFoundError()
+    return build_user_profile_response(user)
+
+
 async def get_user_profile() -> GetUserProfileResponse:
     """
     Retrieves the profile of the authenticated user
 
+    Profiles are served from project.user_profile_cache and only read from the database on a miss; writes through
+    update_user_profile refresh the cached entry.
+
     Args:
 
     Returns:
         GetUserProfileResponse: This model outlines the structure of the user profile data returned upon successfully fetching the requested user's information.
 
     Note: This example assumes that you have access to the authenticated user's ID through some means (e.g., from a session or token).
-    For this example, a placeholder authenticated user ID is used. In a real scenario, replace 'authenticated_user_id' with actual user identification.
+    For this example, the placeholder AUTHENTICATED_USER_ID is used. In a real scenario, replace it with actual user identification.
     """
-    authenticated_user_id = "authenticated_user_id_here"
-    user = await prisma.models.User.prisma().find_unique(
-        where={"id": authenticated_user_id}
+    return await project.user_profile_cache.profile_cache.get_or_load(
+        AUTHENTICATED_USER_ID, load_user_profile
     )
-    if not user:
-        raise Exception("User not found.")
-    response = GetUserProfileResponse(
-        id=user.id,
-        email=user.email,
-        username="DerivedOrActualUsername",
-        role=user.role,
-        createdAt=user.createdAt,
-        updatedAt=user.updatedAt,
+
+
+async def get_user_profiles(user_ids: List[str]) -> GetUserProfilesResponse:
+    """
+    Retrieves many user profiles at once.
+
+    Cached profiles are served from project.user_profile_cache; all misses are loaded together through
+    user_loader, so the whole request costs at most one query per USER_LOADER_MAX_BATCH_SIZE IDs.
+
+    Args:
+        user_ids (List[str]): The IDs of the users to fetch. Duplicates are returned once.
+
+    Returns:
+        GetUserProfilesResponse: The profiles found, in request order, and the IDs that do not exist.
+
+    Raises:
+        ValueError: If more than USER_PROFILE_BATCH_MAX_IDS distinct IDs are requested.
+    """
+    unique_ids = list(dict.fromkeys(user_ids))
+    if len(unique_ids) > USER_PROFILE_BATCH_MAX_IDS:
+        raise ValueError(
+            f"At most {USER_PROFILE_BATCH_MAX_IDS} user IDs can be fetched at once."
+        )
+    results = await asyncio.gather(
+        *(
+            project.user_profile_cache.profile_cache.get_or_load(
+                user_id, load_user_profile
+            )
+            for user_id in unique_ids
+        ),
+        return_exceptions=True,
     )
-    return response
+    profiles: List[GetUserProfileResponse] = []
+    missing: List[str] = []
+    for user_id, result in zip(unique_ids, results):
+        if isinstance(result, UserNotFoundError):
+            missing.append(user_id)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            profiles.append(result)
+    return GetUserProfilesResponse.construct(profiles=profiles, missing=missing)
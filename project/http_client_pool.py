@@ -0,0 +1,200 @@
+import asyncio
+import http.cookiejar
+import importlib.util
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST = int(
+    os.getenv("HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST", "20")
+)
+
+HTTP_CLIENT_MAX_KEEPALIVE_PER_HOST = int(
+    os.getenv("HTTP_CLIENT_MAX_KEEPALIVE_PER_HOST", "10")
+)
+
+HTTP_CLIENT_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "30"))
+
+HTTP_CLIENT_HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "5"))
+
+HTTP_CLIENT_READ_TIMEOUT = float(os.getenv("HTTP_CLIENT_READ_TIMEOUT", "10"))
+
+HTTP_CLIENT_WRITE_TIMEOUT = float(os.getenv("HTTP_CLIENT_WRITE_TIMEOUT", "10"))
+
+HTTP_CLIENT_POOL_TIMEOUT = float(os.getenv("HTTP_CLIENT_POOL_TIMEOUT", "5"))
+
+# Origins come from user-supplied integration URLs, so the number of clients kept open is capped.
+HTTP_CLIENT_MAX_ORIGINS = int(os.getenv("HTTP_CLIENT_MAX_ORIGINS", "256"))
+
+Origin = Tuple[str, str, int]
+
+
+def origin_of(url: str) -> Origin:
+    """
+    Returns the (scheme, host, port) origin of url, with 0 standing for the scheme's default port.
+    """
+    parsed = httpx.URL(url)
+    return (parsed.scheme, parsed.host, parsed.port or 0)
+
+
+def _no_cookies() -> http.cookiejar.CookieJar:
+    # An empty allow-list rejects every cookie, so a Set-Cookie from one user's integration call is never stored and
+    # sent along with another user's call to the same origin.
+    return http.cookiejar.CookieJar(
+        policy=http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+    )
+
+
+class HttpClientPool:
+    """
+    Application-scoped set of pooled httpx clients for outbound integrations, one client per origin.
+
+    Keeping one client per scheme/host/port gives every remote host its own connection limit, so one slow
+    integration cannot exhaust the connections of another. Connections are kept alive between calls and HTTP/2 is
+    used when enabled and the h2 package is installed. Clients never store cookies, since each one is shared by every
+    user calling that origin. At most max_origins clients are kept; the least recently used one is closed once the
+    requests it may still be serving have timed out. server.lifespan creates the pool with open_pool() and closes it
+    with close_pool().
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_per_host: int = HTTP_CLIENT_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry: float = HTTP_CLIENT_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP_CLIENT_HTTP2,
+        timeout: httpx.Timeout = httpx.Timeout(
+            connect=HTTP_CLIENT_CONNECT_TIMEOUT,
+            read=HTTP_CLIENT_READ_TIMEOUT,
+            write=HTTP_CLIENT_WRITE_TIMEOUT,
+            pool=HTTP_CLIENT_POOL_TIMEOUT,
+        ),
+        max_origins: int = HTTP_CLIENT_MAX_ORIGINS,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the h2 package is not installed")
+            http2 = False
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_per_host,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self.max_origins = max(1, max_origins)
+        self._clients: OrderedDict[Origin, httpx.AsyncClient] = OrderedDict()
+        self._closing: Dict[asyncio.Task, httpx.AsyncClient] = {}
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """
+        Returns the shared client for the origin of url, creating it on first use.
+
+        Args:
+            url (str): Any URL on the remote host.
+
+        Returns:
+            httpx.AsyncClient: The pooled client for that origin. Callers must not close it.
+        """
+        origin = origin_of(url)
+        client = self._clients.get(origin)
+        if client is not None and not client.is_closed:
+            self._clients.move_to_end(origin)
+            return client
+        client = httpx.AsyncClient(
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=self.http2,
+            cookies=_no_cookies(),
+        )
+        self._clients[origin] = client
+        while len(self._clients) > self.max_origins:
+            _, evicted = self._clients.popitem(last=False)
+            self._close_later(evicted)
+        return client
+
+    def _close_later(self, client: httpx.AsyncClient) -> None:
+        # The evicted client may still be serving a request; every phase of one is bounded by the timeouts.
+        grace = sum(
+            seconds
+            for seconds in (
+                self.timeout.connect,
+                self.timeout.read,
+                self.timeout.write,
+                self.timeout.pool,
+            )
+            if seconds is not None
+        )
+
+        async def close() -> None:
+            await asyncio.sleep(grace)
+            await client.aclose()
+
+        task = asyncio.get_running_loop().create_task(close())
+        self._closing[task] = client
+        task.add_done_callback(lambda done: self._closing.pop(done, None))
+
+    async def aclose(self) -> None:
+        """
+        Closes every pooled client and its connections, including evicted clients that are still waiting to close.
+        """
+        clients, self._clients = list(self._clients.values()), OrderedDict()
+        for task, client in list(self._closing.items()):
+            task.cancel()
+            clients.append(client)
+        for client in clients:
+            await client.aclose()
+
+
+http_clients: Optional[HttpClientPool] = None
+
+
+def open_pool() -> HttpClientPool:
+    """
+    Creates the application's client pool, or returns it if it is already open.
+
+    Returns:
+        HttpClientPool: The open pool.
+    """
+    global http_clients
+    if http_clients is None:
+        http_clients = HttpClientPool()
+    return http_clients
+
+
+async def close_pool() -> None:
+    """
+    Closes the application's client pool and every client in it.
+    """
+    global http_clients
+    pool, http_clients = http_clients, None
+    if pool is not None:
+        await pool.aclose()
+
+
+def client_for(url: str) -> httpx.AsyncClient:
+    """
+    Returns the shared client for the origin of url from the application's pool.
+
+    Args:
+        url (str): Any URL on the remote host.
+
+    Returns:
+        httpx.AsyncClient: The pooled client for that origin. Callers must not close it.
+
+    Raises:
+        RuntimeError: If the pool has not been opened with open_pool().
+    """
+    if http_clients is None:
+        raise RuntimeError("The HTTP client pool is not open")
+    return http_clients.client_for(url)
@@ -1,11 +1,16 @@
+import logging
 from datetime import datetime, timedelta
 
-import jwt
 import prisma
 import prisma.models
-from passlib.hash import bcrypt
+import project.db
+import project.instrumentation
+import project.password_hashing
+import project.tokens
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 
 class UserInfo(BaseModel):
     """
@@ -25,15 +30,11 @@ class LoginResponse(BaseModel):
     user_info: UserInfo
 
 
-SECRET_KEY = "YOUR_SECRET_KEY"
-
-JWT_ALGORITHM = "HS256"
-
-
 async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verifies if the provided plain password matches the hashed password by checking if
-    the hash of the plain password is equal to the stored hash.
+    the hash of the plain password is equal to the stored hash. The bcrypt work runs on the
+    password hashing pool so it does not block the event loop.
 
     Args:
         plain_password (str): The plaintext password to verify.
@@ -42,7 +43,38 @@ async def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: Whether the password is correct.
     """
-    return bcrypt.verify(plain_password, hashed_password)
+    return await project.password_hashing.password_hasher.verify(
+        plain_password, hashed_password
+    )
+
+
+async def rehash_password_if_needed(
+    user_id: str, plain_password: str, hashed_password: str
+) -> None:
+    """
+    Replaces a user's stored hash when it was made with a different bcrypt cost than the configured one.
+
+    This only runs when BCRYPT_REHASH_ON_LOGIN is enabled, right after a successful verification, so the cost can be
+    tuned without forcing password resets. Failures are logged and never fail the login.
+
+    Args:
+        user_id (str): The ID of the user who just logged in.
+        plain_password (str): The verified plaintext password.
+        hashed_password (str): The hash currently stored for the user.
+    """
+    hasher = project.password_hashing.password_hasher
+    if not project.password_hashing.BCRYPT_REHASH_ON_LOGIN or not hasher.needs_rehash(
+        hashed_password
+    ):
+        return
+    try:
+        new_hash = await hasher.hash(plain_password)
+        await prisma.models.User.prisma().update(
+            where={"id": user_id}, data={"hash": new_hash}
+        )
+        project.db.mark_written(user_id)
+    except Exception:
+        logger.exception("Failed to rehash password for user %s", user_id)
 
 
 async def login(email: str, password: str) -> LoginResponse:
@@ -60,15 +92,24 @@ async def login(email: str, password: str) -> LoginResponse:
     Raises:
         ValueError: If the email does not exist or the password is incorrect.
     """
-    user = await prisma.models.User.prisma().find_unique(where={"email": email})
-    if user is None or not await verify_password(password, user.hash):
+    with project.instrumentation.phase("db"):
+        user = await prisma.models.User.prisma(project.db.reader()).find_unique(
+            where={"email": email}
+        )
+    if user is None:
+        raise ValueError("Incorrect email or password.")
+    with project.instrumentation.phase("bcrypt"):
+        verified = await verify_password(password, user.hash)
+    if not verified:
         raise ValueError("Incorrect email or password.")
+    with project.instrumentation.phase("rehash"):
+        await rehash_password_if_needed(user.id, password, user.hash)
     payload = {
         "user_id": user.id,
         "role": user.role,
         "exp": datetime.utcnow() + timedelta(days=1),
     }
-    token = jwt.encode(payload, SECRET_KEY, algorithm=JWT_ALGORITHM)
-    return LoginResponse(
-        jwt_token=token, user_info=UserInfo(email=user.email, role=user.role)
+    token = project.tokens.encode_token(payload)
+    return LoginResponse.construct(
+        jwt_token=token, user_info=UserInfo.construct(email=user.email, role=user.role)
     )
@@ -0,0 +1,560 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import prisma
+import prisma.enums
+import prisma.errors
+import prisma.models
+import project.crm_integration_service
+import project.payment_gateway_integration_service
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxEnqueueResponse(BaseModel):
+    """
+    Acknowledgement returned as soon as an outbound call has been queued.
+    """
+
+    outbox_id: str
+    status: str
+
+
+class OutboxStatusResponse(BaseModel):
+    """
+    Current state of a queued outbound call, including its result once delivered.
+    """
+
+    outbox_id: str
+    kind: str
+    status: str
+    attempts: int
+    result: Optional[Dict[str, Any]] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+class OutboxMetricsResponse(BaseModel):
+    """
+    Throughput and lag figures for the outbox workers of this process.
+    """
+
+    enqueued: int
+    succeeded: int
+    failed: int
+    retried: int
+    in_flight: int
+    pending: int
+    oldest_pending_age_seconds: float
+    last_delivery_lag_seconds: float
+    deliveries_per_second: float
+
+
+class OutboxDeliveryError(Exception):
+    """
+    Raised by a handler when the remote system rejected the call. The handler's result is kept on the message.
+    """
+
+    def __init__(self, message: str, result: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.result = result
+
+
+class OutboxIdempotencyConflictError(Exception):
+    """
+    Raised when a user reuses an idempotency key for a call with a different payload.
+    """
+
+    def __init__(
+        self,
+        message: str = "Idempotency key was already used for a different call.",
+    ):
+        super().__init__(message)
+
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "8"))
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "32"))
+
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "1"))
+
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+
+Handler = Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]]
+
+
+async def _deliver_crm_integration(
+    payload: Dict[str, Any], idempotency_key: str
+) -> Dict[str, Any]:
+    response = await project.crm_integration_service.crm_integration(
+        payload["user_id"],
+        payload["crm_type"],
+        payload["api_key"],
+        project.crm_integration_service.CrmIntegrationDetails.parse_obj(
+            payload["integration_details"]
+        ),
+        idempotency_key=idempotency_key,
+    )
+    if response.integration_status != "Success":
+        raise OutboxDeliveryError(response.message, response.dict())
+    return response.dict()
+
+
+async def _deliver_payment(
+    payload: Dict[str, Any], idempotency_key: str
+) -> Dict[str, Any]:
+    response = (
+        await project.payment_gateway_integration_service.payment_gateway_integration(
+            payload["user_id"],
+            payload["amount"],
+            payload["currency"],
+            payload["payment_method"],
+            payload.get("description"),
+            idempotency_key,
+        )
+    )
+    if response.status != "success":
+        raise OutboxDeliveryError(
+            response.error_message or "Payment failed.", response.dict()
+        )
+    return response.dict()
+
+
+HANDLERS: Dict[str, Handler] = {
+    prisma.enums.OutboxKind.CRM_INTEGRATION: _deliver_crm_integration,
+    prisma.enums.OutboxKind.PAYMENT: _deliver_payment,
+}
+
+
+class OutboxMetrics:
+    """
+    In-process counters for the outbox. Delivery rate is measured over a sliding window of recent completions.
+    """
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.enqueued = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.in_flight = 0
+        self.last_delivery_lag = 0.0
+        self._completions: List[float] = []
+
+    def record_completion(self, created_at: datetime) -> None:
+        now = time.monotonic()
+        self._completions.append(now)
+        self.last_delivery_lag = (
+            datetime.now(timezone.utc) - created_at
+        ).total_seconds()
+
+    def deliveries_per_second(self) -> float:
+        cutoff = time.monotonic() - self.window
+        self._completions = [t for t in self._completions if t >= cutoff]
+        return len(self._completions) / self.window
+
+
+metrics = OutboxMetrics()
+
+_wakeup = asyncio.Event()
+
+
+def payload_fingerprint(kind: str, payload: Dict[str, Any]) -> str:
+    """
+    Hashes a call's kind and payload, so a reused idempotency key can be checked against the original call.
+    """
+    encoded = json.dumps([kind, payload], sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+CREDENTIAL_FIELDS = frozenset({"api_key", "password"})
+
+
+def scrub_payload(payload: Any) -> Any:
+    """
+    Returns a copy of a payload with every credential field, at any depth, replaced by None.
+
+    Applied when a message reaches a final state: the handler no longer needs the credentials, and the stored
+    fingerprint is enough to check a reused idempotency key against the original call.
+    """
+    if isinstance(payload, dict):
+        return {
+            k: None if k in CREDENTIAL_FIELDS else scrub_payload(v)
+            for k, v in payload.items()
+        }
+    if isinstance(payload, list):
+        return [scrub_payload(v) for v in payload]
+    return payload
+
+
+async def enqueue(
+    kind: str,
+    payload: Dict[str, Any],
+    user_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> OutboxEnqueueResponse:
+    """
+    Stores an outbound call in the outbox and returns immediately.
+
+    Idempotency keys are scoped to the user. Enqueuing the same call with the same key twice returns the existing
+    message instead of creating a second one, so a client retrying after a timeout never causes a duplicate call;
+    reusing a key for a different call is rejected. The key is also forwarded to the remote system. Credentials in the
+    payload are kept only until the message succeeds or fails for good; they are then scrubbed and only the
+    fingerprint of the original call remains.
+
+    Args:
+        kind (str): The OutboxKind of the call.
+        payload (Dict[str, Any]): The arguments for the call's handler.
+        user_id (Optional[str]): The user the call is made for.
+        idempotency_key (Optional[str]): Client supplied deduplication key. A random key is used if omitted.
+
+    Returns:
+        OutboxEnqueueResponse: The outbox ID and current status of the message.
+
+    Raises:
+        OutboxIdempotencyConflictError: If the user already used the key for a call with a different payload.
+    """
+    key = idempotency_key or uuid.uuid4().hex
+    fingerprint = payload_fingerprint(kind, payload)
+    try:
+        message = await prisma.models.OutboxMessage.prisma().create(
+            data={
+                "kind": kind,
+                "payload": prisma.Json(payload),
+                "idempotencyKey": key,
+                "fingerprint": fingerprint,
+                "maxAttempts": OUTBOX_MAX_ATTEMPTS,
+                "userId": user_id,
+            }
+        )
+        metrics.enqueued += 1
+        _wakeup.set()
+    except prisma.errors.UniqueViolationError:
+        message = await prisma.models.OutboxMessage.prisma().find_first(
+            where={"userId": user_id, "idempotencyKey": key}
+        )
+        if message is None:
+            raise
+        if message.fingerprint is not None and message.fingerprint != fingerprint:
+            raise OutboxIdempotencyConflictError()
+    return OutboxEnqueueResponse(outbox_id=message.id, status=message.status)
+
+
+async def enqueue_crm_integration(
+    user_id: str,
+    crm_type: str,
+    api_key: str,
+    integration_details: project.crm_integration_service.CrmIntegrationDetails,
+    idempotency_key: Optional[str] = None,
+) -> OutboxEnqueueResponse:
+    """
+    Queues a CRM integration call to be delivered by the outbox workers.
+
+    Args:
+        user_id (str): The ID of the user within the system who is setting up the integration.
+        crm_type (str): Type of the CRM system (e.g., Salesforce, HubSpot) to integrate with.
+        api_key (str): API key or access token for authenticating with the CRM system.
+        integration_details (CrmIntegrationDetails): Detailed parameters and configuration settings specific to the CRM type.
+        idempotency_key (Optional[str]): Client supplied deduplication key.
+
+    Returns:
+        OutboxEnqueueResponse: The outbox ID and current status of the message.
+
+    Raises:
+        OutboxIdempotencyConflictError: If the user already used the key for a call with a different payload.
+    """
+    payload = {
+        "user_id": user_id,
+        "crm_type": crm_type,
+        "api_key": api_key,
+        "integration_details": integration_details.dict(),
+    }
+    return await enqueue(
+        prisma.enums.OutboxKind.CRM_INTEGRATION, payload, user_id, idempotency_key
+    )
+
+
+async def enqueue_payment(
+    user_id: str,
+    amount: float,
+    currency: str,
+    payment_method: str,
+    description: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> OutboxEnqueueResponse:
+    """
+    Queues a payment gateway call to be delivered by the outbox workers.
+
+    Args:
+        user_id (str): The unique identifier of the user making the transaction.
+        amount (float): The total amount to be charged in the transaction.
+        currency (str): The currency in which the transaction is being made.
+        payment_method (str): The method of payment chosen by the user (e.g., credit card, PayPal).
+        description (Optional[str]): A brief description of the transaction for the user's reference.
+        idempotency_key (Optional[str]): Client supplied deduplication key.
+
+    Returns:
+        OutboxEnqueueResponse: The outbox ID and current status of the message.
+
+    Raises:
+        OutboxIdempotencyConflictError: If the user already used the key for a call with a different payload.
+    """
+    payload = {
+        "user_id": user_id,
+        "amount": amount,
+        "currency": currency,
+        "payment_method": payment_method,
+        "description": description,
+    }
+    return await enqueue(
+        prisma.enums.OutboxKind.PAYMENT, payload, user_id, idempotency_key
+    )
+
+
+async def get_status(outbox_id: str) -> OutboxStatusResponse:
+    """
+    Looks up the state of a queued outbound call.
+
+    Args:
+        outbox_id (str): The ID returned when the call was enqueued.
+
+    Returns:
+        OutboxStatusResponse: The message status, attempts and result.
+
+    Raises:
+        ValueError: If no message has that ID.
+    """
+    message = await prisma.models.OutboxMessage.prisma().find_unique(
+        where={"id": outbox_id}
+    )
+    if message is None:
+        raise ValueError("Outbox message not found.")
+    return OutboxStatusResponse(
+        outbox_id=message.id,
+        kind=message.kind,
+        status=message.status,
+        attempts=message.attempts,
+        result=message.result,
+        last_error=message.lastError,
+        created_at=message.createdAt,
+        completed_at=message.completedAt,
+    )
+
+
+async def get_metrics() -> OutboxMetricsResponse:
+    """
+    Reports outbox throughput for this process and the current backlog.
+
+    Returns:
+        OutboxMetricsResponse: Counters, backlog size and the age of the oldest pending message.
+    """
+    pending_where = {"status": prisma.enums.OutboxStatus.PENDING}
+    pending = await prisma.models.OutboxMessage.prisma().count(where=pending_where)
+    oldest = await prisma.models.OutboxMessage.prisma().find_first(
+        where=pending_where, order={"createdAt": "asc"}
+    )
+    oldest_age = (
+        (datetime.now(timezone.utc) - oldest.createdAt).total_seconds()
+        if oldest is not None
+        else 0.0
+    )
+    return OutboxMetricsResponse(
+        enqueued=metrics.enqueued,
+        succeeded=metrics.succeeded,
+        failed=metrics.failed,
+        retried=metrics.retried,
+        in_flight=metrics.in_flight,
+        pending=pending,
+        oldest_pending_age_seconds=oldest_age,
+        last_delivery_lag_seconds=metrics.last_delivery_lag,
+        deliveries_per_second=metrics.deliveries_per_second(),
+    )
+
+
+def backoff_delay(attempts: int) -> float:
+    """
+    Exponential backoff with jitter for the given number of attempts already made.
+    """
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxWorkerPool:
+    """
+    Drains the outbox table with a pool of asyncio workers.
+
+    A dispatcher claims due messages in batches by moving them to PROCESSING with a lease; the conditional update
+    makes sure each message is claimed by only one worker across all processes. It only claims as many messages as
+    there are idle workers, so a claimed message starts delivery at once instead of waiting in the queue while its
+    lease runs down. Messages whose lease ran out (for example because their worker crashed) become claimable again.
+    Failed deliveries are retried with exponential backoff until maxAttempts is reached.
+    """
+
+    def __init__(
+        self,
+        workers: int = OUTBOX_WORKERS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        lease_seconds: float = OUTBOX_LEASE_SECONDS,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._queue: "asyncio.Queue[prisma.models.OutboxMessage]" = asyncio.Queue(
+            maxsize=workers
+        )
+        self._idle = asyncio.Semaphore(workers)
+        self._tasks: List[asyncio.Task] = []
+
+    async def _claim_batch(self, limit: int) -> List[prisma.models.OutboxMessage]:
+        now = datetime.now(timezone.utc)
+        due = {
+            "OR": [
+                {
+                    "status": prisma.enums.OutboxStatus.PENDING,
+                    "nextAttemptAt": {"lte": now},
+                },
+                {
+                    "status": prisma.enums.OutboxStatus.PROCESSING,
+                    "lockedUntil": {"lt": now},
+                },
+            ]
+        }
+        candidates = await prisma.models.OutboxMessage.prisma().find_many(
+            where=due, order={"nextAttemptAt": "asc"}, take=limit
+        )
+        lease = now + timedelta(seconds=self.lease_seconds)
+        claimed = []
+        for message in candidates:
+            count = await prisma.models.OutboxMessage.prisma().update_many(
+                where={"id": message.id, **due},
+                data={
+                    "status": prisma.enums.OutboxStatus.PROCESSING,
+                    "lockedUntil": lease,
+                    "attempts": {"increment": 1},
+                },
+            )
+            if count:
+                message.attempts += 1
+                claimed.append(message)
+        return claimed
+
+    async def _reserve_workers(self) -> int:
+        await self._idle.acquire()
+        reserved = 1
+        while reserved < self.batch_size and not self._idle.locked():
+            await self._idle.acquire()
+            reserved += 1
+        return reserved
+
+    async def _dispatch(self) -> None:
+        while True:
+            reserved = await self._reserve_workers()
+            try:
+                batch = await self._claim_batch(reserved)
+            except Exception:
+                logger.exception("Failed to claim outbox messages")
+                batch = []
+            for _ in range(reserved - len(batch)):
+                self._idle.release()
+            for message in batch:
+                self._queue.put_nowait(message)
+            if len(batch) < reserved:
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _deliver(self, message: prisma.models.OutboxMessage) -> None:
+        handler = HANDLERS[message.kind]
+        metrics.in_flight += 1
+        try:
+            result = await handler(message.payload, message.idempotencyKey)
+        except Exception as e:
+            result = e.result if isinstance(e, OutboxDeliveryError) else None
+            await self._record_failure(message, str(e), result)
+        else:
+            await prisma.models.OutboxMessage.prisma().update(
+                where={"id": message.id},
+                data={
+                    "status": prisma.enums.OutboxStatus.SUCCEEDED,
+                    "payload": prisma.Json(scrub_payload(message.payload)),
+                    "result": prisma.Json(result),
+                    "lastError": None,
+                    "lockedUntil": None,
+                    "completedAt": datetime.now(timezone.utc),
+                },
+            )
+            metrics.succeeded += 1
+            metrics.record_completion(message.createdAt)
+        finally:
+            metrics.in_flight -= 1
+
+    async def _record_failure(
+        self,
+        message: prisma.models.OutboxMessage,
+        error: str,
+        result: Optional[Dict[str, Any]],
+    ) -> None:
+        data: Dict[str, Any] = {"lastError": error, "lockedUntil": None}
+        if result is not None:
+            data["result"] = prisma.Json(result)
+        if message.attempts >= message.maxAttempts:
+            data["status"] = prisma.enums.OutboxStatus.FAILED
+            data["payload"] = prisma.Json(scrub_payload(message.payload))
+            data["completedAt"] = datetime.now(timezone.utc)
+            metrics.failed += 1
+            metrics.record_completion(message.createdAt)
+        else:
+            data["status"] = prisma.enums.OutboxStatus.PENDING
+            data["nextAttemptAt"] = datetime.now(timezone.utc) + timedelta(
+                seconds=backoff_delay(message.attempts)
+            )
+            metrics.retried += 1
+        await prisma.models.OutboxMessage.prisma().update(
+            where={"id": message.id}, data=data
+        )
+
+    async def _work(self) -> None:
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            except Exception:
+                logger.exception("Failed to record outbox delivery %s", message.id)
+            finally:
+                self._queue.task_done()
+                self._idle.release()
+
+    def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+worker_pool = OutboxWorkerPool()
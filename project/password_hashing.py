@@ -0,0 +1,129 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from passlib.hash import bcrypt
+
+T = TypeVar("T")
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", str(bcrypt.default_rounds)))
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+BCRYPT_REHASH_ON_LOGIN = os.getenv("BCRYPT_REHASH_ON_LOGIN", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification on a bounded thread pool instead of the event loop.
+
+    The bcrypt backend releases the GIL while it works, so up to max_workers hashes run in parallel while the event
+    loop keeps serving other requests. Calls beyond that wait in the pool queue; queue_depth reports how many.
+    """
+
+    def __init__(
+        self, rounds: int = BCRYPT_ROUNDS, max_workers: int = PASSWORD_HASH_WORKERS
+    ):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self._handler = bcrypt.using(rounds=rounds)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of hash or verify calls waiting for a free worker.
+        """
+        return max(0, self.in_flight - self.max_workers)
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, func, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Checks a plaintext password against a stored bcrypt hash of any cost.
+
+        Args:
+            plain_password (str): The plaintext password to verify.
+            hashed_password (str): The stored bcrypt hash.
+
+        Returns:
+            bool: Whether the password matches.
+        """
+        return await self._run(self._handler.verify, plain_password, hashed_password)
+
+    async def hash(self, plain_password: str) -> str:
+        """
+        Hashes a password with the configured bcrypt cost.
+
+        Args:
+            plain_password (str): The plaintext password to hash.
+
+        Returns:
+            str: The bcrypt hash.
+        """
+        return await self._run(self._handler.hash, plain_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """
+        Tells whether a stored hash was made with a different cost than the configured one.
+
+        Args:
+            hashed_password (str): The stored bcrypt hash.
+
+        Returns:
+            bool: True if the hash should be replaced with one using the configured cost.
+        """
+        return self._handler.needs_update(hashed_password)
+
+    def render(self) -> str:
+        """
+        Renders the pool's load in the Prometheus text format.
+
+        Returns:
+            str: Metric families to append to a /metrics scrape.
+        """
+        lines = [
+            "# HELP bcrypt_workers Threads available for bcrypt hashing and verification.",
+            "# TYPE bcrypt_workers gauge",
+            f"bcrypt_workers {self.max_workers}",
+            "# HELP bcrypt_in_flight Hash or verify calls running or waiting for a worker.",
+            "# TYPE bcrypt_in_flight gauge",
+            f"bcrypt_in_flight {self.in_flight}",
+            "# HELP bcrypt_queue_depth Hash or verify calls waiting for a free worker.",
+            "# TYPE bcrypt_queue_depth gauge",
+            f"bcrypt_queue_depth {self.queue_depth}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    async def warm_up(self) -> None:
+        """
+        Loads the bcrypt backend and starts every worker thread, which otherwise happens on the first logins.
+        """
+        await self._run(self._handler.get_backend)
+        await asyncio.gather(
+            *(self._run(self._handler.get_backend) for _ in range(self.max_workers - 1))
+        )
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker threads once queued calls have finished.
+        """
+        self._pool.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher()
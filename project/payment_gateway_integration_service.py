@@ -1,7 +1,24 @@
-from typing import Optional
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+import prisma
+import prisma.enums
+import prisma.errors
+import prisma.models
+import project.http_client_pool
+from project.ttl_cache import TTLCache
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 
 class PaymentGatewayIntegrationResponse(BaseModel):
     """
@@ -15,32 +32,548 @@ class PaymentGatewayIntegrationResponse(BaseModel):
     currency: str
 
 
+class PaymentBatchItem(BaseModel):
+    """
+    A single charge within a payment batch.
+    """
+
+    user_id: str
+    amount: float
+    currency: str
+    payment_method: str
+    description: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+
+class PaymentBatchResponse(BaseModel):
+    """
+    Response model for the batch payment endpoint. Holds one result per submitted charge, in submission order.
+    """
+
+    results: List[PaymentGatewayIntegrationResponse]
+    succeeded: int
+    failed: int
+
+
+class IdempotencyKeyConflictError(Exception):
+    """
+    Raised when an idempotency key is reused for a charge with different parameters.
+    """
+
+    def __init__(
+        self,
+        message: str = "Idempotency key was already used for a different payment.",
+    ):
+        super().__init__(message)
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """
+    Raised when a charge with the same idempotency key is still being processed by another request.
+    """
+
+    def __init__(
+        self,
+        message: str = "A payment with this idempotency key is still in progress.",
+    ):
+        super().__init__(message)
+
+
+# Payment gateway endpoint. Empty uses the local stub gateway, which approves every charge.
+PAYMENT_GATEWAY_URL = os.getenv("PAYMENT_GATEWAY_URL", "")
+
+PAYMENT_GATEWAY_API_KEY = os.getenv("PAYMENT_GATEWAY_API_KEY", "")
+
+# Simulated round trip of the stub gateway, in seconds.
+PAYMENT_GATEWAY_STUB_LATENCY = float(os.getenv("PAYMENT_GATEWAY_STUB_LATENCY", "0"))
+
+# How long the response to an idempotency key is kept and replayed.
+PAYMENT_IDEMPOTENCY_TTL = float(os.getenv("PAYMENT_IDEMPOTENCY_TTL", "86400"))
+
+# How long a key stays claimed by a charge that has not completed. A claim left behind by a worker that died
+# mid-charge can be taken over after this; the gateway deduplicates the retried charge on the forwarded key.
+PAYMENT_IDEMPOTENCY_CLAIM_TTL = float(os.getenv("PAYMENT_IDEMPOTENCY_CLAIM_TTL", "60"))
+
+PAYMENT_IDEMPOTENCY_CACHE_SIZE = int(
+    os.getenv("PAYMENT_IDEMPOTENCY_CACHE_SIZE", "10000")
+)
+
+PAYMENT_IDEMPOTENCY_SWEEP_INTERVAL = float(
+    os.getenv("PAYMENT_IDEMPOTENCY_SWEEP_INTERVAL", "3600")
+)
+
+PAYMENT_BATCH_MAX_ITEMS = int(os.getenv("PAYMENT_BATCH_MAX_ITEMS", "1000"))
+
+PAYMENT_BATCH_MAX_CONCURRENCY = int(os.getenv("PAYMENT_BATCH_MAX_CONCURRENCY", "32"))
+
+
+class PaymentGateway(abc.ABC):
+    """
+    Backend that performs charges. Implementations must be safe to call concurrently.
+    """
+
+    @abc.abstractmethod
+    async def charge(
+        self,
+        user_id: str,
+        amount: float,
+        currency: str,
+        payment_method: str,
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> PaymentGatewayIntegrationResponse:
+        """
+        Submits one charge.
+
+        A declined charge is returned as a response with a non-success status. Raising means the outcome is unknown
+        (e.g. the gateway could not be reached), so the charge is not recorded under its idempotency key and may be
+        retried with the same key.
+
+        Args:
+            user_id (str): The unique identifier of the user making the transaction.
+            amount (float): The total amount to be charged in the transaction.
+            currency (str): The currency in which the transaction is being made.
+            payment_method (str): The method of payment chosen by the user (e.g., credit card, PayPal).
+            description (Optional[str]): A brief description of the transaction for the user's reference.
+            idempotency_key (Optional[str]): Forwarded to the gateway so it can deduplicate retried charges.
+
+        Returns:
+            PaymentGatewayIntegrationResponse: The gateway's answer.
+        """
+
+
+class StubPaymentGateway(PaymentGateway):
+    """
+    Local gateway that approves every charge after an optional simulated latency. Used when PAYMENT_GATEWAY_URL is
+    not set, in development and in benchmarks.
+    """
+
+    def __init__(self, latency: float = PAYMENT_GATEWAY_STUB_LATENCY):
+        self.latency = latency
+        self.charges = 0
+
+    async def charge(
+        self,
+        user_id: str,
+        amount: float,
+        currency: str,
+        payment_method: str,
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> PaymentGatewayIntegrationResponse:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        self.charges += 1
+        return PaymentGatewayIntegrationResponse(
+            transaction_id=f"TRANS{uuid.uuid4().hex[:12].upper()}",
+            status="success",
+            error_message=None,
+            amount_charged=amount,
+            currency=currency,
+        )
+
+
+class HttpPaymentGateway(PaymentGateway):
+    """
+    Gateway reached over HTTP through the shared client pool.
+
+    Charges are POSTed as JSON with the idempotency key in the Idempotency-Key header. A 2xx answer is expected to
+    carry transaction_id and status (and optionally error_message), and a 4xx answer is reported as a failed charge.
+    A 5xx answer or a transport error raises, since the charge may or may not have happened.
+    """
+
+    def __init__(self, url: str, api_key: str = PAYMENT_GATEWAY_API_KEY):
+        self.url = url
+        self.api_key = api_key
+
+    async def charge(
+        self,
+        user_id: str,
+        amount: float,
+        currency: str,
+        payment_method: str,
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> PaymentGatewayIntegrationResponse:
+        client = project.http_client_pool.client_for(self.url)
+        headers = {}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        body = {
+            "user_id": user_id,
+            "amount": amount,
+            "currency": currency,
+            "payment_method": payment_method,
+            "description": description,
+        }
+        response = await client.post(self.url, json=body, headers=headers)
+        if response.is_server_error:
+            response.raise_for_status()
+        if not response.is_success:
+            return PaymentGatewayIntegrationResponse(
+                transaction_id="",
+                status="failed",
+                error_message=f"Payment gateway returned status code {response.status_code}. Response: {response.text}",
+                amount_charged=0.0,
+                currency=currency,
+            )
+        result = response.json()
+        return PaymentGatewayIntegrationResponse(
+            transaction_id=result["transaction_id"],
+            status=result["status"],
+            error_message=result.get("error_message"),
+            amount_charged=result.get("amount_charged", amount),
+            currency=result.get("currency", currency),
+        )
+
+
+def make_payment_gateway(url: str = PAYMENT_GATEWAY_URL) -> PaymentGateway:
+    """
+    Builds the payment gateway for the configured URL.
+
+    Args:
+        url (str): The gateway's charge endpoint, or an empty string for the stub gateway.
+
+    Returns:
+        PaymentGateway: The HTTP gateway, or the stub if no URL is set.
+    """
+    if not url:
+        return StubPaymentGateway()
+    return HttpPaymentGateway(url)
+
+
+gateway = make_payment_gateway()
+
+
+class StoredPayment(NamedTuple):
+    """
+    The response recorded for an idempotency key, with the fingerprint of the charge it answered.
+    """
+
+    fingerprint: str
+    response: PaymentGatewayIntegrationResponse
+
+
+# Idempotency keys are scoped to the user, so the caches below are keyed by (user ID, key).
+IdempotencyScope = Tuple[str, str]
+
+_stored: TTLCache[IdempotencyScope, StoredPayment] = TTLCache(
+    PAYMENT_IDEMPOTENCY_CACHE_SIZE, ttl=PAYMENT_IDEMPOTENCY_TTL, clock=time.time
+)
+
+_in_flight: Dict[
+    IdempotencyScope,
+    Tuple[str, "asyncio.Future[PaymentGatewayIntegrationResponse]"],
+] = {}
+
+
+def payment_fingerprint(
+    user_id: str,
+    amount: float,
+    currency: str,
+    payment_method: str,
+    description: Optional[str] = None,
+) -> str:
+    """
+    Hashes the parameters of a charge, so a reused idempotency key can be checked against the original charge.
+    """
+    payload = json.dumps([user_id, amount, currency, payment_method, description])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _remember(row: prisma.models.PaymentIdempotencyKey) -> StoredPayment:
+    stored = StoredPayment(
+        row.fingerprint, PaymentGatewayIntegrationResponse.parse_obj(row.response)
+    )
+    _stored.set((row.userId, row.key), stored, expires_at=row.expiresAt.timestamp())
+    return stored
+
+
+async def _load_stored(scopes: List[IdempotencyScope]) -> None:
+    wanted = set(scopes)
+    rows = await prisma.models.PaymentIdempotencyKey.prisma().find_many(
+        where={
+            "userId": {"in": list({user_id for user_id, _ in wanted})},
+            "key": {"in": list({key for _, key in wanted})},
+            "status": prisma.enums.PaymentIdempotencyStatus.COMPLETED,
+            "expiresAt": {"gt": datetime.now(timezone.utc)},
+        }
+    )
+    for row in rows:
+        # The query matches every user/key combination of the batch; keep only the pairs actually asked for.
+        if (row.userId, row.key) in wanted:
+            _remember(row)
+
+
+async def _claim(
+    key: str, fingerprint: str, user_id: str
+) -> Optional[prisma.models.PaymentIdempotencyKey]:
+    """
+    Claims a user's idempotency key for a charge about to be made, by inserting a PENDING record for it.
+
+    Returns:
+        Optional[prisma.models.PaymentIdempotencyKey]: None if the key was claimed, otherwise the live record that
+            already holds it.
+    """
+    for _ in range(2):
+        now = datetime.now(timezone.utc)
+        try:
+            await prisma.models.PaymentIdempotencyKey.prisma().create(
+                data={
+                    "key": key,
+                    "userId": user_id,
+                    "fingerprint": fingerprint,
+                    "status": prisma.enums.PaymentIdempotencyStatus.PENDING,
+                    "createdAt": now,
+                    "expiresAt": now + timedelta(seconds=PAYMENT_IDEMPOTENCY_CLAIM_TTL),
+                }
+            )
+            return None
+        except prisma.errors.UniqueViolationError:
+            row = await prisma.models.PaymentIdempotencyKey.prisma().find_unique(
+                where={"userId_key": {"userId": user_id, "key": key}}
+            )
+            if row is not None and row.expiresAt > now:
+                return row
+            # Expired but not swept yet. The condition keeps a claim another request made since from being removed.
+            await prisma.models.PaymentIdempotencyKey.prisma().delete_many(
+                where={"userId": user_id, "key": key, "expiresAt": {"lte": now}}
+            )
+    raise IdempotencyKeyInProgressError()
+
+
+async def _charge_once(
+    key: str,
+    fingerprint: str,
+    user_id: str,
+    amount: float,
+    currency: str,
+    payment_method: str,
+    description: Optional[str],
+) -> PaymentGatewayIntegrationResponse:
+    row = await _claim(key, fingerprint, user_id)
+    if row is not None:
+        if row.fingerprint != fingerprint:
+            raise IdempotencyKeyConflictError()
+        if row.status != prisma.enums.PaymentIdempotencyStatus.COMPLETED:
+            raise IdempotencyKeyInProgressError()
+        return _remember(row).response
+
+    try:
+        # Prefixed with the user ID so the gateway does not deduplicate two users' charges that share a key.
+        response = await gateway.charge(
+            user_id, amount, currency, payment_method, description, f"{user_id}:{key}"
+        )
+    except BaseException:
+        # The outcome is unknown, so release the claim and let the client retry with the same key.
+        try:
+            await prisma.models.PaymentIdempotencyKey.prisma().delete_many(
+                where={
+                    "userId": user_id,
+                    "key": key,
+                    "status": prisma.enums.PaymentIdempotencyStatus.PENDING,
+                }
+            )
+        except Exception:
+            logger.exception("Failed to release idempotency key %s", key)
+        raise
+    now = datetime.now(timezone.utc)
+    try:
+        row = await prisma.models.PaymentIdempotencyKey.prisma().update(
+            where={"userId_key": {"userId": user_id, "key": key}},
+            data={
+                "status": prisma.enums.PaymentIdempotencyStatus.COMPLETED,
+                "response": prisma.Json(response.dict()),
+                "expiresAt": now + timedelta(seconds=PAYMENT_IDEMPOTENCY_TTL),
+            },
+        )
+    except Exception:
+        row = None
+        logger.exception("Failed to store the response for idempotency key %s", key)
+    if row is None:
+        # The charge went through. Other workers see the claim as in progress until it expires, and a retry after
+        # that reaches the gateway, which deduplicates on the forwarded key.
+        _stored.set((user_id, key), StoredPayment(fingerprint, response))
+        return response
+    return _remember(row).response
+
+
 async def payment_gateway_integration(
     user_id: str,
     amount: float,
     currency: str,
     payment_method: str,
     description: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
 ) -> PaymentGatewayIntegrationResponse:
     """
     Connects to payment gateways to facilitate transactions.
 
+    Idempotency keys are scoped to the user, so two users may use the same key independently. With an idempotency
+    key, the key is claimed in the PaymentIdempotencyKey table before the gateway is called, so only one request
+    across all workers charges it. The response is then recorded on the claim (fronted by an
+    in-process cache) for PAYMENT_IDEMPOTENCY_TTL seconds and returned as-is for every repeat of the key. Concurrent
+    requests with the same key on this worker share the charge; on other workers they fail with
+    IdempotencyKeyInProgressError until it completes. A charge whose outcome is unknown because the gateway call
+    raised releases its claim and can be retried with the same key.
+
     Args:
     user_id (str): The unique identifier of the user making the transaction.
     amount (float): The total amount to be charged in the transaction.
     currency (str): The currency in which the transaction is being made.
     payment_method (str): The method of payment chosen by the user (e.g., credit card, PayPal).
     description (Optional[str]): A brief description of the transaction for the user's reference.
+    idempotency_key (Optional[str]): Client supplied key identifying this charge across retries.
 
     Returns:
     PaymentGatewayIntegrationResponse: Contains the result of the transaction attempt with the payment gateway.
+
+    Raises:
+    IdempotencyKeyConflictError: If the key was already used for a charge with different parameters.
+    IdempotencyKeyInProgressError: If another worker is still charging the key.
     """
-    transaction_id = "TRANS123456789"
-    status = "success"
-    return PaymentGatewayIntegrationResponse(
-        transaction_id=transaction_id,
-        status=status,
-        error_message=None,
-        amount_charged=amount,
-        currency=currency,
+    if not idempotency_key:
+        return await gateway.charge(
+            user_id, amount, currency, payment_method, description
+        )
+    fingerprint = payment_fingerprint(
+        user_id, amount, currency, payment_method, description
     )
+    scope = (user_id, idempotency_key)
+    stored = _stored.get(scope)
+    if stored is not None:
+        if stored.fingerprint != fingerprint:
+            raise IdempotencyKeyConflictError()
+        return stored.response
+
+    in_flight = _in_flight.get(scope)
+    if in_flight is None:
+        future = asyncio.ensure_future(
+            _charge_once(
+                idempotency_key,
+                fingerprint,
+                user_id,
+                amount,
+                currency,
+                payment_method,
+                description,
+            )
+        )
+        _in_flight[scope] = (fingerprint, future)
+        future.add_done_callback(lambda _: _in_flight.pop(scope, None))
+    else:
+        if in_flight[0] != fingerprint:
+            raise IdempotencyKeyConflictError()
+        future = in_flight[1]
+    # Shielded so a client disconnecting mid-charge does not cancel the call other requests are waiting on.
+    return await asyncio.shield(future)
+
+
+async def payment_batch(items: List[PaymentBatchItem]) -> PaymentBatchResponse:
+    """
+    Submits many charges concurrently, e.g. for a settlement job.
+
+    At most PAYMENT_BATCH_MAX_CONCURRENCY charges are in flight at once. Recorded responses for all the batch's
+    idempotency keys are loaded in one query up front, so a retried batch only reaches the gateway for the charges
+    that did not complete before. A failing charge never aborts the batch; it is reported as a failed result.
+
+    Args:
+        items (List[PaymentBatchItem]): The charges to submit.
+
+    Returns:
+        PaymentBatchResponse: One result per charge, in submission order, with success and failure counts.
+
+    Raises:
+        ValueError: If more than PAYMENT_BATCH_MAX_ITEMS charges are submitted.
+    """
+    if len(items) > PAYMENT_BATCH_MAX_ITEMS:
+        raise ValueError(
+            f"At most {PAYMENT_BATCH_MAX_ITEMS} payments can be submitted at once."
+        )
+    scopes = [
+        (item.user_id, item.idempotency_key)
+        for item in items
+        if item.idempotency_key and (item.user_id, item.idempotency_key) not in _stored
+    ]
+    if scopes:
+        try:
+            await _load_stored(scopes)
+        except Exception:
+            logger.exception("Failed to preload idempotency keys")
+    semaphore = asyncio.Semaphore(PAYMENT_BATCH_MAX_CONCURRENCY)
+
+    async def charge(item: PaymentBatchItem) -> PaymentGatewayIntegrationResponse:
+        async with semaphore:
+            try:
+                return await payment_gateway_integration(
+                    item.user_id,
+                    item.amount,
+                    item.currency,
+                    item.payment_method,
+                    item.description,
+                    item.idempotency_key,
+                )
+            except Exception as e:
+                return PaymentGatewayIntegrationResponse(
+                    transaction_id="",
+                    status="failed",
+                    error_message=f"Payment failed: {str(e)}",
+                    amount_charged=0.0,
+                    currency=item.currency,
+                )
+
+    results = await asyncio.gather(*(charge(item) for item in items))
+    succeeded = sum(1 for result in results if result.status == "success")
+    return PaymentBatchResponse(
+        results=results, succeeded=succeeded, failed=len(results) - succeeded
+    )
+
+
+async def sweep_expired_idempotency_keys() -> int:
+    """
+    Deletes every expired idempotency key record in a single bulk statement.
+
+    Returns:
+        int: The number of deleted records.
+    """
+    return await prisma.models.PaymentIdempotencyKey.prisma().delete_many(
+        where={"expiresAt": {"lt": datetime.now(timezone.utc)}}
+    )
+
+
+class IdempotencyKeySweeper:
+    """
+    Background task that periodically bulk-deletes expired idempotency key records.
+    """
+
+    def __init__(self, interval: float = PAYMENT_IDEMPOTENCY_SWEEP_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                deleted = await sweep_expired_idempotency_keys()
+                if deleted:
+                    logger.info("Swept %d expired payment idempotency keys", deleted)
+            except Exception:
+                logger.exception("Failed to sweep expired payment idempotency keys")
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+sweeper = IdempotencyKeySweeper()
@@ -0,0 +1,344 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import msgpack
+import numpy as np
+import project.process_data_executor
+from fastapi.responses import Response
+from project.process_data_service import (
+    DEFAULT_INSIGHT,
+    KEY_METRIC,
+    KEY_METRIC_INSIGHT,
+    RESULT_FACTOR,
+    ProcessDataResponse,
+)
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+MSGPACK_MEDIA_TYPES = (
+    MSGPACK_MEDIA_TYPE,
+    "application/msgpack",
+    "application/vnd.msgpack",
+)
+
+# Largest msgpack request body accepted, in bytes (about 4M points without key metrics). 0 disables the limit.
+PROCESS_DATA_MAX_BODY_BYTES = int(os.getenv("PROCESS_DATA_MAX_BODY_BYTES", "67108864"))
+
+_TIMESTAMP_DTYPE = np.dtype("<i8")
+
+_VALUE_DTYPE = np.dtype("<f8")
+
+_CODE_DTYPE = np.dtype("<u4")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class BinaryColumns(NamedTuple):
+    """
+    Columnar batch decoded from a msgpack request body. The arrays are read-only views of the request body.
+    """
+
+    timestamps: np.ndarray
+    values: np.ndarray
+    key_metrics: Optional[List[Optional[str]]]
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+
+def _media_type(header: str) -> str:
+    return header.split(";", 1)[0].strip().lower()
+
+
+def _quality(media_range: str) -> float:
+    for parameter in media_range.split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def is_msgpack(content_type: str) -> bool:
+    """
+    Tells whether a request content type announces the packed msgpack columnar format.
+
+    Args:
+        content_type (str): The raw Content-Type header value.
+
+    Returns:
+        bool: True for msgpack bodies, False for anything else (treated as JSON).
+    """
+    return _media_type(content_type) in MSGPACK_MEDIA_TYPES
+
+
+def accepts_msgpack(accept: str) -> bool:
+    """
+    Tells whether a client asked for the packed msgpack columnar format in its Accept header.
+
+    Args:
+        accept (str): The raw Accept header value.
+
+    Returns:
+        bool: True if any of the accepted media types is a msgpack one with a non-zero quality (q=0 means "not
+            acceptable"; a malformed q is treated as 0).
+    """
+    return any(
+        is_msgpack(media_range) and _quality(media_range) > 0
+        for media_range in accept.split(",")
+    )
+
+
+def _column(body: Dict[Any, Any], name: str, dtype: np.dtype) -> np.ndarray:
+    raw = body.get(name)
+    if not isinstance(raw, bytes):
+        raise ValueError(f"{name} must be a msgpack bin of {dtype.str} values.")
+    if len(raw) % dtype.itemsize:
+        raise ValueError(
+            f"{name} is {len(raw)} bytes long, not a multiple of {dtype.itemsize}."
+        )
+    return np.frombuffer(raw, dtype=dtype)
+
+
+def decode_columns(body: bytes) -> BinaryColumns:
+    """
+    Decodes a packed msgpack request body into columns without building a model per row.
+
+    The body is a map with a "timestamps" bin of little-endian int64 microseconds since the Unix epoch (UTC), a
+    "values" bin of little-endian float64 and an optional "parameters" map. Only the key_metric parameter affects
+    processing; it is a list with one string or nil per row. Both bins are wrapped as NumPy arrays without copying.
+
+    Args:
+        body (bytes): The raw request body.
+
+    Returns:
+        BinaryColumns: The decoded columns.
+
+    Raises:
+        ValueError: If the body is not valid msgpack or does not follow the layout above.
+    """
+    try:
+        decoded = msgpack.unpackb(body, raw=False)
+    except (msgpack.UnpackException, ValueError) as e:
+        raise ValueError(f"Invalid msgpack body: {str(e) or type(e).__name__}") from e
+    if not isinstance(decoded, dict):
+        raise ValueError("The msgpack body must be a map of columns.")
+    timestamps = _column(decoded, "timestamps", _TIMESTAMP_DTYPE)
+    values = _column(decoded, "values", _VALUE_DTYPE)
+    if len(timestamps) != len(values):
+        raise ValueError(
+            f"timestamps has {len(timestamps)} rows but values has {len(values)}."
+        )
+    parameters = decoded.get("parameters") or {}
+    if not isinstance(parameters, dict):
+        raise ValueError("parameters must be a map of columns.")
+    key_metrics = parameters.get(KEY_METRIC)
+    if key_metrics is not None:
+        if not isinstance(key_metrics, list) or len(key_metrics) != len(values):
+            raise ValueError(f"parameters.{KEY_METRIC} must have one entry per row.")
+        if not all(value is None or isinstance(value, str) for value in key_metrics):
+            raise ValueError(f"parameters.{KEY_METRIC} entries must be strings or nil.")
+    return BinaryColumns(timestamps=timestamps, values=values, key_metrics=key_metrics)
+
+
+def _encode_insights(
+    key_metrics: Optional[List[Optional[str]]], count: int
+) -> Tuple[List[str], np.ndarray]:
+    codes = np.zeros(count, dtype=_CODE_DTYPE)
+    if key_metrics is None:
+        return [DEFAULT_INSIGHT], codes
+    column = np.array(key_metrics, dtype=object)
+    has_key_metric = np.not_equal(column, None)
+    if not has_key_metric.any():
+        return [DEFAULT_INSIGHT], codes
+    distinct, inverse = np.unique(column[has_key_metric], return_inverse=True)
+    codes[has_key_metric] = inverse.ravel() + 1
+    return [DEFAULT_INSIGHT] + [
+        KEY_METRIC_INSIGHT.format(value) for value in distinct.tolist()
+    ], codes
+
+
+def _pack(
+    summary: str,
+    duration: float,
+    timestamps: bytes,
+    results: np.ndarray,
+    insights: Tuple[List[str], np.ndarray],
+) -> bytes:
+    insight_values, insight_codes = insights
+    return msgpack.packb(
+        {
+            "summary": summary,
+            "analysis_duration": duration,
+            "timestamps": timestamps,
+            "results": results.astype(_VALUE_DTYPE, copy=False).tobytes(),
+            "insight_values": insight_values,
+            "insight_codes": insight_codes.tobytes(),
+        }
+    )
+
+
+def process_columns(columns: BinaryColumns) -> bytes:
+    """
+    Processes a decoded batch and encodes the response in the packed msgpack columnar format.
+
+    The response map carries "summary" and "analysis_duration" as in the JSON response, the request's "timestamps"
+    bin unchanged, a "results" bin of little-endian float64 and the insights dictionary-encoded: "insight_values"
+    lists each distinct insight once and "insight_codes" is a bin of little-endian uint32 indexes into it, one per
+    row.
+
+    Args:
+        columns (BinaryColumns): The batch to process.
+
+    Returns:
+        bytes: The encoded response body.
+    """
+    start_time = datetime.now()
+    results = columns.values * RESULT_FACTOR
+    insights = _encode_insights(columns.key_metrics, len(columns.values))
+    duration = (datetime.now() - start_time).total_seconds()
+    return _pack(
+        f"Processed {len(results)} data points in {duration} seconds.",
+        duration,
+        columns.timestamps.tobytes(),
+        results,
+        insights,
+    )
+
+
+async def process_data_msgpack(body: bytes) -> bytes:
+    """
+    Decodes, processes and re-encodes a packed msgpack batch.
+
+    Batches larger than one process_data shard are processed on the process_data executor so they do not block the
+    event loop, and are subject to its admission control; smaller ones are cheaper to process inline.
+
+    Args:
+        body (bytes): The raw request body.
+
+    Returns:
+        bytes: The encoded response body.
+
+    Raises:
+        ValueError: If the body does not follow the layout described in decode_columns.
+        ExecutorSaturatedError: If the executor already has too many shards queued to accept the batch.
+    """
+    columns = decode_columns(body)
+    executor = project.process_data_executor.executor
+    if len(columns.values) > executor.shard_points:
+        return await executor.run(process_columns, columns, points=len(columns.values))
+    return process_columns(columns)
+
+
+def _microseconds(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+
+def encode_response(response: ProcessDataResponse) -> bytes:
+    """
+    Encodes a JSON-path ProcessDataResponse in the packed msgpack columnar format, for JSON requests that accept it.
+
+    Naive timestamps are taken to be UTC.
+
+    Args:
+        response (ProcessDataResponse): The processed batch.
+
+    Returns:
+        bytes: The encoded response body, laid out as described in process_columns.
+    """
+    points = response.processed_data
+    timestamps = np.fromiter(
+        (_microseconds(point.timestamp) for point in points),
+        dtype=_TIMESTAMP_DTYPE,
+        count=len(points),
+    )
+    results = np.fromiter(
+        (point.result for point in points), dtype=_VALUE_DTYPE, count=len(points)
+    )
+    distinct, inverse = np.unique(
+        np.array([point.insight for point in points], dtype=object),
+        return_inverse=True,
+    )
+    return _pack(
+        response.summary,
+        response.analysis_duration,
+        timestamps.tobytes(),
+        results,
+        (distinct.tolist(), inverse.ravel().astype(_CODE_DTYPE)),
+    )
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+async def _send_too_large(send) -> None:
+    body = b'{"detail":"Request body too large."}'
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class MsgpackBodyLimitMiddleware:
+    """
+    ASGI middleware that answers msgpack request bodies larger than max_bytes with 413 Content Too Large.
+
+    The application reads the whole body before a route runs, so the limit has to be enforced here. A declared
+    Content-Length over the limit is rejected without reading the body. Bodies without one are counted as they
+    arrive; past the limit the rest is not read, the application sees a disconnect and its error response is
+    replaced with the 413.
+    """
+
+    def __init__(self, app, max_bytes: int = PROCESS_DATA_MAX_BODY_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or self.max_bytes <= 0
+            or not is_msgpack(_header(scope, b"content-type"))
+        ):
+            await self.app(scope, receive, send)
+            return
+        length = _header(scope, b"content-length")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await _send_too_large(send)
+            return
+        received = 0
+        too_large = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limited_send(message):
+            if not too_large:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                await _send_too_large(send)
+
+        await self.app(scope, limited_receive, limited_send)
@@ -0,0 +1,123 @@
+from datetime import datetime
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+from project.process_data_service import (
+    DEFAULT_INSIGHT,
+    KEY_METRIC,
+    KEY_METRIC_INSIGHT,
+    RESULT_FACTOR,
+    DataPoint,
+    ProcessedPoint,
+)
+
+
+class DataColumns(NamedTuple):
+    """
+    Columnar view of a batch of data points. Every column has one entry per data point, in input order.
+    """
+
+    timestamps: List[datetime]
+    values: np.ndarray
+    has_key_metric: np.ndarray
+    key_metrics: np.ndarray
+
+
+class ResultColumns(NamedTuple):
+    """
+    Columnar view of the processed points computed from a DataColumns batch.
+    """
+
+    timestamps: List[datetime]
+    results: np.ndarray
+    insights: np.ndarray
+
+
+def to_columns(data: Sequence[DataPoint]) -> DataColumns:
+    """
+    Converts a batch of data points into NumPy columns.
+
+    Args:
+        data (Sequence[DataPoint]): The data points to convert.
+
+    Returns:
+        DataColumns: The timestamps, float64 values, the "has key_metric" mask and the key_metric values (None where
+        the parameter is missing).
+    """
+    count = len(data)
+    timestamps = [dp.timestamp for dp in data]
+    values = np.fromiter((dp.value for dp in data), dtype=np.float64, count=count)
+    has_key_metric = np.fromiter(
+        (KEY_METRIC in dp.parameters for dp in data), dtype=np.bool_, count=count
+    )
+    key_metrics = np.fromiter(
+        (dp.parameters.get(KEY_METRIC) for dp in data), dtype=object, count=count
+    )
+    return DataColumns(
+        timestamps=timestamps,
+        values=values,
+        has_key_metric=has_key_metric,
+        key_metrics=key_metrics,
+    )
+
+
+def compute_columns(columns: DataColumns) -> ResultColumns:
+    """
+    Computes results and insights for a whole batch at once.
+
+    Results are computed with a single vectorized multiplication. Insights are formatted once per distinct key_metric
+    value and scattered back to the rows that carry it; every other row gets the default insight.
+
+    Args:
+        columns (DataColumns): The batch to process.
+
+    Returns:
+        ResultColumns: The computed results and insights, aligned with the input rows.
+    """
+    results = columns.values * RESULT_FACTOR
+    insights = np.full(len(columns.values), DEFAULT_INSIGHT, dtype=object)
+    if columns.has_key_metric.any():
+        metrics = columns.key_metrics[columns.has_key_metric]
+        distinct, inverse = np.unique(metrics, return_inverse=True)
+        formatted = np.array(
+            [KEY_METRIC_INSIGHT.format(value) for value in distinct.tolist()],
+            dtype=object,
+        )
+        insights[columns.has_key_metric] = formatted[inverse.ravel()]
+    return ResultColumns(
+        timestamps=columns.timestamps, results=results, insights=insights
+    )
+
+
+def to_processed_points(result: ResultColumns) -> List[ProcessedPoint]:
+    """
+    Materializes computed columns as ProcessedPoint models.
+
+    The column values are already of the declared field types, so the models are built without re-running validation.
+
+    Args:
+        result (ResultColumns): The computed columns.
+
+    Returns:
+        List[ProcessedPoint]: One processed point per row, in input order.
+    """
+    construct = ProcessedPoint.construct
+    return [
+        construct(timestamp=timestamp, result=value, insight=insight)
+        for timestamp, value, insight in zip(
+            result.timestamps, result.results.tolist(), result.insights.tolist()
+        )
+    ]
+
+
+def process_points_columnar(data: Sequence[DataPoint]) -> List[ProcessedPoint]:
+    """
+    Columnar counterpart of process_data_service.process_points_reference.
+
+    Args:
+        data (Sequence[DataPoint]): The data points to process.
+
+    Returns:
+        List[ProcessedPoint]: One processed point per input data point, in input order.
+    """
+    return to_processed_points(compute_columns(to_columns(data)))
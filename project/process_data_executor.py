@@ -0,0 +1,215 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import project.process_data_service
+from project.process_data_service import DataPoint, ProcessDataResponse, ProcessedPoint
+
+
+class ExecutorSaturatedError(Exception):
+    """
+    Raised when a request would push more shards into the worker pool than it is allowed to queue.
+    """
+
+
+PROCESS_DATA_EXECUTOR = os.getenv("PROCESS_DATA_EXECUTOR", "process")
+
+PROCESS_DATA_WORKERS = int(os.getenv("PROCESS_DATA_WORKERS", str(os.cpu_count() or 1)))
+
+PROCESS_DATA_SHARD_POINTS = int(os.getenv("PROCESS_DATA_SHARD_POINTS", "50000"))
+
+PROCESS_DATA_MAX_PENDING_SHARDS = int(
+    os.getenv("PROCESS_DATA_MAX_PENDING_SHARDS", str(4 * PROCESS_DATA_WORKERS))
+)
+
+Row = Tuple[datetime, float, Dict[str, str]]
+
+ProcessedRow = Tuple[datetime, float, Optional[str]]
+
+T = TypeVar("T")
+
+
+def _process_rows(rows: List[Row]) -> List[ProcessedRow]:
+    """
+    Worker-process entry point. Data crosses the process boundary as plain tuples, which pickle far more cheaply
+    than pydantic models.
+    """
+    construct = DataPoint.construct
+    data = [
+        construct(timestamp=timestamp, value=value, parameters=parameters)
+        for timestamp, value, parameters in rows
+    ]
+    return [
+        (point.timestamp, point.result, point.insight)
+        for point in project.process_data_service.process_points(data)
+    ]
+
+
+class ProcessDataExecutor:
+    """
+    Runs process_data work on a thread or process pool so it never blocks the event loop.
+
+    Large inputs are split into shards of at most shard_points points that are processed concurrently and merged
+    back in input order. At most max_pending shards may be queued or running at once; requests that would exceed
+    that limit are rejected with ExecutorSaturatedError instead of waiting. A batch is always admitted when the pool
+    is idle, so a single oversized request still gets processed.
+    """
+
+    def __init__(
+        self,
+        kind: str = PROCESS_DATA_EXECUTOR,
+        max_workers: int = PROCESS_DATA_WORKERS,
+        shard_points: int = PROCESS_DATA_SHARD_POINTS,
+        max_pending: int = PROCESS_DATA_MAX_PENDING_SHARDS,
+    ):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown process_data executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.shard_points = max(1, shard_points)
+        self.max_pending = max_pending
+        self.pending = 0
+        self._pool: Optional[Executor] = None
+
+    def start(self) -> None:
+        """
+        Creates the worker pool. Until this is called, work runs inline on the calling thread.
+        """
+        if self._pool is not None or self.kind == "inline":
+            return
+        if self.kind == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="process-data"
+            )
+        else:
+            # Imported here so workers configured for threads never load multiprocessing.
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    async def warm_up(self, sample: List[DataPoint]) -> None:
+        """
+        Processes a small sample on every worker so the pool's threads or processes exist, and worker processes have
+        imported the processing code, before the first request needs them.
+
+        Args:
+            sample (List[DataPoint]): The points each worker processes.
+        """
+        if self._pool is None:
+            return
+        await asyncio.gather(
+            *(self._run_shard(sample) for _ in range(self.max_workers))
+        )
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker pool, waiting for running shards to finish.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def _admit(self, shards: int) -> None:
+        if self.pending + shards > self.max_pending and self.pending > 0:
+            raise ExecutorSaturatedError(
+                "Data processing is at capacity, please retry later."
+            )
+        self.pending += shards
+
+    def _shards(self, data: List[DataPoint]) -> List[List[DataPoint]]:
+        return [
+            data[i : i + self.shard_points]
+            for i in range(0, len(data), self.shard_points)
+        ]
+
+    async def _run_shard(self, shard: List[DataPoint]) -> List[ProcessedPoint]:
+        loop = asyncio.get_running_loop()
+        if self.kind == "thread":
+            return await loop.run_in_executor(
+                self._pool, project.process_data_service.process_points, shard
+            )
+        rows = [(dp.timestamp, dp.value, dp.parameters) for dp in shard]
+        processed_rows = await loop.run_in_executor(self._pool, _process_rows, rows)
+        construct = ProcessedPoint.construct
+        return [
+            construct(timestamp=timestamp, result=result, insight=insight)
+            for timestamp, result, insight in processed_rows
+        ]
+
+    async def process_points(self, data: List[DataPoint]) -> List[ProcessedPoint]:
+        """
+        Computes the processed points for a batch on the worker pool.
+
+        Args:
+            data (List[DataPoint]): The data points to process.
+
+        Returns:
+            List[ProcessedPoint]: One processed point per input data point, in input order.
+
+        Raises:
+            ExecutorSaturatedError: If the pool already has too many shards queued to accept this batch.
+        """
+        if self._pool is None:
+            return project.process_data_service.process_points(data)
+        shards = self._shards(data)
+        self._admit(len(shards))
+        try:
+            results = await asyncio.gather(*(self._run_shard(s) for s in shards))
+        finally:
+            self.pending -= len(shards)
+        return [point for shard in results for point in shard]
+
+    async def run(self, fn: Callable[..., T], *args, points: int) -> T:
+        """
+        Runs a callable on the worker pool as a single task, under the same admission control as process_points.
+
+        The task counts against max_pending as the number of shards its points span. With a process pool, fn must be
+        a module-level function and its arguments and result must be picklable.
+
+        Args:
+            fn (Callable[..., T]): The function to run.
+            *args: The arguments to call it with.
+            points (int): How many data points the call processes.
+
+        Returns:
+            T: What fn returned.
+
+        Raises:
+            ExecutorSaturatedError: If the pool already has too many shards queued to accept this work.
+        """
+        if self._pool is None:
+            return fn(*args)
+        shards = max(1, -(-points // self.shard_points))
+        self._admit(shards)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, fn, *args
+            )
+        finally:
+            self.pending -= shards
+
+    async def process_data(self, data: List[DataPoint]) -> ProcessDataResponse:
+        """
+        Async counterpart of process_data_service.process_data that runs on the worker pool.
+
+        Args:
+            data (List[DataPoint]): The data points to process.
+
+        Returns:
+            ProcessDataResponse: The output model after processing the input data.
+
+        Raises:
+            ExecutorSaturatedError: If the pool already has too many shards queued to accept this batch.
+        """
+        start_time = datetime.now()
+        processed_data = await self.process_points(data)
+        return project.process_data_service.build_response(processed_data, start_time)
+
+
+executor = ProcessDataExecutor()
@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -34,38 +35,122 @@ class ProcessDataResponse(BaseModel):
     analysis_duration: float
 
 
-def process_data(data: List[DataPoint]) -> ProcessDataResponse:
+RESULT_FACTOR = 1.05
+
+KEY_METRIC = "key_metric"
+
+DEFAULT_INSIGHT = "No specific insight"
+
+KEY_METRIC_INSIGHT = "Key metric identified, parameter value: {}"
+
+PROCESS_DATA_ENGINE = os.getenv("PROCESS_DATA_ENGINE", "auto")
+
+COLUMNAR_MIN_POINTS = int(os.getenv("PROCESS_DATA_COLUMNAR_MIN_POINTS", "64"))
+
+
+def process_points_reference(data: List[DataPoint]) -> List[ProcessedPoint]:
     """
-    Accepts data for processing and returns analysis results in real-time.
+    Row-by-row reference implementation of the data point computation.
 
-    This function is designed to process a series of data points represented by the DataPoint class. Each data point
-    will be analyzed to compute a result and potentially derive insights based on its parameters. The function will
-    aggregate these processed points into a ProcessDataResponse, summarizing the analysis and including details such as
-    the individual processed points and the total duration of the process.
+    This is the original per-row path. It is kept as the source of truth for the behaviour of the columnar engine,
+    which must produce identical ProcessedPoint values for the same input.
 
     Args:
-        data (List[DataPoint]): A comprehensive representation of the data to be processed or parameters guiding how data processing should be conducted.
+        data (List[DataPoint]): The data points to process.
 
     Returns:
-        ProcessDataResponse: The output model after processing the input data. This model provides a concise summary of the analysis, including any computed metrics, insights, or processed data.
+        List[ProcessedPoint]: One processed point per input data point, in input order.
     """
-    start_time = datetime.now()
     processed_data = []
     for dp in data:
-        processed_value = dp.value * 1.05
-        insight = "No specific insight"
-        if "key_metric" in dp.parameters:
-            insight = (
-                f"Key metric identified, parameter value: {dp.parameters['key_metric']}"
-            )
+        processed_value = dp.value * RESULT_FACTOR
+        insight = DEFAULT_INSIGHT
+        if KEY_METRIC in dp.parameters:
+            insight = KEY_METRIC_INSIGHT.format(dp.parameters[KEY_METRIC])
         processed_data.append(
             ProcessedPoint(
                 timestamp=dp.timestamp, result=processed_value, insight=insight
             )
         )
+    return processed_data
+
+
+def process_points(data: List[DataPoint]) -> List[ProcessedPoint]:
+    """
+    Computes the processed points using the configured engine.
+
+    The engine is selected with the PROCESS_DATA_ENGINE environment variable: "reference" always uses the per-row
+    path, "columnar" always uses the NumPy engine and "auto" (the default) uses the NumPy engine for batches of at
+    least PROCESS_DATA_COLUMNAR_MIN_POINTS points when NumPy is installed.
+
+    Args:
+        data (List[DataPoint]): The data points to process.
+
+    Returns:
+        List[ProcessedPoint]: One processed point per input data point, in input order.
+    """
+    if PROCESS_DATA_ENGINE == "reference":
+        return process_points_reference(data)
+    if PROCESS_DATA_ENGINE == "auto" and len(data) < COLUMNAR_MIN_POINTS:
+        return process_points_reference(data)
+    try:
+        import project.process_data_columnar
+    except ImportError:
+        if PROCESS_DATA_ENGINE == "columnar":
+            raise
+        return process_points_reference(data)
+    return project.process_data_columnar.process_points_columnar(data)
+
+
+def build_response(
+    processed_data: List[ProcessedPoint], start_time: datetime
+) -> ProcessDataResponse:
+    """
+    Wraps processed points into a ProcessDataResponse, summarizing how long the analysis took.
+
+    Args:
+        processed_data (List[ProcessedPoint]): The processed points to return.
+        start_time (datetime): When the analysis started.
+
+    Returns:
+        ProcessDataResponse: The summary, processed points and analysis duration.
+    """
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
-    summary = f"Processed {len(data)} data points in {duration} seconds."
-    return ProcessDataResponse(
+    summary = f"Processed {len(processed_data)} data points in {duration} seconds."
+    return ProcessDataResponse.construct(
         summary=summary, processed_data=processed_data, analysis_duration=duration
     )
+
+
+def process_data_reference(data: List[DataPoint]) -> ProcessDataResponse:
+    """
+    Processes the data points with the row-by-row reference implementation.
+
+    Args:
+        data (List[DataPoint]): The data points to process.
+
+    Returns:
+        ProcessDataResponse: The output model after processing the input data.
+    """
+    start_time = datetime.now()
+    return build_response(process_points_reference(data), start_time)
+
+
+def process_data(data: List[DataPoint]) -> ProcessDataResponse:
+    """
+    Accepts data for processing and returns analysis results in real-time.
+
+    This function is designed to process a series of data points represented by the DataPoint class. Each data point
+    will be analyzed to compute a result and potentially derive insights based on its parameters. The function will
+    aggregate these processed points into a ProcessDataResponse, summarizing the analysis and including details such as
+    the individual processed points and the total duration of the process.
+
+    Args:
+        data (List[DataPoint]): A comprehensive representation of the data to be processed or parameters guiding how data processing should be conducted.
+
+    Returns:
+        ProcessDataResponse: The output model after processing the input data. This model provides a concise summary of the analysis, including any computed metrics, insights, or processed data.
+    """
+    start_time = datetime.now()
+    return build_response(process_points(data), start_time)
@@ -0,0 +1,411 @@
+import math
+import os
+import time
+import uuid
+from array import array
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional
+
+import project.rate_limiting
+from project.process_data_service import KEY_METRIC, RESULT_FACTOR, DataPoint
+from pydantic import BaseModel
+
+PROCESS_DATA_SESSION_WINDOW = int(os.getenv("PROCESS_DATA_SESSION_WINDOW", "10000"))
+
+PROCESS_DATA_SESSION_MAX_WINDOW = int(
+    os.getenv("PROCESS_DATA_SESSION_MAX_WINDOW", "100000")
+)
+
+PROCESS_DATA_SESSION_EWMA_ALPHA = float(
+    os.getenv("PROCESS_DATA_SESSION_EWMA_ALPHA", "0.1")
+)
+
+PROCESS_DATA_SESSION_IDLE_TTL = float(os.getenv("PROCESS_DATA_SESSION_IDLE_TTL", "600"))
+
+PROCESS_DATA_MAX_SESSIONS = int(os.getenv("PROCESS_DATA_MAX_SESSIONS", "1000"))
+
+# Each point of a session's window is preallocated (about 24 bytes), so these bound the memory sessions can take in
+# one worker, in total and per client (user, or IP for anonymous callers).
+PROCESS_DATA_SESSION_MAX_TOTAL_POINTS = int(
+    os.getenv("PROCESS_DATA_SESSION_MAX_TOTAL_POINTS", "10000000")
+)
+
+PROCESS_DATA_SESSION_MAX_CLIENT_POINTS = int(
+    os.getenv("PROCESS_DATA_SESSION_MAX_CLIENT_POINTS", "1000000")
+)
+
+
+class SessionNotFoundError(Exception):
+    """
+    Raised when a session ID is unknown, closed or was evicted after being idle.
+    """
+
+
+class SessionQuotaExceededError(Exception):
+    """
+    Raised when opening a session would take a client over PROCESS_DATA_SESSION_MAX_CLIENT_POINTS.
+    """
+
+
+class SessionCapacityError(Exception):
+    """
+    Raised when opening a session would take the worker over PROCESS_DATA_SESSION_MAX_TOTAL_POINTS.
+    """
+
+
+class ProcessDataSessionResponse(BaseModel):
+    """
+    Rolling aggregates of a process_data session.
+
+    count, sum, mean, min, max and key_metric_frequency cover the last window points (the processed results, i.e.
+    value * RESULT_FACTOR); total_count and ewma cover every point appended since the session was opened.
+    Timestamps are UTC, with naive input timestamps taken to be UTC.
+    """
+
+    session_id: str
+    window: int
+    count: int
+    total_count: int
+    sum: float
+    mean: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+    ewma: Optional[float]
+    key_metric_frequency: Dict[str, int]
+    window_start: Optional[datetime]
+    window_end: Optional[datetime]
+
+
+class CloseProcessDataSessionResponse(BaseModel):
+    """
+    Confirms that a session was closed.
+    """
+
+    session_id: str
+    closed: bool
+
+
+class ProcessDataSession:
+    """
+    Rolling aggregates over the last window points appended to a session.
+
+    Results, timestamps and key_metric parameters live in fixed-size ring buffers (array-backed for the floats), so
+    a session's memory does not grow with the number of points appended. Every append is O(1): the point that
+    falls out of the window is subtracted from the running sum and key_metric counts, and min/max come from
+    monotonic deques of sequence numbers. The running sum is recomputed from the buffer once per window to keep
+    floating-point drift from accumulating.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        window: int = PROCESS_DATA_SESSION_WINDOW,
+        alpha: float = PROCESS_DATA_SESSION_EWMA_ALPHA,
+        owner: Optional[str] = None,
+    ):
+        self.session_id = session_id
+        self.owner = owner
+        self.window = window
+        self.alpha = alpha
+        self.total_count = 0
+        self.ewma: Optional[float] = None
+        self.last_used = 0.0
+        self._results = array("d", bytes(8 * window))
+        self._timestamps = array("d", bytes(8 * window))
+        self._key_metrics: List[Optional[str]] = [None] * window
+        self._key_metric_counts: Dict[str, int] = {}
+        self._sum = 0.0
+        self._min: Deque[int] = deque()
+        self._max: Deque[int] = deque()
+
+    @property
+    def count(self) -> int:
+        return min(self.total_count, self.window)
+
+    def append(self, point: DataPoint) -> None:
+        """
+        Adds a data point to the session's aggregates.
+
+        Args:
+            point (DataPoint): The data point, processed the same way as by process_data.
+        """
+        window = self.window
+        results = self._results
+        seq = self.total_count
+        slot = seq % window
+        if seq >= window:
+            self._sum -= results[slot]
+            evicted = self._key_metrics[slot]
+            if evicted is not None:
+                remaining = self._key_metric_counts[evicted] - 1
+                if remaining:
+                    self._key_metric_counts[evicted] = remaining
+                else:
+                    del self._key_metric_counts[evicted]
+            oldest = seq - window
+            if self._min[0] == oldest:
+                self._min.popleft()
+            if self._max[0] == oldest:
+                self._max.popleft()
+
+        result = point.value * RESULT_FACTOR
+        timestamp = point.timestamp
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        key_metric = point.parameters.get(KEY_METRIC)
+        results[slot] = result
+        self._timestamps[slot] = timestamp.timestamp()
+        self._key_metrics[slot] = key_metric
+        if key_metric is not None:
+            self._key_metric_counts[key_metric] = (
+                self._key_metric_counts.get(key_metric, 0) + 1
+            )
+        self._sum += result
+        while self._min and results[self._min[-1] % window] >= result:
+            self._min.pop()
+        self._min.append(seq)
+        while self._max and results[self._max[-1] % window] <= result:
+            self._max.pop()
+        self._max.append(seq)
+        self.ewma = (
+            result
+            if self.ewma is None
+            else self.alpha * result + (1 - self.alpha) * self.ewma
+        )
+        self.total_count = seq + 1
+        if slot == window - 1:
+            self._sum = math.fsum(results)
+
+    def results(self) -> ProcessDataSessionResponse:
+        """
+        Returns the session's current aggregates.
+        """
+        count = self.count
+        window = self.window
+        if count:
+            newest = (self.total_count - 1) % window
+            oldest = (self.total_count - count) % window
+            window_start = datetime.fromtimestamp(
+                self._timestamps[oldest], timezone.utc
+            )
+            window_end = datetime.fromtimestamp(self._timestamps[newest], timezone.utc)
+        else:
+            window_start = window_end = None
+        return ProcessDataSessionResponse.construct(
+            session_id=self.session_id,
+            window=window,
+            count=count,
+            total_count=self.total_count,
+            sum=self._sum,
+            mean=self._sum / count if count else None,
+            min=self._results[self._min[0] % window] if count else None,
+            max=self._results[self._max[0] % window] if count else None,
+            ewma=self.ewma,
+            key_metric_frequency=dict(self._key_metric_counts),
+            window_start=window_start,
+            window_end=window_end,
+        )
+
+
+class ProcessDataSessions:
+    """
+    The open sessions of this process, evicted after idle_ttl seconds without use or, beyond max_sessions, least
+    recently used first.
+
+    Every session belongs to the client that opened it and is only visible to that client. Since a session's
+    buffers are allocated upfront, the windows of the open sessions are limited to max_total_points in total and
+    max_client_points per client; opening a session past either limit fails instead of evicting other sessions.
+
+    Sessions are held in memory by the worker that opened them, so with several workers clients must be routed back
+    to the same one (e.g. by session ID).
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = PROCESS_DATA_MAX_SESSIONS,
+        idle_ttl: float = PROCESS_DATA_SESSION_IDLE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        max_total_points: int = PROCESS_DATA_SESSION_MAX_TOTAL_POINTS,
+        max_client_points: int = PROCESS_DATA_SESSION_MAX_CLIENT_POINTS,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self.max_total_points = max_total_points
+        self.max_client_points = max_client_points
+        self.evicted = 0
+        self.total_points = 0
+        self._client_points: Dict[Optional[str], int] = {}
+        self._sessions: "OrderedDict[str, ProcessDataSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _remove(self, session: ProcessDataSession) -> None:
+        del self._sessions[session.session_id]
+        self.total_points -= session.window
+        remaining = self._client_points[session.owner] - session.window
+        if remaining:
+            self._client_points[session.owner] = remaining
+        else:
+            del self._client_points[session.owner]
+
+    def _evict(self, now: float) -> None:
+        sessions = self._sessions
+        idle_before = now - self.idle_ttl
+        while sessions:
+            session = next(iter(sessions.values()))
+            if session.last_used > idle_before and len(sessions) <= self.max_sessions:
+                break
+            self._remove(session)
+            self.evicted += 1
+
+    def open(
+        self, window: int = PROCESS_DATA_SESSION_WINDOW, owner: Optional[str] = None
+    ) -> ProcessDataSession:
+        """
+        Opens a new session.
+
+        Args:
+            window (int): How many of the most recent points the windowed aggregates cover.
+            owner (Optional[str]): The client opening the session; only it can use the session afterwards.
+
+        Returns:
+            ProcessDataSession: The new session.
+
+        Raises:
+            ValueError: If window is not between 1 and PROCESS_DATA_SESSION_MAX_WINDOW.
+            SessionQuotaExceededError: If the owner's open sessions would exceed max_client_points.
+            SessionCapacityError: If all open sessions would exceed max_total_points.
+        """
+        if not 1 <= window <= PROCESS_DATA_SESSION_MAX_WINDOW:
+            raise ValueError(
+                f"window must be between 1 and {PROCESS_DATA_SESSION_MAX_WINDOW}"
+            )
+        now = self.clock()
+        self._evict(now)
+        client_points = self._client_points.get(owner, 0) + window
+        if client_points > self.max_client_points:
+            raise SessionQuotaExceededError(
+                f"Open sessions may cover at most {self.max_client_points} points per client; "
+                "close a session or use a smaller window."
+            )
+        if self.total_points + window > self.max_total_points:
+            raise SessionCapacityError(
+                "Too many session points are open on this server; try again later."
+            )
+        session = ProcessDataSession(uuid.uuid4().hex, window, owner=owner)
+        session.last_used = now
+        self._sessions[session.session_id] = session
+        self._client_points[owner] = client_points
+        self.total_points += window
+        self._evict(now)
+        return session
+
+    def get(self, session_id: str, owner: Optional[str] = None) -> ProcessDataSession:
+        """
+        Returns an open session of owner and marks it as used.
+
+        Raises:
+            SessionNotFoundError: If the session does not exist, has been evicted or belongs to another client.
+        """
+        now = self.clock()
+        self._evict(now)
+        session = self._sessions.get(session_id)
+        if session is None or session.owner != owner:
+            raise SessionNotFoundError(f"Session {session_id} not found.")
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def close(self, session_id: str, owner: Optional[str] = None) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None or session.owner != owner:
+            return False
+        self._remove(session)
+        return True
+
+
+sessions = ProcessDataSessions()
+
+
+async def owner_of(scope) -> str:
+    """
+    Identifies the client of an ASGI request the way the rate limiter does: by user for requests with a valid
+    bearer token and by client IP otherwise. Admins share one identity.
+    """
+    key, plan = await project.rate_limiting.rate_limiter.client_for(scope)
+    return key or plan
+
+
+async def open_session(
+    window: int = PROCESS_DATA_SESSION_WINDOW, owner: Optional[str] = None
+) -> ProcessDataSessionResponse:
+    """
+    Opens a process_data session that points can be appended to incrementally.
+
+    Args:
+        window (int): How many of the most recent points the windowed aggregates cover.
+        owner (Optional[str]): The client opening the session, as keyed by the rate limiter.
+
+    Returns:
+        ProcessDataSessionResponse: The new session's ID and its (empty) aggregates.
+
+    Raises:
+        ValueError: If window is out of range.
+        SessionQuotaExceededError: If the client already has too many session points open.
+        SessionCapacityError: If the worker already has too many session points open.
+    """
+    return sessions.open(window, owner).results()
+
+
+async def append_points(
+    session_id: str, data: List[DataPoint], owner: Optional[str] = None
+) -> ProcessDataSessionResponse:
+    """
+    Appends data points to a session and returns its updated aggregates.
+
+    Only the new points are sent; the session keeps the state of everything appended before.
+
+    Args:
+        session_id (str): The session to append to.
+        data (List[DataPoint]): The new data points, in order.
+        owner (Optional[str]): The client the session must belong to.
+
+    Returns:
+        ProcessDataSessionResponse: The session's aggregates including the new points.
+
+    Raises:
+        SessionNotFoundError: If the session does not exist, has been evicted or belongs to another client.
+    """
+    session = sessions.get(session_id, owner)
+    for point in data:
+        session.append(point)
+    return session.results()
+
+
+async def get_session_results(
+    session_id: str, owner: Optional[str] = None
+) -> ProcessDataSessionResponse:
+    """
+    Returns a session's current aggregates without appending anything.
+
+    Raises:
+        SessionNotFoundError: If the session does not exist, has been evicted or belongs to another client.
+    """
+    return sessions.get(session_id, owner).results()
+
+
+async def close_session(
+    session_id: str, owner: Optional[str] = None
+) -> CloseProcessDataSessionResponse:
+    """
+    Closes a session and frees its buffers.
+
+    Raises:
+        SessionNotFoundError: If the session does not exist, has been evicted or belongs to another client.
+    """
+    if not sessions.close(session_id, owner):
+        raise SessionNotFoundError(f"Session {session_id} not found.")
+    return CloseProcessDataSessionResponse.construct(session_id=session_id, closed=True)
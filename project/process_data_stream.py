@@ -0,0 +1,303 @@
+import os
+import re
+from datetime import datetime
+from typing import AsyncIterator, List
+
+import project.fast_json
+import project.process_data_executor
+from project.process_data_executor import ExecutorSaturatedError
+from project.process_data_service import DataPoint
+from pydantic import BaseModel, ValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class ProcessDataStreamSummary(BaseModel):
+    """
+    Trailer record emitted after the last processed point of a streamed response.
+    """
+
+    summary: str
+    analysis_duration: float
+
+
+class ProcessDataStreamError(BaseModel):
+    """
+    Record emitted in place of further points when a streamed request fails after the response has started.
+    """
+
+    error: str
+
+
+STREAM_CHUNK_POINTS = int(os.getenv("PROCESS_DATA_STREAM_CHUNK_POINTS", "1024"))
+
+STREAM_MAX_RECORD_BYTES = int(
+    os.getenv("PROCESS_DATA_STREAM_MAX_RECORD_BYTES", str(1024 * 1024))
+)
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+_JSON_ARRAY_TOKENS = re.compile(rb'\\.|\\|["\[\]{},]', re.DOTALL)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body iterator may still be reading the request body.
+
+    StreamingResponse listens for client disconnects on the same receive channel that carries the request body,
+    which would swallow body chunks that have not been read yet. This variant only streams; a client disconnect
+    surfaces as ClientDisconnect from the request stream and simply ends the response.
+
+    The response is only started once the first chunk is ready. If the body iterator fails before that, the request
+    is answered with a plain JSON error instead: 400 for invalid input, 503 if the executor is saturated.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        chunks = self.body_iterator.__aiter__()
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = b""
+        except ClientDisconnect:
+            return
+        except ExecutorSaturatedError as e:
+            await self._reject(503, e, scope, receive, send)
+            return
+        except ValueError as e:
+            await self._reject(400, e, scope, receive, send)
+            return
+        try:
+            await self.stream_response(send, first, chunks)
+        except ClientDisconnect:
+            return
+        if self.background is not None:
+            await self.background()
+
+    async def _reject(
+        self,
+        status_code: int,
+        error: Exception,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        response = project.fast_json.FastJSONResponse(
+            content={"error": str(error)}, status_code=status_code
+        )
+        await response(scope, receive, send)
+
+    async def stream_response(
+        self, send: Send, first: bytes, chunks: AsyncIterator[bytes]
+    ) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": first, "more_body": True})
+        async for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def is_ndjson(content_type: str) -> bool:
+    """
+    Tells whether a request content type announces newline-delimited JSON.
+
+    Args:
+        content_type (str): The raw Content-Type header value.
+
+    Returns:
+        bool: True for NDJSON / JSON Lines bodies, False for anything else (treated as a JSON array).
+    """
+    return content_type.split(";", 1)[0].strip().lower() in NDJSON_MEDIA_TYPES
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Splits an NDJSON body into one raw JSON document per line as the body arrives.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body chunks.
+
+    Yields:
+        bytes: The raw bytes of each non-empty line.
+
+    Raises:
+        ValueError: If a single line grows past PROCESS_DATA_STREAM_MAX_RECORD_BYTES.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buffer) > STREAM_MAX_RECORD_BYTES:
+            raise ValueError("Streamed record exceeds the maximum record size.")
+    if buffer.strip():
+        yield buffer
+
+
+async def iter_json_array_records(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[bytes]:
+    """
+    Splits a (possibly chunked) top-level JSON array into its elements as the body arrives.
+
+    Only the structural characters are inspected, so nothing is parsed beyond finding element boundaries; each
+    element is handed on as raw bytes. The body must be exactly one JSON array, optionally surrounded by
+    whitespace.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body chunks.
+
+    Yields:
+        bytes: The raw bytes of each array element.
+
+    Raises:
+        ValueError: If the body is not a single JSON array or an element grows past
+            PROCESS_DATA_STREAM_MAX_RECORD_BYTES.
+    """
+    buffer = b""
+    position = 0
+    element_start = None
+    depth = 0
+    in_string = False
+    closed = False
+    async for chunk in chunks:
+        buffer += chunk
+        for match in _JSON_ARRAY_TOKENS.finditer(buffer, position):
+            token = match.group()
+            index = match.start()
+            gap_start, position = position, match.end()
+            if in_string:
+                if token == b"\\":
+                    # A trailing backslash escapes a byte that has not arrived yet.
+                    position = index
+                    break
+                if token == b'"':
+                    in_string = False
+                continue
+            if depth == 0 and (
+                closed or token != b"[" or buffer[gap_start:index].strip()
+            ):
+                # Anything but whitespace around the one top-level array: a scalar, an object, trailing data.
+                raise ValueError("Request body must be a single JSON array.")
+            if token == b'"':
+                in_string = True
+            elif token in (b"[", b"{"):
+                depth += 1
+                if depth == 1:
+                    element_start = index + 1
+            elif token in (b"]", b"}"):
+                depth -= 1
+                if depth == 0:
+                    element = buffer[element_start:index]
+                    if element.strip():
+                        yield element
+                    element_start = None
+                    closed = True
+            elif token == b"," and depth == 1:
+                yield buffer[element_start:index]
+                element_start = index + 1
+        else:
+            if depth == 0 and buffer[position:].strip():
+                raise ValueError("Request body must be a single JSON array.")
+            position = len(buffer)
+        if element_start is None:
+            buffer, position = b"", 0
+        else:
+            buffer = buffer[element_start:]
+            position -= element_start
+            element_start = 0
+        if len(buffer) > STREAM_MAX_RECORD_BYTES:
+            raise ValueError("Streamed record exceeds the maximum record size.")
+    if depth != 0 or in_string:
+        raise ValueError("Request body ended inside the JSON array.")
+    if not closed:
+        raise ValueError("Request body must be a single JSON array.")
+
+
+def iter_records(
+    chunks: AsyncIterator[bytes], content_type: str
+) -> AsyncIterator[bytes]:
+    """
+    Picks the record splitter that matches the request content type.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body chunks.
+        content_type (str): The raw Content-Type header value.
+
+    Returns:
+        AsyncIterator[bytes]: The raw bytes of each data point record.
+    """
+    if is_ndjson(content_type):
+        return iter_ndjson_records(chunks)
+    return iter_json_array_records(chunks)
+
+
+async def iter_point_batches(
+    records: AsyncIterator[bytes], batch_size: int = STREAM_CHUNK_POINTS
+) -> AsyncIterator[List[DataPoint]]:
+    """
+    Validates raw records into DataPoints and groups them into bounded batches.
+
+    Args:
+        records (AsyncIterator[bytes]): The raw bytes of each data point record.
+        batch_size (int): The maximum number of points per batch.
+
+    Yields:
+        List[DataPoint]: Batches of at most batch_size validated points, in input order.
+    """
+    batch = []
+    async for record in records:
+        batch.append(DataPoint.parse_raw(record))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def process_stream(records: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Processes a stream of data point records and yields NDJSON output as each batch is computed.
+
+    Each batch of points is processed on the process_data executor and written out as one ProcessedPoint
+    per line, so memory use is bounded by the batch size rather than by the request size. The stream ends with a
+    ProcessDataStreamSummary line, or with a ProcessDataStreamError line if the input turns out to be invalid after
+    output has been written. An error before that is raised, so DuplexStreamingResponse can answer with an error
+    status instead.
+
+    Args:
+        records (AsyncIterator[bytes]): The raw bytes of each data point record.
+
+    Yields:
+        bytes: NDJSON encoded output lines, grouped per processed batch.
+    """
+    start_time = datetime.now()
+    count = 0
+    written = False
+    try:
+        async for batch in iter_point_batches(records):
+            processed = await project.process_data_executor.executor.process_points(
+                batch
+            )
+            count += len(processed)
+            written = True
+            yield b"".join(point.json().encode() + b"\n" for point in processed)
+    except (ValidationError, ValueError, ExecutorSaturatedError) as e:
+        if not written:
+            raise
+        yield ProcessDataStreamError(error=str(e)).json().encode() + b"\n"
+        return
+    duration = (datetime.now() - start_time).total_seconds()
+    summary = ProcessDataStreamSummary(
+        summary=f"Processed {count} data points in {duration} seconds.",
+        analysis_duration=duration,
+    )
+    yield summary.json().encode() + b"\n"
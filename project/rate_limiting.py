@@ -0,0 +1,505 @@
+import abc
+import asyncio
+import ipaddress
+import logging
+import math
+import os
+import time
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+
+import prisma.models
+import project.data_loader
+import project.tokens
+from project.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Requests per minute and burst size per subscription plan. ANONYMOUS applies to requests without a valid token
+# (keyed by client IP) and NONE to authenticated users without a subscription.
+RATE_LIMIT_ANONYMOUS = os.getenv("RATE_LIMIT_ANONYMOUS", "60/20")
+
+RATE_LIMIT_NONE = os.getenv("RATE_LIMIT_NONE", "120/30")
+
+RATE_LIMIT_BASIC = os.getenv("RATE_LIMIT_BASIC", "300/60")
+
+RATE_LIMIT_PREMIUM = os.getenv("RATE_LIMIT_PREMIUM", "3000/300")
+
+# How many requests' worth of quota one call to an expensive route uses, as comma-separated path=cost pairs.
+RATE_LIMIT_ROUTE_COSTS = os.getenv(
+    "RATE_LIMIT_ROUTE_COSTS",
+    "/user/login=10,/data/process=5,/data/process/stream=5",
+)
+
+RATE_LIMIT_EXEMPT_PATHS = os.getenv("RATE_LIMIT_EXEMPT_PATHS", "/metrics,/ready")
+
+# Leave empty to limit within this process only; set a redis:// URL to share the limits between workers.
+RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", "")
+
+RATE_LIMIT_STORE_SIZE = int(os.getenv("RATE_LIMIT_STORE_SIZE", "100000"))
+
+RATE_LIMIT_PLAN_CACHE_TTL = float(os.getenv("RATE_LIMIT_PLAN_CACHE_TTL", "300"))
+
+# Comma-separated addresses or networks of the reverse proxies in front of the app. Anonymous requests from these
+# peers are keyed by the client address they forward in X-Forwarded-For or Forwarded; leave empty when clients
+# connect directly, so forwarding headers (which any client can send) are ignored.
+RATE_LIMIT_TRUSTED_PROXIES = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "")
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket that makes callers wait until the rate allows them through.
+
+    Tokens refill continuously at rate per second up to capacity. acquire() reserves its tokens immediately, letting
+    the balance go negative, and sleeps until the reservation is covered, so waiters are released in arrival order
+    without polling.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Waits until tokens are available and consumes them.
+
+        Args:
+            tokens (float): How many tokens the caller needs.
+        """
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= tokens
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class TokenBucketRegistry:
+    """
+    Lazily created token buckets keyed by any hashable key, all sharing the same rate and capacity.
+
+    At most maxsize buckets are kept. A bucket not used for idle_ttl seconds is dropped, and the least recently used
+    one is evicted once the registry is full; either way the key starts again from a full bucket.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        maxsize: int = 1024,
+        idle_ttl: float = 60.0,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: TTLCache[Hashable, TokenBucket] = TTLCache(
+            max(1, maxsize), idle_ttl
+        )
+
+    def bucket_for(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity)
+        # Setting on every use pushes the bucket's expiry back, so only idle buckets expire.
+        self._buckets.set(key, bucket)
+        return bucket
+
+
+class RateLimit(NamedTuple):
+    """
+    A GCRA limit: requests per period seconds, of which up to burst may arrive back to back.
+    """
+
+    requests: float
+    period: float
+    burst: float
+
+    @classmethod
+    def parse(cls, spec: str, period: float = 60.0) -> "RateLimit":
+        """
+        Parses "<requests per period>/<burst>", e.g. "300/60". The burst defaults to the per-period rate.
+        """
+        requests, _, burst = spec.partition("/")
+        return cls(float(requests), period, float(burst or requests))
+
+    @property
+    def interval(self) -> float:
+        # The emission interval: seconds of quota one request uses.
+        return self.period / self.requests
+
+
+def _parse_costs(spec: str) -> Dict[str, float]:
+    costs = {}
+    for item in spec.split(","):
+        path, _, cost = item.strip().partition("=")
+        if path:
+            costs[path] = float(cost or 1)
+    return costs
+
+
+class RateLimitStore(abc.ABC):
+    """
+    Holds the GCRA state, one theoretical arrival time (TAT) per key.
+    """
+
+    @abc.abstractmethod
+    async def acquire(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        """
+        Charges cost requests to key if its limit allows it.
+
+        Args:
+            key (str): The client the request is charged to.
+            limit (RateLimit): The client's limit.
+            cost (float): How many requests' worth of quota the request uses.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds until it would be.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalRateLimitStore(RateLimitStore):
+    """
+    In-process GCRA store for a single worker.
+
+    Each decision is a dict lookup and a few float operations with no await in between, so it needs no lock on the
+    event loop. Keys whose TAT has passed carry no state and are pruned once the store exceeds maxsize.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RATE_LIMIT_STORE_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._tats: Dict[str, float] = {}
+
+    def check(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        now = self.clock()
+        tats = self._tats
+        tat = tats.get(key, now)
+        if tat < now:
+            tat = now
+        new_tat = tat + limit.interval * cost
+        retry_after = new_tat - limit.interval * limit.burst - now
+        if retry_after > 0:
+            return retry_after
+        tats[key] = new_tat
+        if len(tats) > self.maxsize:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+        while len(self._tats) > self.maxsize:
+            del self._tats[next(iter(self._tats))]
+
+    async def acquire(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        return self.check(key, limit, cost)
+
+
+_GCRA_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local increment = interval * tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + increment
+local retry_after = new_tat - interval * tonumber(ARGV[2]) - now
+if retry_after > 0 then
+    return tostring(retry_after)
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return '0'
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    GCRA store in Redis, so that every uvicorn worker enforces the same limit for a client.
+
+    Each decision is one atomic script call timed by the Redis clock, and keys expire once their TAT passes.
+    Requires the optional redis package. If Redis is unreachable requests are let through rather than failed.
+    """
+
+    def __init__(self, url: str, prefix: str = "rate-limit:"):
+        import redis.asyncio
+
+        self.prefix = prefix
+        self._redis = redis.asyncio.from_url(url)
+        self._script = self._redis.register_script(_GCRA_SCRIPT)
+
+    async def acquire(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        try:
+            retry_after = await self._script(
+                keys=[self.prefix + key], args=[limit.interval, limit.burst, cost]
+            )
+        except Exception:
+            logger.exception("Rate limit store unavailable; allowing request")
+            return 0.0
+        return float(retry_after)
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def make_rate_limit_store(url: str = RATE_LIMIT_STORE_URL) -> RateLimitStore:
+    """
+    Builds the rate limit store for the configured URL.
+
+    Args:
+        url (str): A redis:// URL, or an empty string for the in-process store.
+
+    Returns:
+        RateLimitStore: The Redis store, or the local one if no URL is set or redis is not installed.
+    """
+    if not url:
+        return LocalRateLimitStore()
+    try:
+        return RedisRateLimitStore(url)
+    except ImportError:
+        logger.warning(
+            "RATE_LIMIT_STORE_URL is set but the redis package is not installed; "
+            "rate limits will be enforced per worker"
+        )
+        return LocalRateLimitStore()
+
+
+async def _load_plans(user_ids: List[str]) -> Dict[str, str]:
+    subscriptions = await prisma.models.Subscription.prisma().find_many(
+        where={"userId": {"in": user_ids}}
+    )
+    plans = {user_id: "NONE" for user_id in user_ids}
+    for subscription in subscriptions:
+        plans[subscription.userId] = subscription.plan
+    return plans
+
+
+def _parse_networks(spec: str) -> List[IPNetwork]:
+    return [
+        ipaddress.ip_network(item.strip(), strict=False)
+        for item in spec.split(",")
+        if item.strip()
+    ]
+
+
+def _parse_address(value: str) -> Optional[IPAddress]:
+    value = value.strip().strip('"')
+    if value.startswith("["):
+        value = value[1 : value.find("]")]
+    elif value.count(":") == 1:
+        value = value.split(":", 1)[0]
+    try:
+        return ipaddress.ip_address(value)
+    except ValueError:
+        return None
+
+
+def _forwarded_for(headers: List[Tuple[bytes, bytes]]) -> List[str]:
+    """
+    Lists the client addresses recorded by the proxies in front of the app, nearest client first.
+
+    Forwarded (RFC 7239) takes precedence over X-Forwarded-For when both are present.
+    """
+    forwarded, x_forwarded_for = [], []
+    for name, value in headers:
+        if name == b"forwarded":
+            for element in value.decode("latin-1").split(","):
+                for pair in element.split(";"):
+                    key, _, address = pair.partition("=")
+                    if key.strip().lower() == "for":
+                        forwarded.append(address)
+        elif name == b"x-forwarded-for":
+            x_forwarded_for.extend(value.decode("latin-1").split(","))
+    return forwarded or x_forwarded_for
+
+
+class RateLimiter:
+    """
+    Decides which client a request is charged to and under which limit.
+
+    Requests with a valid bearer token are keyed by the token's user and limited by the user's subscription plan;
+    plans are looked up in batches and cached for RATE_LIMIT_PLAN_CACHE_TTL seconds, so a plan change applies
+    within that time. Admins are not limited. Everything else is keyed by client IP under the ANONYMOUS limit.
+
+    The client IP is the socket peer unless the peer is one of the trusted proxies, in which case it is the
+    right-most forwarded address that is not itself a trusted proxy. Only that address is used because proxies
+    append to the forwarding headers, so anything to its left was written by the client and can be forged.
+    """
+
+    def __init__(
+        self,
+        store: Optional[RateLimitStore] = None,
+        limits: Optional[Dict[str, RateLimit]] = None,
+        costs: Optional[Dict[str, float]] = None,
+        exempt_paths: Optional[List[str]] = None,
+        trusted_proxies: Optional[List[str]] = None,
+    ):
+        self.store = store or make_rate_limit_store()
+        self.limits = limits or {
+            "ANONYMOUS": RateLimit.parse(RATE_LIMIT_ANONYMOUS),
+            "NONE": RateLimit.parse(RATE_LIMIT_NONE),
+            "BASIC": RateLimit.parse(RATE_LIMIT_BASIC),
+            "PREMIUM": RateLimit.parse(RATE_LIMIT_PREMIUM),
+        }
+        self.costs = _parse_costs(RATE_LIMIT_ROUTE_COSTS) if costs is None else costs
+        self.exempt_paths = set(
+            RATE_LIMIT_EXEMPT_PATHS.split(",") if exempt_paths is None else exempt_paths
+        )
+        self.trusted_proxies = _parse_networks(
+            RATE_LIMIT_TRUSTED_PROXIES
+            if trusted_proxies is None
+            else ",".join(trusted_proxies)
+        )
+        self._plans: TTLCache[str, str] = TTLCache(
+            RATE_LIMIT_STORE_SIZE, ttl=RATE_LIMIT_PLAN_CACHE_TTL
+        )
+        self._plan_loader = project.data_loader.DataLoader(_load_plans)
+
+    async def plan_for(self, user_id: str) -> str:
+        plan = self._plans.get(user_id)
+        if plan is None:
+            try:
+                plan = await self._plan_loader.load(user_id) or "NONE"
+            except Exception:
+                logger.exception("Failed to load the subscription plan of %s", user_id)
+                return "NONE"
+            self._plans.set(user_id, plan)
+        return plan
+
+    async def client_for(self, scope) -> Tuple[Optional[str], str]:
+        """
+        Identifies the client of an ASGI request.
+
+        Returns:
+            Tuple[Optional[str], str]: The key the request is charged to and the name of its limit, or a None key
+                for clients that are not limited.
+        """
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        claims = project.tokens.verify_token(token)
+                    except Exception:
+                        break
+                    user_id = claims.get("user_id")
+                    if not user_id:
+                        break
+                    if claims.get("role") == "ADMIN":
+                        return None, "ADMIN"
+                    return "user:" + user_id, await self.plan_for(user_id)
+                break
+        return "ip:" + self.address_of(scope), "ANONYMOUS"
+
+    def _is_trusted(self, address: Optional[IPAddress]) -> bool:
+        return address is not None and any(
+            address in network for network in self.trusted_proxies
+        )
+
+    def address_of(self, scope) -> str:
+        """
+        Finds the address an anonymous ASGI request is charged to.
+
+        Returns:
+            str: The socket peer's address, or the forwarded client address if the peer is a trusted proxy.
+        """
+        client = scope.get("client")
+        if not client:
+            return "unknown"
+        if not self._is_trusted(_parse_address(client[0])):
+            return client[0]
+        address = client[0]
+        for hop in reversed(_forwarded_for(scope["headers"])):
+            parsed = _parse_address(hop)
+            if parsed is None:
+                break
+            address = str(parsed)
+            if not self._is_trusted(parsed):
+                break
+        return address
+
+    async def check(self, scope) -> float:
+        """
+        Charges an ASGI request to its client.
+
+        Returns:
+            float: 0 if the request may proceed, otherwise the seconds the client has to wait.
+        """
+        path = scope["path"]
+        if path in self.exempt_paths:
+            return 0.0
+        key, plan = await self.client_for(scope)
+        if key is None:
+            return 0.0
+        return await self.store.acquire(
+            key, self.limits[plan], self.costs.get(path, 1.0)
+        )
+
+    async def close(self) -> None:
+        await self.store.close()
+
+
+rate_limiter = RateLimiter()
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware that answers requests over their client's limit with 429 Too Many Requests and a Retry-After
+    header (in whole seconds) instead of passing them to the application.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        retry_after = await self.limiter.check(scope)
+        if retry_after <= 0:
+            await self.app(scope, receive, send)
+            return
+        body = b'{"detail":"Rate limit exceeded."}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
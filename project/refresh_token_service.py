@@ -1,8 +1,7 @@
 from datetime import datetime, timedelta
 
-import jwt
-import prisma
-import prisma.models
+import project.refresh_token_store
+import project.tokens
 from pydantic import BaseModel
 
 
@@ -16,9 +15,13 @@ class RefreshTokenResponse(BaseModel):
     expires_in: int
 
 
-SECRET_KEY = "your_very_secret_key"
+class RevokeRefreshTokenResponse(BaseModel):
+    """
+    Model for the response after revoking a refresh token.
+    """
 
-ALGORITHM = "HS256"
+    success: bool
+    message: str
 
 
 async def refresh_token(refresh_token: str) -> RefreshTokenResponse:
@@ -34,20 +37,35 @@ async def refresh_token(refresh_token: str) -> RefreshTokenResponse:
     Raises:
         ValueError: If the provided refresh token is invalid or expired, or if the associated user is not found.
     """
-    token_record = await prisma.models.APIToken.prisma().find_first(
-        where={"token": refresh_token, "expiresAt": {"gt": datetime.now()}},
-        include={"prisma.models.User": True},
-    )
-    if token_record is None or token_record.User is None:
+    token_record = await project.refresh_token_store.lookup_refresh_token(refresh_token)
+    if token_record is None:
         raise ValueError("Invalid or expired refresh token.")
     new_access_token_payload = {
-        "user_id": token_record.User.id,
-        "role": token_record.User.role,
+        "user_id": token_record.user_id,
+        "role": token_record.role,
         "exp": datetime.utcnow() + timedelta(minutes=30),
     }
-    new_access_token = jwt.encode(
-        new_access_token_payload, SECRET_KEY, algorithm=ALGORITHM
-    )
-    return RefreshTokenResponse(
+    new_access_token = project.tokens.encode_token(new_access_token_payload)
+    return RefreshTokenResponse.construct(
         access_token=new_access_token, token_type="bearer", expires_in=1800
     )
+
+
+async def revoke_refresh_token(refresh_token: str) -> RevokeRefreshTokenResponse:
+    """
+    Revokes a refresh token so it can no longer be used to obtain access tokens.
+
+    Args:
+        refresh_token (str): The refresh token to revoke.
+
+    Returns:
+        RevokeRefreshTokenResponse: Whether a matching token was found and revoked.
+    """
+    revoked = await project.refresh_token_store.revoke_refresh_token(refresh_token)
+    if not revoked:
+        return RevokeRefreshTokenResponse(
+            success=False, message="Refresh token not found."
+        )
+    return RevokeRefreshTokenResponse(
+        success=True, message="Refresh token revoked successfully."
+    )
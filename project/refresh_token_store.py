@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import prisma
+import prisma.models
+import project.db
+from project.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_CACHE_SIZE = int(os.getenv("REFRESH_TOKEN_CACHE_SIZE", "50000"))
+
+REFRESH_TOKEN_CACHE_TTL = float(os.getenv("REFRESH_TOKEN_CACHE_TTL", "60"))
+
+REFRESH_TOKEN_SWEEP_INTERVAL = float(os.getenv("REFRESH_TOKEN_SWEEP_INTERVAL", "300"))
+
+
+class RefreshTokenRecord(NamedTuple):
+    """
+    The parts of an APIToken row needed to issue a new access token.
+    """
+
+    user_id: str
+    role: str
+    expires_at: datetime
+
+
+_records: TTLCache[str, RefreshTokenRecord] = TTLCache(
+    REFRESH_TOKEN_CACHE_SIZE, ttl=REFRESH_TOKEN_CACHE_TTL, clock=time.time
+)
+
+# Tokens revoked on this worker, so a lookup that read the row before it was deleted does not cache it again.
+_revoked: TTLCache[str, bool] = TTLCache(
+    REFRESH_TOKEN_CACHE_SIZE, ttl=REFRESH_TOKEN_CACHE_TTL, clock=time.time
+)
+
+
+async def _find_token(
+    client: prisma.Prisma, token: str
+) -> Optional[prisma.models.APIToken]:
+    return await prisma.models.APIToken.prisma(client).find_first(
+        where={"token": token, "expiresAt": {"gt": datetime.now()}},
+        include={"User": True},
+    )
+
+
+async def lookup_refresh_token(token: str) -> Optional[RefreshTokenRecord]:
+    """
+    Read-through lookup of a refresh token that has not expired yet.
+
+    Hits are served from an in-process cache. Entries live for at most REFRESH_TOKEN_CACHE_TTL seconds and never past
+    the token's own expiresAt; a revocation on another worker therefore takes at most that long to be seen here.
+    Misses are read from the replica, and from the primary when the replica does not have the token (yet), so a
+    token issued moments ago is still found.
+
+    Args:
+        token (str): The refresh token presented by the client.
+
+    Returns:
+        Optional[RefreshTokenRecord]: The token owner and expiry, or None if the token is unknown or expired.
+    """
+    record = _records.get(token)
+    if record is not None:
+        return record
+    client = project.db.reader()
+    token_record = await _find_token(client, token)
+    if token_record is None and client is not project.db.primary:
+        token_record = await _find_token(project.db.primary, token)
+    if token_record is None or token_record.User is None or token in _revoked:
+        return None
+    record = RefreshTokenRecord(
+        user_id=token_record.User.id,
+        role=token_record.User.role,
+        expires_at=token_record.expiresAt,
+    )
+    _records.set(token, record, expires_at=token_record.expiresAt.timestamp())
+    return record
+
+
+def invalidate_refresh_token(token: str) -> None:
+    """
+    Drops a refresh token from this worker's cache.
+
+    Args:
+        token (str): The refresh token to forget.
+    """
+    _records.pop(token)
+
+
+async def revoke_refresh_token(token: str) -> bool:
+    """
+    Deletes a refresh token and invalidates its cache entry.
+
+    The cache entry is dropped after the row is deleted, and the token is remembered as revoked for
+    REFRESH_TOKEN_CACHE_TTL seconds, so a lookup racing with the revocation can neither keep nor re-cache it.
+
+    Args:
+        token (str): The refresh token to revoke.
+
+    Returns:
+        bool: Whether a token was deleted.
+    """
+    _revoked.set(token, True)
+    deleted = await prisma.models.APIToken.prisma().delete_many(where={"token": token})
+    invalidate_refresh_token(token)
+    return deleted > 0
+
+
+async def sweep_expired_tokens() -> int:
+    """
+    Deletes every expired token in a single bulk statement.
+
+    Returns:
+        int: The number of deleted tokens.
+    """
+    return await prisma.models.APIToken.prisma().delete_many(
+        where={"expiresAt": {"lt": datetime.now()}}
+    )
+
+
+class RefreshTokenSweeper:
+    """
+    Background task that periodically bulk-deletes expired tokens so the APIToken table stays small.
+    """
+
+    def __init__(self, interval: float = REFRESH_TOKEN_SWEEP_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                deleted = await sweep_expired_tokens()
+                if deleted:
+                    logger.info("Swept %d expired API tokens", deleted)
+            except Exception:
+                logger.exception("Failed to sweep expired API tokens")
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+sweeper = RefreshTokenSweeper()
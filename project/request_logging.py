@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+import prisma
+import prisma.enums
+import prisma.models
+import project.instrumentation
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+REQUEST_LOG_BUFFER_SIZE = int(os.getenv("REQUEST_LOG_BUFFER_SIZE", "10000"))
+
+REQUEST_LOG_FLUSH_SIZE = int(os.getenv("REQUEST_LOG_FLUSH_SIZE", "500"))
+
+REQUEST_LOG_FLUSH_INTERVAL = float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", "5"))
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+ROUTE_MODULES = (
+    ("/user", prisma.enums.ModuleName.USERMANAGEMENT),
+    ("/integration", prisma.enums.ModuleName.INTEGRATIONSERVICES),
+    ("/outbox", prisma.enums.ModuleName.INTEGRATIONSERVICES),
+    ("/data", prisma.enums.ModuleName.DATAPROCESSING),
+)
+
+
+def module_for_path(path: str) -> prisma.enums.ModuleName:
+    """
+    Maps a route path to the module it belongs to.
+
+    Args:
+        path (str): The route path template, e.g. /outbox/{outbox_id}.
+
+    Returns:
+        ModuleName: The owning module, APIGATEWAY for routes outside every module.
+    """
+    for prefix, module in ROUTE_MODULES:
+        if path == prefix or path.startswith(prefix + "/"):
+            return module
+    return prisma.enums.ModuleName.APIGATEWAY
+
+
+class RequestRecord(NamedTuple):
+    """
+    One timed request waiting to be written to the APIRequest table.
+    """
+
+    endpoint: str
+    module: prisma.enums.ModuleName
+    response_time_ms: int
+    success: bool
+    created_at: datetime
+
+
+class RequestLogBuffer:
+    """
+    Bounded in-memory buffer of request records that a background task flushes to APIRequest in batches.
+
+    record() only appends to a deque and never waits, so logging adds no latency to the request. When the flusher
+    falls behind and the buffer is full the oldest records are dropped and counted instead of applying backpressure.
+    The flusher writes with a single create_many once flush_size records are waiting or every flush_interval
+    seconds, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        capacity: int = REQUEST_LOG_BUFFER_SIZE,
+        flush_size: int = REQUEST_LOG_FLUSH_SIZE,
+        flush_interval: float = REQUEST_LOG_FLUSH_INTERVAL,
+    ):
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._records: Deque[RequestRecord] = deque(maxlen=capacity)
+        self._module_ids: Dict[prisma.enums.ModuleName, str] = {}
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def record(self, record: RequestRecord) -> None:
+        if len(self._records) == self.capacity:
+            self.dropped += 1
+        self._records.append(record)
+        if len(self._records) >= self.flush_size:
+            self._ready.set()
+
+    async def _module_id(self, module: prisma.enums.ModuleName) -> str:
+        module_id = self._module_ids.get(module)
+        if module_id is None:
+            row = await prisma.models.Module.prisma().find_first(
+                where={"name": module}
+            ) or await prisma.models.Module.prisma().create(data={"name": module})
+            module_id = self._module_ids[module] = row.id
+        return module_id
+
+    async def flush(self) -> int:
+        """
+        Writes everything currently buffered to the APIRequest table.
+
+        Returns:
+            int: The number of rows written. Records of a failed batch are dropped and counted, not retried.
+        """
+        written = 0
+        while self._records:
+            batch: List[RequestRecord] = [
+                self._records.popleft()
+                for _ in range(min(self.flush_size, len(self._records)))
+            ]
+            try:
+                data = [
+                    {
+                        "endpoint": record.endpoint,
+                        "responseTimeMs": record.response_time_ms,
+                        "success": record.success,
+                        "moduleId": await self._module_id(record.module),
+                        "createdAt": record.created_at,
+                    }
+                    for record in batch
+                ]
+                written += await prisma.models.APIRequest.prisma().create_many(
+                    data=data
+                )
+            except Exception:
+                self.dropped += len(batch)
+                logger.exception("Failed to write %d API request records", len(batch))
+        self.written += written
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+request_log = RequestLogBuffer()
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware that times every HTTP request, records it in the live latency histograms and hands a
+    RequestRecord to the request log buffer.
+
+    The endpoint is recorded as the matched route's path template rather than the raw URL, so /outbox/{outbox_id}
+    is one endpoint no matter how many IDs are requested. Requests that matched no route are logged with their raw
+    path but share a single UNMATCHED_ROUTE label in the histograms. The time covers the whole response, including
+    streamed bodies. Phases the handler marked are kept per route; if it marked any, the time between the last one
+    and the start of the response is recorded as the "serialize" phase.
+    """
+
+    def __init__(
+        self,
+        app,
+        buffer: Optional[RequestLogBuffer] = None,
+    ):
+        self.app = app
+        self.buffer = buffer or request_log
+        self._route_paths: Dict[object, str] = {}
+
+    def _route_path(self, scope) -> Optional[str]:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return None
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = scope["path"]
+            self._route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+        timings = project.instrumentation.begin_request(start)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if timings.phases:
+                    project.instrumentation.mark("serialize")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            path = self._route_path(scope)
+            project.instrumentation.metrics.observe_request(
+                scope["method"], path or UNMATCHED_ROUTE, status_code, elapsed, timings
+            )
+            if REQUEST_LOG_ENABLED:
+                path = path or scope["path"]
+                self.buffer.record(
+                    RequestRecord(
+                        endpoint=f"{scope['method']} {path}",
+                        module=module_for_path(path),
+                        response_time_ms=round(elapsed * 1000),
+                        success=status_code < 400,
+                        created_at=datetime.now(timezone.utc),
+                    )
+                )
@@ -0,0 +1,673 @@
+"""
+Time-based partitioning, retention and archival for the append-only APIRequest and ActivityLog tables.
+
+setup also gives each table a DEFAULT partition, so inserts keep working when RETENTION_ENABLED is off and no
+partition exists for the current period; enable the job (or call run regularly) to keep rows out of it.
+
+Usage:
+    python -m project.retention setup   # convert the tables to partitioned tables (once, after prisma db push)
+    python -m project.retention run     # create upcoming partitions and apply retention now
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import prisma
+import prisma.enums
+import prisma.errors
+import prisma.models
+
+logger = logging.getLogger(__name__)
+
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+
+# "day" or "month"; one partition covers one such period.
+RETENTION_PARTITION_INTERVAL = os.getenv("RETENTION_PARTITION_INTERVAL", "month")
+
+RETENTION_PARTITIONS_AHEAD = int(os.getenv("RETENTION_PARTITIONS_AHEAD", "3"))
+
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+
+RETENTION_EXPORT_BATCH_SIZE = int(os.getenv("RETENTION_EXPORT_BATCH_SIZE", "5000"))
+
+# How long the lease that keeps other workers from running retention at the same time lasts without renewal. The
+# running worker renews it every third of this; a worker that dies mid-run frees it after at most this long.
+RETENTION_LEASE_SECONDS = float(os.getenv("RETENTION_LEASE_SECONDS", "300"))
+
+RETENTION_LEASE_NAME = "project.retention"
+
+# APIRequest rows are kept for RETENTION_DAYS_<MODULENAME> days, or RETENTION_DEFAULT_DAYS for modules without an
+# override and requests without a module.
+RETENTION_DEFAULT_DAYS = int(os.getenv("RETENTION_DEFAULT_DAYS", "90"))
+
+RETENTION_ACTIVITY_LOG_DAYS = int(
+    os.getenv("RETENTION_ACTIVITY_LOG_DAYS", str(RETENTION_DEFAULT_DAYS))
+)
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class PartitionedTable(NamedTuple):
+    """
+    A table partitioned by createdAt, with the constraints Prisma expects it to have.
+    """
+
+    name: str
+    constraints_sql: Tuple[str, ...]
+
+
+API_REQUESTS = PartitionedTable(
+    name="APIRequest",
+    constraints_sql=(
+        'ALTER TABLE "APIRequest" ADD CONSTRAINT "APIRequest_pkey" PRIMARY KEY (id, "createdAt")',
+        'CREATE INDEX "APIRequest_createdAt_idx" ON "APIRequest" ("createdAt")',
+        'CREATE INDEX "APIRequest_userId_createdAt_idx" ON "APIRequest" ("userId", "createdAt")',
+        'ALTER TABLE "APIRequest" ADD CONSTRAINT "APIRequest_userId_fkey" FOREIGN KEY ("userId") '
+        'REFERENCES "User" (id) ON DELETE CASCADE ON UPDATE CASCADE',
+        'ALTER TABLE "APIRequest" ADD CONSTRAINT "APIRequest_moduleId_fkey" FOREIGN KEY ("moduleId") '
+        'REFERENCES "Module" (id) ON DELETE SET NULL ON UPDATE CASCADE',
+    ),
+)
+
+ACTIVITY_LOGS = PartitionedTable(
+    name="ActivityLog",
+    constraints_sql=(
+        'ALTER TABLE "ActivityLog" ADD CONSTRAINT "ActivityLog_pkey" PRIMARY KEY (id, "createdAt")',
+        'CREATE INDEX "ActivityLog_createdAt_idx" ON "ActivityLog" ("createdAt")',
+        'CREATE INDEX "ActivityLog_userId_createdAt_idx" ON "ActivityLog" ("userId", "createdAt")',
+        'ALTER TABLE "ActivityLog" ADD CONSTRAINT "ActivityLog_userId_fkey" FOREIGN KEY ("userId") '
+        'REFERENCES "User" (id) ON DELETE CASCADE ON UPDATE CASCADE',
+    ),
+)
+
+TABLES = (API_REQUESTS, ACTIVITY_LOGS)
+
+
+def module_retention_days() -> Dict[str, int]:
+    """
+    Returns the APIRequest retention of every ModuleName, in days.
+    """
+    return {
+        module.value: int(
+            os.getenv(f"RETENTION_DAYS_{module.value}", str(RETENTION_DEFAULT_DAYS))
+        )
+        for module in prisma.enums.ModuleName
+    }
+
+
+def partition_start(
+    moment: datetime, interval: str = RETENTION_PARTITION_INTERVAL
+) -> datetime:
+    """
+    Returns the start of the partition period containing moment.
+    """
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    if interval == "month":
+        start = start.replace(day=1)
+    elif interval != "day":
+        raise ValueError(f"Unsupported partition interval {interval!r}")
+    return start
+
+
+def next_partition_start(
+    start: datetime, interval: str = RETENTION_PARTITION_INTERVAL
+) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def _utc_naive(moment: datetime) -> datetime:
+    # Prisma stores DateTime as UTC timestamp(3) without time zone.
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+async def is_partitioned(table: str) -> bool:
+    rows = await prisma.get_client().query_raw(
+        "SELECT relkind::text AS kind FROM pg_class WHERE relname = $1 AND relkind IN ('r', 'p')",
+        table,
+    )
+    return bool(rows) and rows[0]["kind"] == "p"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+async def ensure_default_partition(table: PartitionedTable) -> str:
+    """
+    Adds a DEFAULT partition to a table partitioned before setup created one.
+
+    Returns:
+        str: The name of the DEFAULT partition.
+    """
+    default = default_partition_name(table.name)
+    await prisma.get_client().execute_raw(
+        f'CREATE TABLE IF NOT EXISTS "{default}" PARTITION OF "{table.name}" DEFAULT'
+    )
+    return default
+
+
+async def create_partitions(
+    table: PartitionedTable,
+    start: datetime,
+    until: datetime,
+    interval: str = RETENTION_PARTITION_INTERVAL,
+) -> List[str]:
+    """
+    Makes sure partitions exist for every period from the one containing start to the one containing until.
+
+    Rows that landed in the table's DEFAULT partition because their period had no partition yet are moved into the
+    new partition in the same transaction that attaches it.
+
+    Args:
+        table (PartitionedTable): The partitioned table.
+        start (datetime): The earliest moment that needs a partition.
+        until (datetime): The latest moment that needs a partition.
+        interval (str): The partition period, "day" or "month".
+
+    Returns:
+        List[str]: The names of all partitions in the range, whether they were created or already existed.
+    """
+    client = prisma.get_client()
+    default = await ensure_default_partition(table)
+    existing = {name for name, _, _ in await attached_partitions(table.name)}
+    names: List[str] = []
+    period = partition_start(_utc_naive(start), interval)
+    last = partition_start(_utc_naive(until), interval)
+    while period <= last:
+        end = next_partition_start(period, interval)
+        name = partition_name(table.name, period)
+        if name not in existing:
+            async with client.tx(timeout=timedelta(hours=1)) as tx:
+                await tx.execute_raw(
+                    f'CREATE TABLE "{name}" (LIKE "{table.name}" INCLUDING DEFAULTS)'
+                )
+                await tx.execute_raw(
+                    f'WITH moved AS (DELETE FROM "{default}" '
+                    f'WHERE "createdAt" >= $1::timestamp AND "createdAt" < $2::timestamp RETURNING *) '
+                    f'INSERT INTO "{name}" SELECT * FROM moved',
+                    period.isoformat(),
+                    end.isoformat(),
+                )
+                await tx.execute_raw(
+                    f'ALTER TABLE "{table.name}" ATTACH PARTITION "{name}" '
+                    f"FOR VALUES FROM ('{period.isoformat()}') TO ('{end.isoformat()}')"
+                )
+        names.append(name)
+        period = end
+    return names
+
+
+async def convert_to_partitioned(
+    table: PartitionedTable,
+    now: Optional[datetime] = None,
+    ahead: int = RETENTION_PARTITIONS_AHEAD,
+    interval: str = RETENTION_PARTITION_INTERVAL,
+) -> bool:
+    """
+    Rebuilds a plain table as a table range-partitioned by createdAt, keeping its rows and constraints.
+
+    The new table is built next to the old one, filled with INSERT ... SELECT and swapped in inside a single
+    transaction, so writes to the table block until the copy is done. Run it during a quiet period.
+
+    Besides one partition per period up to ahead periods from now, the table gets a DEFAULT partition that takes
+    rows no period partition covers, so inserts keep working if the retention job is disabled or falls behind.
+    The job moves those rows into proper partitions once it runs.
+
+    Args:
+        table (PartitionedTable): The table to convert.
+        now (Optional[datetime]): The current time; partitions are created up to ahead periods after it.
+        ahead (int): How many future periods get a partition.
+        interval (str): The partition period, "day" or "month".
+
+    Returns:
+        bool: False if the table was already partitioned.
+    """
+    if await is_partitioned(table.name):
+        return False
+    client = prisma.get_client()
+    now = _utc_naive(now or datetime.now(timezone.utc))
+    rows = await client.query_raw(
+        f'SELECT min("createdAt") AS oldest FROM "{table.name}"'
+    )
+    oldest = rows[0]["oldest"] if rows else None
+    start = datetime.fromisoformat(oldest.replace("Z", "+00:00")) if oldest else now
+    staging = f"{table.name}_partitioned"
+    async with client.tx(timeout=timedelta(hours=1)) as tx:
+        await tx.execute_raw(
+            f'CREATE TABLE "{staging}" (LIKE "{table.name}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("createdAt")'
+        )
+        period = partition_start(_utc_naive(start), interval)
+        last = partition_start(now, interval)
+        for _ in range(ahead):
+            last = next_partition_start(last, interval)
+        while period <= last:
+            end = next_partition_start(period, interval)
+            await tx.execute_raw(
+                f'CREATE TABLE "{partition_name(table.name, period)}" PARTITION OF "{staging}" '
+                f"FOR VALUES FROM ('{period.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            period = end
+        await tx.execute_raw(
+            f'CREATE TABLE "{default_partition_name(table.name)}" PARTITION OF "{staging}" DEFAULT'
+        )
+        await tx.execute_raw(f'INSERT INTO "{staging}" SELECT * FROM "{table.name}"')
+        await tx.execute_raw(f'DROP TABLE "{table.name}"')
+        await tx.execute_raw(f'ALTER TABLE "{staging}" RENAME TO "{table.name}"')
+        for sql in table.constraints_sql:
+            await tx.execute_raw(sql)
+    return True
+
+
+async def attached_partitions(table: str) -> List[Tuple[str, datetime, datetime]]:
+    """
+    Lists the partitions of a table with their [start, end) bounds, oldest first.
+    """
+    rows = await prisma.get_client().query_raw(
+        """
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = $1
+        """,
+        table,
+    )
+    partitions = []
+    for row in rows:
+        match = _BOUND_PATTERN.search(row["bound"])
+        if match:
+            partitions.append(
+                (
+                    row["name"],
+                    datetime.fromisoformat(match.group(1)),
+                    datetime.fromisoformat(match.group(2)),
+                )
+            )
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def detached_partitions(table: str) -> List[str]:
+    """
+    Lists partitions of a table that were detached but not yet archived, e.g. because an export was interrupted.
+    """
+    rows = await prisma.get_client().query_raw(
+        "SELECT relname AS name FROM pg_class "
+        "WHERE relname LIKE $1 AND relkind = 'r' AND NOT relispartition ORDER BY relname",
+        table + "\\_p%",
+    )
+    return [row["name"] for row in rows]
+
+
+def _write_lines(path: str, lines: List[str], append: bool) -> None:
+    with gzip.open(path, "at" if append else "wt", encoding="utf-8") as file:
+        file.writelines(lines)
+
+
+async def export_rows(path: str, rows: List[Dict[str, Any]], append: bool) -> None:
+    lines = [json.dumps(row, default=str) + "\n" for row in rows]
+    await asyncio.to_thread(_write_lines, path, lines, append)
+
+
+async def archive_partition(
+    table: str,
+    partition: str,
+    archive_dir: str = RETENTION_ARCHIVE_DIR,
+    batch_size: int = RETENTION_EXPORT_BATCH_SIZE,
+) -> str:
+    """
+    Detaches a partition, exports its rows to a gzip-compressed NDJSON file and drops it.
+
+    The file is written under a temporary name and renamed once complete, so a finished archive is never partial.
+    If the export fails the partition stays detached and is picked up again by the next run.
+
+    Args:
+        table (str): The partitioned table.
+        partition (str): The partition to archive.
+        archive_dir (str): Directory that receives one <table>/<partition>.ndjson.gz file per partition.
+        batch_size (int): Rows read per query while exporting.
+
+    Returns:
+        str: The path of the archive file.
+    """
+    client = prisma.get_client()
+    if partition in {name for name, _, _ in await attached_partitions(table)}:
+        await client.execute_raw(
+            f'ALTER TABLE "{table}" DETACH PARTITION "{partition}"'
+        )
+
+    directory = os.path.join(archive_dir, table)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{partition}.ndjson.gz")
+    partial = path + ".partial"
+    cursor: Tuple[str, str] = ("-infinity", "")
+    append = False
+    while True:
+        rows = await client.query_raw(
+            f'SELECT * FROM "{partition}" WHERE ("createdAt", id) > ($1::timestamp, $2) '
+            f'ORDER BY "createdAt", id LIMIT {int(batch_size)}',
+            *cursor,
+        )
+        if not rows and append:
+            break
+        await export_rows(partial, rows, append)
+        append = True
+        if len(rows) < batch_size:
+            break
+        cursor = (rows[-1]["createdAt"], rows[-1]["id"])
+    os.replace(partial, path)
+    await client.execute_raw(f'DROP TABLE "{partition}"')
+    return path
+
+
+async def expire_module_rows(
+    module: str,
+    cutoff: datetime,
+    archive_dir: str = RETENTION_ARCHIVE_DIR,
+    batch_size: int = RETENTION_EXPORT_BATCH_SIZE,
+) -> int:
+    """
+    Archives and then deletes APIRequest rows of one module older than cutoff from partitions that are still attached.
+
+    Used for modules whose retention is shorter than the partition retention. Requests without a module are
+    expired with module "" and the default retention. Each batch is written to the archive before it is deleted, so
+    a failure between the two leaves the rows in place; the next run archives them again to a new file.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    client = prisma.get_client()
+    directory = os.path.join(archive_dir, API_REQUESTS.name)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory,
+        f"{module or 'NO_MODULE'}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.ndjson.gz",
+    )
+    module_filter = (
+        '"moduleId" IN (SELECT id FROM "Module" WHERE name::text = $2)'
+        if module
+        else "\"moduleId\" IS NULL AND $2 = ''"
+    )
+    expired = f'"createdAt" < $1::timestamp AND {module_filter}'
+    deleted = 0
+    while True:
+        rows = await client.query_raw(
+            f'SELECT * FROM "APIRequest" WHERE {expired} '
+            f'ORDER BY "createdAt", id LIMIT {int(batch_size)}',
+            _utc_naive(cutoff).isoformat(),
+            module,
+        )
+        if not rows:
+            break
+        await export_rows(path, rows, append=deleted > 0)
+        # Rows past the cutoff are no longer written, so the expired rows up to the last one exported are exactly
+        # the rows in this batch.
+        count = await client.execute_raw(
+            f'DELETE FROM "APIRequest" WHERE {expired} '
+            f'AND ("createdAt", id) <= ($3::timestamp, $4)',
+            _utc_naive(cutoff).isoformat(),
+            module,
+            rows[-1]["createdAt"],
+            rows[-1]["id"],
+        )
+        if not count:
+            break
+        deleted += count
+    return deleted
+
+
+async def _oldest_unpartitioned(table: PartitionedTable, now: datetime) -> datetime:
+    # Rows in the DEFAULT partition belong to periods that had no partition when they were written.
+    rows = await prisma.get_client().query_raw(
+        f'SELECT min("createdAt") AS oldest FROM "{await ensure_default_partition(table)}"'
+    )
+    oldest = rows[0]["oldest"] if rows else None
+    if not oldest:
+        return now
+    return min(now, _utc_naive(datetime.fromisoformat(oldest.replace("Z", "+00:00"))))
+
+
+async def apply_retention(
+    table: PartitionedTable,
+    now: Optional[datetime] = None,
+    ahead: int = RETENTION_PARTITIONS_AHEAD,
+    interval: str = RETENTION_PARTITION_INTERVAL,
+) -> None:
+    """
+    Creates upcoming partitions of a partitioned table and archives the partitions and rows past retention.
+
+    Partitions are also created for the periods of any rows in the DEFAULT partition, which moves them out of it.
+
+    A partition is archived once its whole range is older than the longest retention that applies to the table.
+    For APIRequest, modules with a shorter retention then have their older rows deleted (and archived) from the
+    partitions that remain.
+    """
+    if not await is_partitioned(table.name):
+        logger.warning(
+            "%s is not partitioned; run `python -m project.retention setup` first",
+            table.name,
+        )
+        return
+    now = _utc_naive(now or datetime.now(timezone.utc))
+    upcoming = partition_start(now, interval)
+    for _ in range(ahead):
+        upcoming = next_partition_start(upcoming, interval)
+    await create_partitions(
+        table, await _oldest_unpartitioned(table, now), upcoming, interval
+    )
+
+    if table is API_REQUESTS:
+        retention = {"": RETENTION_DEFAULT_DAYS, **module_retention_days()}
+    else:
+        retention = {"": RETENTION_ACTIVITY_LOG_DAYS}
+    partition_cutoff = now - timedelta(days=max(retention.values()))
+
+    for partition in await detached_partitions(table.name):
+        logger.info("Archiving previously detached partition %s", partition)
+        await archive_partition(table.name, partition)
+    for partition, _, end in await attached_partitions(table.name):
+        if end <= partition_cutoff:
+            path = await archive_partition(table.name, partition)
+            logger.info("Archived partition %s to %s", partition, path)
+
+    if table is API_REQUESTS:
+        for module, days in retention.items():
+            cutoff = now - timedelta(days=days)
+            if cutoff > partition_cutoff:
+                deleted = await expire_module_rows(module, cutoff)
+                if deleted:
+                    logger.info(
+                        "Expired %d APIRequest rows of module %s",
+                        deleted,
+                        module or "<none>",
+                    )
+
+
+async def acquire_lease(name: str, holder: str, seconds: float) -> bool:
+    """
+    Takes the named JobLease for holder if it is free, expired or already held by holder.
+
+    Returns:
+        bool: True if holder now holds the lease for the next seconds.
+    """
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=seconds)
+    leases = prisma.models.JobLease.prisma()
+    taken = await leases.update_many(
+        where={
+            "name": name,
+            "OR": [{"expiresAt": {"lt": now}}, {"holder": holder}],
+        },
+        data={"holder": holder, "expiresAt": expires_at},
+    )
+    if taken:
+        return True
+    try:
+        await leases.create(
+            data={"name": name, "holder": holder, "expiresAt": expires_at}
+        )
+    except prisma.errors.UniqueViolationError:
+        return False
+    return True
+
+
+async def renew_lease(name: str, holder: str, seconds: float) -> bool:
+    """
+    Extends a lease held by holder.
+
+    Returns:
+        bool: False if holder no longer holds the lease.
+    """
+    return bool(
+        await prisma.models.JobLease.prisma().update_many(
+            where={"name": name, "holder": holder},
+            data={"expiresAt": datetime.now(timezone.utc) + timedelta(seconds=seconds)},
+        )
+    )
+
+
+async def release_lease(name: str, holder: str) -> None:
+    await prisma.models.JobLease.prisma().delete_many(
+        where={"name": name, "holder": holder}
+    )
+
+
+class RetentionJob:
+    """
+    Background task that keeps partitions ahead of time and applies retention to every partitioned table.
+
+    Every worker runs the job, but a run only proceeds while it holds the retention JobLease, so at most one worker
+    archives and drops partitions at a time; the others skip that run. The lease is a row with an expiry renewed
+    while the run goes on, so no connection or transaction stays open for the length of the run. A run that loses
+    its lease stops; every step archives before it deletes, so the next run picks up where it left off.
+    """
+
+    def __init__(
+        self,
+        interval: float = RETENTION_INTERVAL,
+        lease_seconds: float = RETENTION_LEASE_SECONDS,
+    ):
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self.holder = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    async def _apply_all(self) -> None:
+        for table in TABLES:
+            try:
+                await apply_retention(table)
+            except Exception:
+                logger.exception("Failed to apply retention to %s", table.name)
+
+    async def _keep_lease(self, run: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await renew_lease(
+                    RETENTION_LEASE_NAME, self.holder, self.lease_seconds
+                )
+            except Exception:
+                logger.exception("Failed to renew the retention lease")
+                continue
+            if not renewed:
+                logger.warning("Lost the retention lease; stopping this run")
+                run.cancel()
+                return
+
+    async def run_once(self) -> bool:
+        """
+        Applies retention to every table unless another worker is already doing so.
+
+        Returns:
+            bool: False if the run was skipped because another worker holds the lease, or stopped because this
+                worker lost it.
+        """
+        if not await acquire_lease(
+            RETENTION_LEASE_NAME, self.holder, self.lease_seconds
+        ):
+            logger.debug("Retention is already running in another worker")
+            return False
+        run = asyncio.create_task(self._apply_all())
+        keeper = asyncio.create_task(self._keep_lease(run))
+        try:
+            await run
+        except asyncio.CancelledError:
+            if not keeper.done():
+                raise
+            return False
+        finally:
+            keeper.cancel()
+            try:
+                await release_lease(RETENTION_LEASE_NAME, self.holder)
+            except Exception:
+                logger.exception("Failed to release the retention lease")
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Failed to run retention")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and RETENTION_ENABLED and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+retention_job = RetentionJob()
+
+
+async def main(command: str) -> None:
+    db = prisma.Prisma(auto_register=True)
+    await db.connect()
+    try:
+        if command == "setup":
+            for table in TABLES:
+                converted = await convert_to_partitioned(table)
+                print(
+                    f"{table.name}: {'converted' if converted else 'already partitioned'}"
+                )
+        elif command == "run":
+            await retention_job.run_once()
+        else:
+            raise SystemExit(__doc__)
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else ""))
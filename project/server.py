@@ -1,41 +1,119 @@
 import logging
 from contextlib import asynccontextmanager
+from datetime import datetime
 from typing import List, Optional
 
+import project.analytics_rollups
 import project.crm_integration_service
+import project.db
+import project.fast_json
 import project.get_user_profile_service
+import project.http_client_pool
+import project.instrumentation
 import project.login_service
+import project.outbox_service
+import project.password_hashing
 import project.payment_gateway_integration_service
+import project.process_data_binary
+import project.process_data_executor
 import project.process_data_service
+import project.process_data_sessions
+import project.process_data_stream
+import project.rate_limiting
 import project.refresh_token_service
+import project.refresh_token_store
+import project.request_logging
+import project.retention
+import project.startup
 import project.update_user_profile_service
-from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
+import project.user_profile_cache
+from fastapi import FastAPI, Request
 from fastapi.responses import Response
-from prisma import Prisma
 
 logger = logging.getLogger(__name__)
 
-db_client = Prisma(auto_register=True)
+project.startup.startup.mark("imports")
+
+db_client = project.db.primary
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await db_client.connect()
+    project.startup.startup.mark("server")
+    await project.db.connect()
+    project.startup.startup.mark("database")
+    project.http_client_pool.open_pool()
+    project.process_data_executor.executor.start()
+    project.refresh_token_store.sweeper.start()
+    project.payment_gateway_integration_service.sweeper.start()
+    project.outbox_service.worker_pool.start()
+    project.request_logging.request_log.start()
+    await project.user_profile_cache.profile_cache.start()
+    project.analytics_rollups.rollup_job.start()
+    project.retention.retention_job.start()
+    project.startup.startup.mark("services")
+    await project.startup.warmup.start(app)
     yield
-    await db_client.disconnect()
+    await project.startup.warmup.stop()
+    await project.retention.retention_job.stop()
+    await project.analytics_rollups.rollup_job.stop()
+    await project.user_profile_cache.profile_cache.stop()
+    await project.request_logging.request_log.stop()
+    await project.outbox_service.worker_pool.stop()
+    await project.payment_gateway_integration_service.sweeper.stop()
+    await project.refresh_token_store.sweeper.stop()
+    await project.http_client_pool.close_pool()
+    project.process_data_executor.executor.shutdown()
+    await project.rate_limiting.rate_limiter.close()
+    project.password_hashing.password_hasher.shutdown()
+    await project.db.disconnect()
 
 
 app = FastAPI(
     title="Developer Toolkit",
-    lifespan=lifespan,
+    default_response_class=project.fast_json.FastJSONResponse,
     description="Based on our discussions regarding the Multi-Purpose API Toolkit, we've identified key features and requirements that will guide the development process. The toolkit, designed to serve a myriad of functionalities within a single endpoint, eliminates the need for integrating multiple third-party services. Here are the detailed insights gathered from our interview sessions: \n\n1. **Scalability and Performance**: There are no specific scalability concerns or performance benchmarks that the API needs to meet for the project at this stage. However, efficient data processing and high availability remain paramount to ensure a seamless user experience.\n\n2. **Data Privacy and Security Features**: No specific preferences or requirements for data privacy and security features were mentioned. Still, secure authentication methods were emphasized to protect sensitive information, indicating an underlying need for robust security measures.\n\n3. **Key Functionalities**: The project prioritizes real-time data processing, robust error handling, and secure authentication methods. These features aim to maintain data security and operational reliability while delivering a seamless user experience.\n\n4. **Primary User Scenario**: Tailoring for SMEs managing their sales pipelines and customer relations, the toolkit must facilitate easy data entry, efficient retrieval of information, and insightful analytics to enhance the decision-making process.\n\n5. **System Integration Requirements**: Integration with CRM systems, payment gateways, and third-party cloud services was highlighted as crucial. This ensures seamless data exchange and functionality enhancement, emphasizing the need for versatile API capabilities such as currency exchange rates, IP geolocation data, and real-time insights via data analytics tools integration.\n\nThe development will leverage the specified tech stack (Python with FastAPI, PostgreSQL database, and Prisma ORM) to address these requirements. The API toolkit will include endpoints for QR code generation, currency exchange rates, IP geolocation, image resizing, password strength checking, text-to-speech conversion, barcode generation, email validation, time zone conversion, URL preview, PDF watermarking, and RSS feed to JSON conversion. This comprehensive suite aims to offer an all-in-one solution for developers, streamlining the execution of common tasks and integrating essential functionalities into their projects.",
 )
 
+# FastAPI 0.78 has no lifespan parameter, so the lifespan is handed to the router directly.
+app.router.lifespan_context = lifespan
+
+app.router.route_class = project.fast_json.FastJSONRoute
+
+app.add_middleware(project.process_data_binary.MsgpackBodyLimitMiddleware)
+app.add_middleware(project.rate_limiting.RateLimitMiddleware)
+app.add_middleware(project.request_logging.RequestTimingMiddleware)
+
+
+@app.get("/metrics")
+async def api_get_metrics() -> Response:
+    """
+    Exposes per-route and per-phase latency histograms, database pool and bcrypt pool metrics in the Prometheus text format.
+    """
+    return Response(
+        content=project.instrumentation.metrics.render()
+        + await project.db.render_metrics()
+        + project.password_hashing.password_hasher.render()
+        + project.startup.startup.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/ready", response_model=project.startup.ReadinessResponse)
+async def api_get_ready() -> project.startup.ReadinessResponse | Response:
+    """
+    Reports whether this worker has finished warming up; answers 503 until it has, and again once it is shutting down.
+    """
+    res = project.startup.startup.report()
+    if not res.ready:
+        return project.fast_json.FastJSONResponse(content=res, status_code=503)
+    return res
+
 
 @app.post(
     "/user/refresh", response_model=project.refresh_token_service.RefreshTokenResponse
 )
+@project.fast_json.trusted_response
 async def api_post_refresh_token(
     refresh_token: str,
 ) -> project.refresh_token_service.RefreshTokenResponse | Response:
@@ -49,17 +127,34 @@ async def api_post_refresh_token(
         logger.exception("Error processing request")
         res = dict()
         res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/user/refresh/revoke",
+    response_model=project.refresh_token_service.RevokeRefreshTokenResponse,
+)
+async def api_post_revoke_refresh_token(
+    refresh_token: str,
+) -> project.refresh_token_service.RevokeRefreshTokenResponse | Response:
+    """
+    Revokes a refresh token so it can no longer be used
+    """
+    try:
+        res = await project.refresh_token_service.revoke_refresh_token(refresh_token)
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
 
 
 @app.get(
     "/user/profile",
     response_model=project.get_user_profile_service.GetUserProfileResponse,
 )
+@project.fast_json.trusted_response
 async def api_get_get_user_profile() -> project.get_user_profile_service.GetUserProfileResponse | Response:
     """
     Retrieves the profile of the authenticated user
@@ -71,11 +166,32 @@ async def api_get_get_user_profile() -> project.get_user_profile_service.GetUser
         logger.exception("Error processing request")
         res = dict()
         res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/user/profiles",
+    response_model=project.get_user_profile_service.GetUserProfilesResponse,
+)
+@project.fast_json.trusted_response
+async def api_post_get_user_profiles(
+    user_ids: List[str],
+) -> project.get_user_profile_service.GetUserProfilesResponse | Response:
+    """
+    Retrieves the profiles of many users in one request.
+    """
+    try:
+        res = await project.get_user_profile_service.get_user_profiles(user_ids)
+        return res
+    except ValueError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=400)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
 
 
 @app.post(
@@ -88,24 +204,53 @@ async def api_post_payment_gateway_integration(
     currency: str,
     payment_method: str,
     description: Optional[str],
+    idempotency_key: Optional[str] = None,
 ) -> project.payment_gateway_integration_service.PaymentGatewayIntegrationResponse | Response:
     """
-    Connects to payment gateways to facilitate transactions.
+    Connects to payment gateways to facilitate transactions. Repeating an idempotency key returns the recorded response without charging again, or 409 while the first charge is still in progress.
     """
     try:
         res = await project.payment_gateway_integration_service.payment_gateway_integration(
-            user_id, amount, currency, payment_method, description
+            user_id, amount, currency, payment_method, description, idempotency_key
         )
         return res
+    except project.payment_gateway_integration_service.IdempotencyKeyConflictError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=409)
+    except project.payment_gateway_integration_service.IdempotencyKeyInProgressError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=409)
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
         res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/integration/payment/batch",
+    response_model=project.payment_gateway_integration_service.PaymentBatchResponse,
+)
+async def api_post_payment_batch(
+    items: List[project.payment_gateway_integration_service.PaymentBatchItem],
+) -> project.payment_gateway_integration_service.PaymentBatchResponse | Response:
+    """
+    Submits many charges concurrently, returning a result per charge.
+    """
+    try:
+        res = await project.payment_gateway_integration_service.payment_batch(items)
+        return res
+    except ValueError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=400)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
 
 
 @app.post(
@@ -130,34 +275,408 @@ async def api_post_crm_integration(
         logger.exception("Error processing request")
         res = dict()
         res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/integration/crm/bulk",
+    response_model=project.crm_integration_service.CrmBulkIntegrationResponse,
+)
+async def api_post_crm_bulk_integration(
+    user_id: str,
+    items: List[project.crm_integration_service.CrmBulkIntegrationItem],
+) -> project.crm_integration_service.CrmBulkIntegrationResponse | Response:
+    """
+    Syncs many CRM integration payloads in one request, returning a result per item.
+    """
+    try:
+        res = await project.crm_integration_service.crm_bulk_integration(
+            user_id, items
         )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
 
 
 @app.post(
-    "/data/process", response_model=project.process_data_service.ProcessDataResponse
+    "/integration/crm/async",
+    response_model=project.outbox_service.OutboxEnqueueResponse,
 )
+async def api_post_crm_integration_async(
+    user_id: str,
+    crm_type: str,
+    api_key: str,
+    integration_details: project.crm_integration_service.CrmIntegrationDetails,
+    idempotency_key: Optional[str] = None,
+) -> project.outbox_service.OutboxEnqueueResponse | Response:
+    """
+    Queues a CRM integration call and acknowledges it immediately with an outbox ID.
+    """
+    try:
+        res = await project.outbox_service.enqueue_crm_integration(
+            user_id, crm_type, api_key, integration_details, idempotency_key
+        )
+        return res
+    except project.outbox_service.OutboxIdempotencyConflictError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=409)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/integration/payment/async",
+    response_model=project.outbox_service.OutboxEnqueueResponse,
+)
+async def api_post_payment_gateway_integration_async(
+    user_id: str,
+    amount: float,
+    currency: str,
+    payment_method: str,
+    description: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> project.outbox_service.OutboxEnqueueResponse | Response:
+    """
+    Queues a payment gateway call and acknowledges it immediately with an outbox ID.
+    """
+    try:
+        res = await project.outbox_service.enqueue_payment(
+            user_id, amount, currency, payment_method, description, idempotency_key
+        )
+        return res
+    except project.outbox_service.OutboxIdempotencyConflictError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=409)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.get(
+    "/outbox/metrics", response_model=project.outbox_service.OutboxMetricsResponse
+)
+async def api_get_outbox_metrics() -> project.outbox_service.OutboxMetricsResponse | Response:
+    """
+    Reports outbox throughput, backlog and delivery lag
+    """
+    try:
+        res = await project.outbox_service.get_metrics()
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.get(
+    "/outbox/{outbox_id}", response_model=project.outbox_service.OutboxStatusResponse
+)
+async def api_get_outbox_status(
+    outbox_id: str,
+) -> project.outbox_service.OutboxStatusResponse | Response:
+    """
+    Reports the status and result of a queued outbound call
+    """
+    try:
+        res = await project.outbox_service.get_status(outbox_id)
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.get(
+    "/analytics/requests/modules",
+    response_model=project.analytics_rollups.ModuleRequestsResponse,
+)
+async def api_get_module_requests(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> project.analytics_rollups.ModuleRequestsResponse | Response:
+    """
+    Requests per module per minute or hour, read from the request rollups.
+    """
+    try:
+        res = await project.analytics_rollups.get_module_requests(
+            granularity, start, end
+        )
+        return res
+    except ValueError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=400)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.get(
+    "/analytics/requests/endpoints",
+    response_model=project.analytics_rollups.EndpointLatencyResponse,
+)
+async def api_get_endpoint_latency(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> project.analytics_rollups.EndpointLatencyResponse | Response:
+    """
+    Request count, success rate and latency percentiles per endpoint, read from the request rollups.
+    """
+    try:
+        res = await project.analytics_rollups.get_endpoint_latency(
+            granularity, start, end
+        )
+        return res
+    except ValueError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=400)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.get(
+    "/analytics/activity",
+    response_model=project.analytics_rollups.ActivityResponse,
+)
+async def api_get_activity(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+) -> project.analytics_rollups.ActivityResponse | Response:
+    """
+    Activity counts per action per minute or hour, read from the activity rollups.
+    """
+    try:
+        res = await project.analytics_rollups.get_activity(
+            granularity, start, end, user_id
+        )
+        return res
+    except ValueError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=400)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/data/process",
+    response_model=project.process_data_service.ProcessDataResponse,
+    responses={
+        200: {"content": {project.process_data_binary.MSGPACK_MEDIA_TYPE: {}}}
+    },
+)
+@project.fast_json.trusted_response
 async def api_post_process_data(
-    data: List[project.process_data_service.DataPoint],
+    request: Request,
+    data: List[project.process_data_service.DataPoint] | bytes,
 ) -> project.process_data_service.ProcessDataResponse | Response:
     """
     Accepts data for processing and returns analysis results in real-time.
+
+    JSON arrays of data points are validated row by row. Bodies sent as application/x-msgpack in the packed columnar
+    layout (see project.process_data_binary) skip per-row validation and are answered in the same layout, as are
+    JSON requests whose Accept header asks for it. Msgpack bodies over PROCESS_DATA_MAX_BODY_BYTES get 413.
+    """
+    project.instrumentation.mark("validation")
+    try:
+        if project.process_data_binary.is_msgpack(
+            request.headers.get("content-type", "")
+        ):
+            with project.instrumentation.phase("compute"):
+                content = await project.process_data_binary.process_data_msgpack(data)
+            return project.process_data_binary.MsgpackResponse(content)
+        if isinstance(data, bytes):
+            raise ValueError("Expected a JSON array of data points.")
+        with project.instrumentation.phase("compute"):
+            res = await project.process_data_executor.executor.process_data(data)
+        if project.process_data_binary.accepts_msgpack(
+            request.headers.get("accept", "")
+        ):
+            return project.process_data_binary.MsgpackResponse(
+                project.process_data_binary.encode_response(res)
+            )
+        return res
+    except project.process_data_executor.ExecutorSaturatedError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=503)
+    except ValueError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=400)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post("/data/process/stream")
+async def api_post_process_data_stream(request: Request) -> Response:
+    """
+    Accepts NDJSON or JSON array data incrementally and streams processed points back as NDJSON.
     """
     try:
-        res = project.process_data_service.process_data(data)
+        records = project.process_data_stream.iter_records(
+            request.stream(), request.headers.get("content-type", "")
+        )
+        return project.process_data_stream.DuplexStreamingResponse(
+            project.process_data_stream.process_stream(records),
+            media_type="application/x-ndjson",
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/data/sessions",
+    response_model=project.process_data_sessions.ProcessDataSessionResponse,
+)
+@project.fast_json.trusted_response
+async def api_post_open_process_data_session(
+    request: Request,
+    window: int = project.process_data_sessions.PROCESS_DATA_SESSION_WINDOW,
+) -> project.process_data_sessions.ProcessDataSessionResponse | Response:
+    """
+    Opens a session that keeps rolling aggregates over the last window data points appended to it
+    """
+    try:
+        owner = await project.process_data_sessions.owner_of(request.scope)
+        res = await project.process_data_sessions.open_session(window, owner)
         return res
+    except ValueError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=400)
+    except project.process_data_sessions.SessionQuotaExceededError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=429)
+    except project.process_data_sessions.SessionCapacityError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=503)
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
         res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.post(
+    "/data/sessions/{session_id}/points",
+    response_model=project.process_data_sessions.ProcessDataSessionResponse,
+)
+@project.fast_json.trusted_response
+async def api_post_append_process_data_session(
+    request: Request,
+    session_id: str,
+    data: List[project.process_data_service.DataPoint],
+) -> project.process_data_sessions.ProcessDataSessionResponse | Response:
+    """
+    Appends new data points to a session and returns its updated rolling aggregates
+    """
+    project.instrumentation.mark("validation")
+    try:
+        owner = await project.process_data_sessions.owner_of(request.scope)
+        with project.instrumentation.phase("compute"):
+            res = await project.process_data_sessions.append_points(
+                session_id, data, owner
+            )
+        return res
+    except project.process_data_sessions.SessionNotFoundError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=404)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.get(
+    "/data/sessions/{session_id}",
+    response_model=project.process_data_sessions.ProcessDataSessionResponse,
+)
+@project.fast_json.trusted_response
+async def api_get_process_data_session(
+    request: Request,
+    session_id: str,
+) -> project.process_data_sessions.ProcessDataSessionResponse | Response:
+    """
+    Returns the current rolling aggregates of a session
+    """
+    try:
+        owner = await project.process_data_sessions.owner_of(request.scope)
+        res = await project.process_data_sessions.get_session_results(
+            session_id, owner
         )
+        return res
+    except project.process_data_sessions.SessionNotFoundError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=404)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+@app.delete(
+    "/data/sessions/{session_id}",
+    response_model=project.process_data_sessions.CloseProcessDataSessionResponse,
+)
+@project.fast_json.trusted_response
+async def api_delete_process_data_session(
+    request: Request,
+    session_id: str,
+) -> project.process_data_sessions.CloseProcessDataSessionResponse | Response:
+    """
+    Closes a session and frees its buffers
+    """
+    try:
+        owner = await project.process_data_sessions.owner_of(request.scope)
+        res = await project.process_data_sessions.close_session(session_id, owner)
+        return res
+    except project.process_data_sessions.SessionNotFoundError as e:
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=404)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
 
 
 @app.put(
@@ -182,14 +701,11 @@ async def api_put_update_user_profile(
         logger.exception("Error processing request")
         res = dict()
         res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
 
 
 @app.post("/user/login", response_model=project.login_service.LoginResponse)
+@project.fast_json.trusted_response
 async def api_post_login(
     email: str, password: str
 ) -> project.login_service.LoginResponse | Response:
@@ -203,8 +719,7 @@ async def api_post_login(
         logger.exception("Error processing request")
         res = dict()
         res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.fast_json.FastJSONResponse(content=res, status_code=500)
+
+
+project.startup.startup.mark("app")
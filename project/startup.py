@@ -0,0 +1,224 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import project.db
+import project.password_hashing
+import project.process_data_executor
+import project.process_data_service
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# "background" warms up after the server starts accepting connections, with /ready failing until it is done;
+# "blocking" finishes warming up before the server accepts any connection; "off" skips it.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+
+STARTUP_WARMUP_STEPS = os.getenv(
+    "STARTUP_WARMUP_STEPS", "database,bcrypt,process_data,process_pool,openapi"
+)
+
+STARTUP_WARMUP_STEP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_STEP_TIMEOUT", "30"))
+
+
+class ReadinessResponse(BaseModel):
+    """
+    Whether this worker has finished starting up, and how long each startup phase took.
+    """
+
+    ready: bool
+    startup_seconds: Optional[float]
+    phases: Dict[str, float]
+
+
+def process_age() -> float:
+    """
+    Returns how many seconds ago the current process started, or 0.0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return 0.0
+    # starttime is the 22nd field of /proc/self/stat, the 20th after the command name.
+    return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+
+
+class StartupTimer:
+    """
+    Records the phases of a worker's startup, from process start until it is ready to serve.
+
+    mark() closes a phase that started where the previous one ended (the first one starts when the process did),
+    phase() times an enclosed block. Together they split time-to-ready into interpreter and module imports, app
+    construction, lifespan startup and each warm-up step.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.started_at = clock() - process_age()
+        self.last_mark = self.started_at
+        self.phases: List[Tuple[str, float]] = []
+        self.ready = False
+        self.ready_after: Optional[float] = None
+
+    def mark(self, name: str) -> None:
+        now = self.clock()
+        self.phases.append((name, now - self.last_mark))
+        self.last_mark = now
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = self.clock()
+        try:
+            yield
+        finally:
+            now = self.clock()
+            self.phases.append((name, now - start))
+            self.last_mark = now
+
+    def set_ready(self) -> None:
+        if self.ready:
+            return
+        self.ready = True
+        self.ready_after = self.clock() - self.started_at
+        logger.info(
+            "Ready after %.3fs (%s)",
+            self.ready_after,
+            ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases),
+        )
+
+    def report(self) -> ReadinessResponse:
+        return ReadinessResponse.construct(
+            ready=self.ready,
+            startup_seconds=self.ready_after,
+            phases=dict(self.phases),
+        )
+
+    def render(self) -> str:
+        """
+        Renders the startup phases and readiness in the Prometheus text format.
+
+        Returns:
+            str: Metric families to append to a /metrics scrape.
+        """
+        lines = [
+            "# HELP app_startup_phase_seconds Time spent in each phase of this worker's startup.",
+            "# TYPE app_startup_phase_seconds gauge",
+        ]
+        for name, seconds in self.phases:
+            lines.append(f'app_startup_phase_seconds{{phase="{name}"}} {seconds}')
+        lines += [
+            "# HELP app_ready Whether this worker has finished warming up.",
+            "# TYPE app_ready gauge",
+            f"app_ready {int(self.ready)}",
+        ]
+        if self.ready_after is not None:
+            lines += [
+                "# HELP app_startup_seconds Time from process start until this worker was ready.",
+                "# TYPE app_startup_seconds gauge",
+                f"app_startup_seconds {self.ready_after}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+startup = StartupTimer()
+
+
+def _sample_points() -> List[project.process_data_service.DataPoint]:
+    construct = project.process_data_service.DataPoint.construct
+    return [
+        construct(timestamp=datetime(2024, 1, 1), value=float(i), parameters={})
+        for i in range(project.process_data_service.COLUMNAR_MIN_POINTS)
+    ]
+
+
+async def _warm_database(app: FastAPI) -> None:
+    # Prisma's query engine opens database connections lazily, on the first query.
+    await project.db.primary.query_raw("SELECT 1")
+    if project.db.replica is not None:
+        await project.db.replica.query_raw("SELECT 1")
+
+
+async def _warm_bcrypt(app: FastAPI) -> None:
+    await project.password_hashing.password_hasher.warm_up()
+
+
+async def _warm_process_data(app: FastAPI) -> None:
+    # Imports the columnar engine (and NumPy) when the configuration would use it.
+    project.process_data_service.process_points(_sample_points())
+
+
+async def _warm_process_pool(app: FastAPI) -> None:
+    await project.process_data_executor.executor.warm_up(_sample_points())
+
+
+async def _warm_openapi(app: FastAPI) -> None:
+    app.openapi()
+
+
+WARMUP_STEPS: Dict[str, Callable[[FastAPI], Awaitable[None]]] = {
+    "database": _warm_database,
+    "bcrypt": _warm_bcrypt,
+    "process_data": _warm_process_data,
+    "process_pool": _warm_process_pool,
+    "openapi": _warm_openapi,
+}
+
+
+class WarmUp:
+    """
+    Runs the warm-up steps at startup and then reports the worker as ready.
+
+    Each step pays a cost that would otherwise land on the first requests a new worker serves: opening database
+    connections, loading the bcrypt backend, importing NumPy, spawning the process_data workers and generating the
+    OpenAPI schema. Steps are run in order; a step that fails or exceeds STARTUP_WARMUP_STEP_TIMEOUT is logged and
+    skipped, so a slow dependency delays readiness but never prevents it.
+    """
+
+    def __init__(self, mode: str = STARTUP_WARMUP, steps: str = STARTUP_WARMUP_STEPS):
+        if mode not in ("background", "blocking", "off"):
+            raise ValueError(f"Unknown startup warm-up mode: {mode}")
+        self.mode = mode
+        self.steps = [step.strip() for step in steps.split(",") if step.strip()]
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, app: FastAPI) -> None:
+        for name in self.steps:
+            step = WARMUP_STEPS.get(name)
+            if step is None:
+                logger.warning("Unknown warm-up step %s", name)
+                continue
+            try:
+                with startup.phase(f"warmup:{name}"):
+                    await asyncio.wait_for(step(app), STARTUP_WARMUP_STEP_TIMEOUT)
+            except Exception:
+                logger.exception("Warm-up step %s failed", name)
+        startup.set_ready()
+
+    async def start(self, app: FastAPI) -> None:
+        if self.mode == "off":
+            startup.set_ready()
+        elif self.mode == "blocking":
+            await self.run(app)
+        elif self._task is None:
+            self._task = asyncio.create_task(self.run(app))
+
+    async def stop(self) -> None:
+        startup.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+warmup = WarmUp()
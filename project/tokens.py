@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Dict
+
+import jwt
+from project.ttl_cache import TTLCache
+
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "")
+
+if not SECRET_KEY:
+    raise RuntimeError(
+        "JWT_SECRET_KEY is not set. Generate one with: python -c 'import secrets; print(secrets.token_urlsafe(32))'"
+    )
+
+JWT_ALGORITHM = "HS256"
+
+TOKEN_CACHE_SIZE = int(os.getenv("JWT_VERIFY_CACHE_SIZE", "10000"))
+
+TOKEN_CACHE_TTL = float(os.getenv("JWT_VERIFY_CACHE_TTL", "300"))
+
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _json_bytes(value: Dict[str, Any]) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+_HEADER_SEGMENT = _b64encode(
+    json.dumps(
+        {"alg": JWT_ALGORITHM, "typ": "JWT"}, separators=(",", ":"), sort_keys=True
+    ).encode()
+)
+
+_HMAC_KEY = hmac.new(SECRET_KEY.encode(), digestmod=hashlib.sha256)
+
+_verified_claims: TTLCache[bytes, Dict[str, Any]] = TTLCache(
+    TOKEN_CACHE_SIZE, clock=time.time
+)
+
+
+def _sign(signing_input: bytes) -> bytes:
+    mac = _HMAC_KEY.copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
+def encode_token(claims: Dict[str, Any]) -> str:
+    """
+    Issues an HS256 JWT signed with the application secret.
+
+    The output is the same token PyJWT produces for these claims, but the header segment and the keyed HMAC state
+    are computed once at import time instead of on every call.
+
+    Args:
+        claims (Dict[str, Any]): The token claims. datetime values of exp, iat and nbf are converted to UNIX
+            timestamps.
+
+    Returns:
+        str: The encoded token.
+    """
+    payload = dict(claims)
+    for claim in _TIME_CLAIMS:
+        if isinstance(payload.get(claim), datetime):
+            payload[claim] = timegm(payload[claim].utctimetuple())
+    signing_input = _HEADER_SEGMENT + b"." + _b64encode(_json_bytes(payload))
+    return (signing_input + b"." + _b64encode(_sign(signing_input))).decode()
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    """
+    Verifies an HS256 JWT issued by encode_token and returns its claims.
+
+    Verified claims are cached by token digest until the token's exp (or JWT_VERIFY_CACHE_TTL seconds for tokens
+    without one), so repeated verification of the same token skips the HMAC and JSON work.
+
+    Args:
+        token (str): The encoded token.
+
+    Returns:
+        Dict[str, Any]: A copy of the token claims.
+
+    Raises:
+        jwt.InvalidTokenError: If the token is malformed, not HS256, has a bad signature or is expired.
+    """
+    raw = token.encode()
+    digest = hashlib.sha256(raw).digest()
+    claims = _verified_claims.get(digest)
+    if claims is not None:
+        return dict(claims)
+    try:
+        header_segment, payload_segment, signature_segment = raw.split(b".")
+        header = json.loads(_b64decode(header_segment))
+        signature = _b64decode(signature_segment)
+        claims = json.loads(_b64decode(payload_segment))
+    except ValueError as e:
+        raise jwt.DecodeError("Invalid token.") from e
+    if not isinstance(header, dict) or header.get("alg") != JWT_ALGORITHM:
+        raise jwt.InvalidAlgorithmError("The specified alg value is not allowed.")
+    if not isinstance(claims, dict):
+        raise jwt.DecodeError("Invalid token payload.")
+    if not hmac.compare_digest(
+        signature, _sign(header_segment + b"." + payload_segment)
+    ):
+        raise jwt.InvalidSignatureError("Signature verification failed.")
+    expires_at = claims.get("exp")
+    if expires_at is not None:
+        if not isinstance(expires_at, (int, float)):
+            raise jwt.DecodeError("Expiration Time claim (exp) must be a number.")
+        if expires_at <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired.")
+    else:
+        expires_at = time.time() + TOKEN_CACHE_TTL
+    _verified_claims.set(digest, claims, expires_at=expires_at)
+    return dict(claims)
@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded in-process cache with least-recently-used eviction and per-entry expiry.
+
+    Entries expire either after the cache-wide ttl or at an explicit expires_at given to set(), measured on the
+    cache's clock. The cache is meant to be used from the event loop thread only and does no locking.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[K, Tuple[V, Optional[float]]]" = OrderedDict()
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Returns the cached value for key, or None if it is missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, expires_at: Optional[float] = None) -> None:
+        """
+        Stores value under key, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (K): The cache key.
+            value (V): The value to store.
+            expires_at (Optional[float]): When the entry expires, on the cache's clock. Defaults to now + ttl, and
+                is capped at that when both are given.
+        """
+        if self.maxsize <= 0:
+            return
+        if self.ttl is not None:
+            default_expiry = self.clock() + self.ttl
+            expires_at = (
+                default_expiry
+                if expires_at is None
+                else min(expires_at, default_expiry)
+            )
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        """
+        Removes key from the cache and returns its value, if it was cached.
+        """
+        entry = self._entries.pop(key, None)
+        return None if entry is None else entry[0]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
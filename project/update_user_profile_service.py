@@ -1,7 +1,11 @@
 from typing import Optional
 
 import prisma
+import prisma.errors
 import prisma.models
+import project.db
+import project.get_user_profile_service
+import project.user_profile_cache
 from pydantic import BaseModel
 
 
@@ -14,58 +18,77 @@ class UpdateUserProfileResponse(BaseModel):
     message: str
 
 
+def unique_violation_message(error: prisma.errors.UniqueViolationError) -> str:
+    """
+    Maps a unique constraint violation on the User table to the message shown to the client.
+
+    Args:
+        error (prisma.errors.UniqueViolationError): The error raised by the update.
+
+    Returns:
+        str: "Email already exists." or "Username already exists.", depending on the violated constraint.
+    """
+    target = str((error.meta or {}).get("target") or error)
+    if "username" in target:
+        return "Username already exists."
+    return "Email already exists."
+
+
 async def update_user_profile(
     email: Optional[str] = None,
     username: Optional[str] = None,
     phone_number: Optional[str] = None,
     profile_picture_url: Optional[str] = None,
+    user_id: str = project.get_user_profile_service.AUTHENTICATED_USER_ID,
 ) -> UpdateUserProfileResponse:
     """
     Updates the profile of the authenticated user.
 
-    This function attempts to update various fields of a user's profile based on inputs. Checks are performed to ensure
-    the uniqueness of both email and username if provided. It also constructs a meaningful message upon successful
-    update or upon encountering an error.
+    This function attempts to update various fields of a user's profile based on inputs. The update is a single
+    write; uniqueness of email and username is enforced by the unique constraints on the User table, and a
+    violation is reported as the matching "already exists" message, so concurrent updates cannot both claim the
+    same value. It also constructs a meaningful message upon successful update or upon encountering an error. A
+    successful update writes the new profile through to the profile cache and invalidates it in the other workers.
 
     Args:
         email (Optional[str]): The new email address for the user. Optional and should be validated if provided.
         username (Optional[str]): The new username for the user. Optional, but must be unique if provided.
         phone_number (Optional[str]): The new phone number for the user. Optional and should follow a valid format if provided.
         profile_picture_url (Optional[str]): URL of the new profile picture for the user. Optional.
+        user_id (str): The ID of the user to update.
 
     Returns:
         UpdateUserProfileResponse: Object indicating the success status and message regarding the updating process.
+        The update fails with "User not found." if no user has the given ID.
     """
+    update_payload = {}
+    if email:
+        update_payload["email"] = email
+    if username:
+        update_payload["username"] = username
+    if phone_number:
+        update_payload["phoneNumber"] = phone_number
+    if profile_picture_url:
+        update_payload["profilePictureUrl"] = profile_picture_url
     try:
-        if email and await prisma.models.User.prisma().find_unique(
-            where={"email": email}
-        ):
-            return UpdateUserProfileResponse(
-                success=False, message="Email already exists."
-            )
-        if username and await prisma.models.User.prisma().find_unique(
-            where={"username": username}
-        ):
-            return UpdateUserProfileResponse(
-                success=False, message="Username already exists."
-            )
-        auth_user_id = "authenticated-user-id"
-        update_payload = {}
-        if email:
-            update_payload["email"] = email
-        if username:
-            update_payload["username"] = username
-        if phone_number:
-            update_payload["phone_number"] = phone_number
-        if profile_picture_url:
-            update_payload["profile_picture_url"] = profile_picture_url
-        await prisma.models.User.prisma().update(
-            where={"id": auth_user_id}, data=update_payload
+        user = await prisma.models.User.prisma().update(
+            where={"id": user_id}, data=update_payload
         )
+    except prisma.errors.UniqueViolationError as e:
         return UpdateUserProfileResponse(
-            success=True, message="User profile updated successfully."
+            success=False, message=unique_violation_message(e)
         )
     except Exception as e:
         return UpdateUserProfileResponse(
             success=False, message=f"Failed to update user profile: {str(e)}"
         )
+    if user is None:
+        await project.user_profile_cache.profile_cache.refresh(user_id)
+        return UpdateUserProfileResponse(success=False, message="User not found.")
+    project.db.mark_written(user_id)
+    await project.user_profile_cache.profile_cache.refresh(
+        user_id, project.get_user_profile_service.build_user_profile_response(user)
+    )
+    return UpdateUserProfileResponse(
+        success=True, message="User profile updated successfully."
+    )
@@ -0,0 +1,219 @@
+import abc
+import asyncio
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+from project.ttl_cache import TTLCache
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "30"))
+
+# Leave empty to invalidate within this process only; set a redis:// URL to share invalidations between workers.
+USER_PROFILE_INVALIDATION_URL = os.getenv("USER_PROFILE_INVALIDATION_URL", "")
+
+USER_PROFILE_INVALIDATION_CHANNEL = os.getenv(
+    "USER_PROFILE_INVALIDATION_CHANNEL", "user-profile-invalidations"
+)
+
+# GetUserProfileResponse; typed loosely so that the service module can import this one.
+Profile = BaseModel
+
+
+class InvalidationBus(abc.ABC):
+    """
+    Carries user-profile invalidations between the processes serving the API.
+
+    Messages are opaque strings (the profile cache sends "<origin>:<user ID>"). Subclasses deliver every published
+    message to the callbacks of every subscriber, including ones in other processes and the publisher itself.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[str], None]] = []
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        self._subscribers.append(callback)
+
+    def _deliver(self, message: str) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Failed to apply profile invalidation %r", message)
+
+    @abc.abstractmethod
+    async def publish(self, message: str) -> None:
+        """
+        Sends message to every subscriber of the bus.
+        """
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """
+    In-process stand-in for a shared bus: delivers every message to the subscribers of this bus object only.
+
+    Caches sharing one LocalInvalidationBus behave like workers sharing a real broker, which is enough for a single
+    process and for exercising the invalidation path in tests.
+    """
+
+    async def publish(self, message: str) -> None:
+        self._deliver(message)
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """
+    Redis pub/sub bus, so that a profile change in one uvicorn worker evicts it from every other worker's cache.
+
+    Requires the optional redis package.
+    """
+
+    def __init__(self, url: str, channel: str = USER_PROFILE_INVALIDATION_CHANNEL):
+        super().__init__()
+        import redis.asyncio
+
+        self.channel = channel
+        self._redis = redis.asyncio.from_url(url)
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, message: str) -> None:
+        await self._redis.publish(self.channel, message)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._deliver(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the profile invalidation subscription")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._redis.close()
+
+
+def make_invalidation_bus(url: str = USER_PROFILE_INVALIDATION_URL) -> InvalidationBus:
+    """
+    Builds the invalidation bus for the configured URL.
+
+    Args:
+        url (str): A redis:// URL, or an empty string for the in-process bus.
+
+    Returns:
+        InvalidationBus: The Redis bus, or the local one if no URL is set or redis is not installed.
+    """
+    if not url:
+        return LocalInvalidationBus()
+    try:
+        return RedisInvalidationBus(url)
+    except ImportError:
+        logger.warning(
+            "USER_PROFILE_INVALIDATION_URL is set but the redis package is not installed; "
+            "profile invalidations will not reach other workers"
+        )
+        return LocalInvalidationBus()
+
+
+class UserProfileCache:
+    """
+    Bounded TTL + LRU cache of GetUserProfileResponse keyed by user ID.
+
+    Reads go through get_or_load(). Writers call refresh() with the updated profile, which stores it locally and
+    publishes the user ID on the invalidation bus so other workers drop their copy and reload it on the next read.
+    A load that started before an invalidation is not cached, so a slow read cannot put a stale profile back
+    after a write.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = USER_PROFILE_CACHE_SIZE,
+        ttl: float = USER_PROFILE_CACHE_TTL,
+        bus: Optional[InvalidationBus] = None,
+    ):
+        self._profiles: TTLCache[str, Profile] = TTLCache(maxsize, ttl=ttl)
+        self._generation = 0
+        self.origin = uuid.uuid4().hex
+        self.bus = bus or make_invalidation_bus()
+        self.bus.subscribe(self._on_message)
+
+    def _on_message(self, message: str) -> None:
+        origin, _, user_id = message.partition(":")
+        if origin != self.origin:
+            self._generation += 1
+            self._profiles.pop(user_id)
+
+    async def get_or_load(
+        self, user_id: str, load: Callable[[str], Awaitable[Profile]]
+    ) -> Profile:
+        """
+        Returns the cached profile for user_id, loading and caching it on a miss.
+
+        Args:
+            user_id (str): The user whose profile is requested.
+            load (Callable[[str], Awaitable[Profile]]): Fetches the profile from the database.
+
+        Returns:
+            GetUserProfileResponse: The user's profile.
+        """
+        profile = self._profiles.get(user_id)
+        if profile is None:
+            generation = self._generation
+            profile = await load(user_id)
+            if generation == self._generation:
+                self._profiles.set(user_id, profile)
+        return profile
+
+    async def refresh(self, user_id: str, profile: Optional[Profile] = None) -> None:
+        """
+        Replaces or drops the cached profile after a write and tells the other workers to drop theirs.
+
+        Args:
+            user_id (str): The user whose profile changed.
+            profile (Optional[GetUserProfileResponse]): The profile as written, or None to just evict it.
+        """
+        self._generation += 1
+        if profile is None:
+            self._profiles.pop(user_id)
+        else:
+            self._profiles.set(user_id, profile)
+        try:
+            await self.bus.publish(f"{self.origin}:{user_id}")
+        except Exception:
+            logger.exception("Failed to publish profile invalidation for %s", user_id)
+
+    async def start(self) -> None:
+        await self.bus.start()
+
+    async def stop(self) -> None:
+        await self.bus.stop()
+
+
+profile_cache = UserProfileCache()
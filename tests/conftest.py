@@ -0,0 +1,4 @@
+import os
+
+# project.tokens refuses to import without a signing key; the tests only need one to exist.
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key")
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import math
+import typing
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Dict, List
+
+import httpx
+import project.get_user_profile_service
+import project.process_data_columnar
+import project.process_data_service
+import project.server
+import pytest
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from project.fast_json import (
+    TRUSTED_RESPONSE_ATTRIBUTE,
+    FastJSONResponse,
+    FastJSONRoute,
+    dumps,
+    trusted_response,
+)
+from project.process_data_service import DataPoint
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+TRUSTED_ROUTES: Dict[str, APIRoute] = {
+    f"{method} {route.path}": route
+    for route in project.server.app.routes
+    if isinstance(route, APIRoute)
+    and getattr(route.endpoint, TRUSTED_RESPONSE_ATTRIBUTE, False)
+    for method in sorted(route.methods)
+}
+
+# Strings and floats that encoders are most likely to disagree on. Floats whose repr uses an exponent are covered
+# by test_exponent_floats_differ_only_in_notation instead.
+STRINGS = [
+    "plain",
+    "é ✓ 漢字 \U0001f600",
+    'quote " backslash \\ slash /',
+    "line\nbreak\ttab ",
+]
+
+FLOATS = [0.0, -0.0, 0.1, 3.1500000000000004, -1234.5678, 2.5e15]
+
+DATETIMES = [
+    datetime(2024, 5, 17, 12, 30, 45),
+    datetime(2024, 5, 17, 12, 30, 45, 123456, tzinfo=timezone.utc),
+    datetime(2024, 5, 17, 12, 30, 45, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+]
+
+
+def sample(annotation: Any, variant: int) -> Any:
+    """
+    Builds a value of the given type; variant picks among the tricky strings, floats and datetimes above.
+    """
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        if variant % 2 and type(None) in args:
+            return None
+        return sample(next(arg for arg in args if arg is not type(None)), variant)
+    if origin in (list, typing.List):
+        return [sample(args[0], variant + i) for i in range(3)]
+    if origin in (dict, typing.Dict):
+        return {STRINGS[i]: sample(args[1], variant + i) for i in range(3)}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation(
+            **{
+                name: sample(field.outer_type_, variant + i)
+                for i, (name, field) in enumerate(annotation.__fields__.items())
+            }
+        )
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        members = list(annotation)
+        return members[variant % len(members)]
+    return {
+        bool: variant % 2 == 0,
+        int: 12345 * (variant + 1),
+        float: FLOATS[variant % len(FLOATS)],
+        str: STRINGS[variant % len(STRINGS)],
+        datetime: DATETIMES[variant % len(DATETIMES)],
+    }.get(annotation)
+
+
+def constructed(model: BaseModel) -> BaseModel:
+    # What services return: the same values, built without validation.
+    return type(model).construct(**dict(model))
+
+
+def responses_for(name: str) -> List[Any]:
+    route = TRUSTED_ROUTES[name]
+    responses = [sample(route.response_model, variant) for variant in range(4)]
+    if name == "POST /data/process":
+        data = [
+            DataPoint(
+                timestamp=DATETIMES[i % len(DATETIMES)],
+                value=FLOATS[i % len(FLOATS)] + i,
+                parameters={"key_metric": STRINGS[i % len(STRINGS)]} if i % 3 else {},
+            )
+            for i in range(200)
+        ]
+        responses += [
+            project.process_data_service.build_response(
+                project.process_data_service.process_points_reference(data),
+                datetime(2024, 1, 1),
+            ),
+            project.process_data_service.build_response(
+                project.process_data_columnar.process_points_columnar(data),
+                datetime(2024, 1, 1),
+            ),
+        ]
+    return responses + [constructed(response) for response in responses]
+
+
+def render_both(route: APIRoute, response: Any) -> List[httpx.Response]:
+    """
+    Serves response from a FastAPI default route and from a FastJSONRoute with the same response model.
+    """
+
+    async def endpoint():
+        return response
+
+    default = FastAPI()
+    default.add_api_route("/", endpoint, response_model=route.response_model)
+    fast = FastAPI(default_response_class=FastJSONResponse)
+    fast.router.route_class = FastJSONRoute
+    fast.add_api_route(
+        "/", trusted_response(endpoint), response_model=route.response_model
+    )
+
+    async def get(app: FastAPI) -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://t"
+        ) as client:
+            return await client.get("/")
+
+    async def both() -> List[httpx.Response]:
+        return [await get(default), await get(fast)]
+
+    return asyncio.run(both())
+
+
+def test_trusted_routes_use_the_fast_path():
+    assert TRUSTED_ROUTES
+    for route in TRUSTED_ROUTES.values():
+        assert isinstance(route, FastJSONRoute)
+        assert route._serializes_directly()
+
+
+@pytest.mark.parametrize("name", sorted(TRUSTED_ROUTES))
+def test_trusted_route_output_is_identical_to_fastapi_default(name):
+    for response in responses_for(name):
+        default, fast = render_both(TRUSTED_ROUTES[name], response)
+        assert fast.status_code == default.status_code == 200
+        assert fast.headers["content-type"] == default.headers["content-type"]
+        assert fast.content == default.content
+
+
+@pytest.mark.parametrize("message", STRINGS + ["", "Error: {'nested': [1, 2]}"])
+@pytest.mark.parametrize("status_code", [400, 404, 409, 413, 500, 503])
+def test_error_dicts_are_identical_to_fastapi_default(message, status_code):
+    content = {"error": message}
+    fast = FastJSONResponse(content=content, status_code=status_code)
+    default = JSONResponse(content=content, status_code=status_code)
+    assert fast.body == default.body
+    assert fast.status_code == default.status_code
+    assert fast.headers["content-type"] == default.headers["content-type"]
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf])
+def test_non_finite_floats_are_written_as_null(value):
+    # The documented difference: the default encoder refuses these values, so such a response is a 500 there.
+    assert FastJSONResponse(content={"result": value}).body == b'{"result":null}'
+    with pytest.raises(ValueError):
+        JSONResponse(content={"result": value})
+
+
+def test_non_finite_floats_in_a_trusted_route():
+    route = TRUSTED_ROUTES["POST /data/process"]
+    response = project.process_data_service.build_response(
+        project.process_data_service.process_points_reference(
+            [DataPoint(timestamp=DATETIMES[0], value=math.nan, parameters={})]
+        ),
+        datetime(2024, 1, 1),
+    )
+    with pytest.raises(ValueError):
+        render_both(route, response)
+    fast = FastJSONResponse(response).body
+    assert json.loads(fast)["processed_data"][0]["result"] is None
+
+
+@pytest.mark.parametrize("value", [1e16, 1e-7, 1.2345678901234568e17, 1e308])
+def test_exponent_floats_differ_only_in_notation(value):
+    # The other documented difference: orjson omits the "+" and leading zeros of exponents. The numbers parse the
+    # same, but the bytes differ.
+    fast = dumps({"result": value})
+    default = JSONResponse(content={"result": value}).body
+    assert fast != default
+    assert json.loads(fast) == json.loads(default)
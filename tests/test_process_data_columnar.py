@@ -0,0 +1,126 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import project.process_data_service
+import pytest
+from project.process_data_columnar import process_points_columnar
+from project.process_data_service import (
+    COLUMNAR_MIN_POINTS,
+    DataPoint,
+    ProcessedPoint,
+    process_points_reference,
+)
+
+
+def _points(count: int, **overrides) -> List[DataPoint]:
+    start = datetime(2024, 1, 1)
+    return [
+        DataPoint(
+            timestamp=overrides.get("timestamp", start + timedelta(seconds=i)),
+            value=overrides.get("value", i * 1.5 - 7),
+            parameters=overrides.get(
+                "parameters", {"key_metric": f"m{i % 3}"} if i % 2 else {}
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def _rows(points: List[ProcessedPoint]):
+    # NaN never equals itself, so compare it by kind instead of by value.
+    return [
+        (
+            point.timestamp,
+            "nan" if math.isnan(point.result) else point.result,
+            type(point.result),
+            point.insight,
+        )
+        for point in points
+    ]
+
+
+def assert_same(data: List[DataPoint]) -> None:
+    reference = process_points_reference(data)
+    columnar = process_points_columnar(data)
+    assert _rows(columnar) == _rows(reference)
+    assert [point.json() for point in columnar] == [point.json() for point in reference]
+
+
+def test_empty_input():
+    assert process_points_columnar([]) == []
+    assert_same([])
+
+
+@pytest.mark.parametrize("count", [1, COLUMNAR_MIN_POINTS - 1, COLUMNAR_MIN_POINTS])
+def test_batch_sizes_around_the_columnar_threshold(count):
+    assert_same(_points(count))
+
+
+def test_auto_engine_matches_reference_on_both_sides_of_the_threshold(monkeypatch):
+    monkeypatch.setattr(project.process_data_service, "PROCESS_DATA_ENGINE", "auto")
+    for count in (COLUMNAR_MIN_POINTS - 1, COLUMNAR_MIN_POINTS + 1):
+        data = _points(count)
+        assert _rows(project.process_data_service.process_points(data)) == _rows(
+            process_points_reference(data)
+        )
+
+
+@pytest.mark.parametrize(
+    "parameters",
+    [
+        {},
+        {"key_metric": "revenue"},
+        {"key_metric": ""},
+        {"other": "x"},
+        {"key_metric": "revenue", "other": "x"},
+    ],
+)
+def test_uniform_parameters(parameters):
+    assert_same(_points(100, parameters=parameters))
+
+
+def test_mixed_and_missing_key_metrics():
+    values = ["b", None, "a", "", "b", None, "10", "9", "a"] * 20
+    data = [
+        DataPoint(
+            timestamp=datetime(2024, 1, 1),
+            value=float(i),
+            parameters={} if value is None else {"key_metric": value},
+        )
+        for i, value in enumerate(values)
+    ]
+    assert_same(data)
+
+
+@pytest.mark.parametrize(
+    "timestamp",
+    [
+        datetime(2024, 1, 1, 12, 30),
+        datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, 12, 30, tzinfo=timezone(timedelta(hours=-5))),
+    ],
+)
+def test_naive_and_aware_timestamps(timestamp):
+    assert_same(_points(100, timestamp=timestamp))
+
+
+def test_mixed_naive_and_aware_timestamps_keep_their_order():
+    data = _points(100)
+    for i in range(0, len(data), 2):
+        data[i] = data[i].copy(
+            update={"timestamp": data[i].timestamp.replace(tzinfo=timezone.utc)}
+        )
+    assert_same(data)
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf, 0.0, -0.0, 1e308])
+def test_special_float_values(value):
+    assert_same(_points(100, value=value))
+
+
+def test_nan_among_regular_values():
+    data = _points(100)
+    for i in range(0, len(data), 7):
+        data[i] = data[i].copy(update={"value": math.nan})
+    assert_same(data)